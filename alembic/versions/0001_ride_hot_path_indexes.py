@@ -0,0 +1,75 @@
+"""Composite and partial indexes for the ride hot queries
+
+Tables are created by create_tables() at startup, which also creates these
+indexes on a fresh database; this revision adds them to databases created
+before they existed, skipping any that are already there.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ASSIGNED = "status IN ('accepted', 'arrived', 'started')"
+
+# (name, table, columns, partial-index predicate per dialect)
+INDEXES = [
+    ("ix_rides_passenger_status_requested", "rides", ["passenger_id", "status", "requested_at"], None),
+    ("ix_rides_driver_requested", "rides", ["driver_id", "requested_at"], None),
+    ("ix_rides_driver_status_completed", "rides", ["driver_id", "status", "completed_at"], None),
+    ("ix_rides_assigned_driver", "rides", ["driver_id"], {"postgresql": ASSIGNED, "sqlite": ASSIGNED}),
+    ("ix_drivers_dispatchable", "drivers", ["current_lat", "current_lng"], {
+        "postgresql": "is_online = true AND is_verified = true AND is_active = true",
+        "sqlite": "is_online = 1 AND is_verified = 1 AND is_active = 1"
+    }),
+]
+
+
+def _existing_indexes() -> set:
+    if context.is_offline_mode():
+        return set()
+    inspector = sa.inspect(op.get_bind())
+    return {
+        index["name"]
+        for table in {table for _, table, _, _ in INDEXES}
+        for index in inspector.get_indexes(table)
+    }
+
+
+def _create(name, table, columns, where, concurrently):
+    options = {}
+    if where:
+        options = {f"{dialect}_where": sa.text(predicate) for dialect, predicate in where.items()}
+    if concurrently:
+        options["postgresql_concurrently"] = True
+    op.create_index(name, table, columns, **options)
+
+
+def upgrade() -> None:
+    existing = _existing_indexes()
+    missing = [index for index in INDEXES if index[0] not in existing]
+
+    if op.get_context().dialect.name == "postgresql":
+        # Build without blocking writes to the live tables
+        with op.get_context().autocommit_block():
+            for name, table, columns, where in missing:
+                _create(name, table, columns, where, concurrently=True)
+    else:
+        for name, table, columns, where in missing:
+            _create(name, table, columns, where, concurrently=False)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,52 @@
+"""Indexes for keyset pagination of ride lists
+
+Ride lists are paged on (requested_at, id), newest first. These indexes
+let each page be read in order straight from the index; the driver one
+supersedes ix_rides_driver_requested.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_rides_passenger_requested_id", ["passenger_id", "requested_at", "id"]),
+    ("ix_rides_driver_requested_id", ["driver_id", "requested_at", "id"]),
+]
+SUPERSEDED = ("ix_rides_driver_requested", ["driver_id", "requested_at"])
+
+
+def _existing_indexes() -> set:
+    if context.is_offline_mode():
+        return {SUPERSEDED[0]}
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("rides")}
+
+
+def upgrade() -> None:
+    existing = _existing_indexes()
+    concurrently = op.get_context().dialect.name == "postgresql"
+
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            if name not in existing:
+                op.create_index(name, "rides", columns, postgresql_concurrently=concurrently)
+        if SUPERSEDED[0] in existing:
+            op.drop_index(SUPERSEDED[0], table_name="rides", postgresql_concurrently=concurrently)
+
+
+def downgrade() -> None:
+    op.create_index(SUPERSEDED[0], "rides", SUPERSEDED[1])
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="rides")
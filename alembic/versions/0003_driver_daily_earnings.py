@@ -0,0 +1,67 @@
+"""Per-driver daily earnings rollup
+
+Adds driver_daily_earnings and rebuilds it from the completed rides, so
+existing history shows up in /drivers/earnings. The rebuild replaces any
+rows already written, which makes it safe to run after create_tables() has
+created the table on startup.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+rides = sa.table(
+    "rides",
+    sa.column("driver_id", sa.Integer),
+    sa.column("status", sa.String),
+    sa.column("fare", sa.Float),
+    sa.column("completed_at", sa.DateTime),
+)
+daily = sa.table(
+    "driver_daily_earnings",
+    sa.column("driver_id", sa.Integer),
+    sa.column("day", sa.Date),
+    sa.column("rides", sa.Integer),
+    sa.column("earnings", sa.Float),
+)
+
+
+def upgrade() -> None:
+    if context.is_offline_mode() or not sa.inspect(op.get_bind()).has_table("driver_daily_earnings"):
+        op.create_table(
+            "driver_daily_earnings",
+            sa.Column("driver_id", sa.Integer(), sa.ForeignKey("drivers.id"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("rides", sa.Integer(), nullable=False),
+            sa.Column("earnings", sa.Float(), nullable=False),
+        )
+
+    day = sa.func.date(rides.c.completed_at)
+    op.execute(daily.delete())
+    op.execute(daily.insert().from_select(
+        ["driver_id", "day", "rides", "earnings"],
+        sa.select(rides.c.driver_id, day, sa.func.count(), sa.func.sum(rides.c.fare))
+        .where(
+            rides.c.driver_id.isnot(None),
+            rides.c.status == "completed",
+            rides.c.fare.isnot(None),
+            rides.c.completed_at.isnot(None)
+        )
+        .group_by(rides.c.driver_id, day)
+    ))
+
+
+def downgrade() -> None:
+    op.drop_table("driver_daily_earnings")
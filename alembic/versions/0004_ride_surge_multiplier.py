@@ -0,0 +1,36 @@
+"""Surge multiplier locked in on each ride
+
+Rides remember the surge multiplier in force when they were requested, so
+the fare charged on completion matches the estimate the passenger saw.
+Existing rides keep NULL, which prices without surge.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("rides")}
+        if "surge_multiplier" in columns:
+            return
+    with op.batch_alter_table("rides") as batch_op:
+        batch_op.add_column(sa.Column("surge_multiplier", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("rides") as batch_op:
+        batch_op.drop_column("surge_multiplier")
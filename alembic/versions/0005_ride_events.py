@@ -0,0 +1,102 @@
+"""Append-only ride event log
+
+Adds ride_events, one row per status change of a ride, written in the same
+transaction as the change. Existing rides are backfilled from their status
+timestamps in time order, so ids follow time for the history too. Events
+already logged are left alone, which makes it safe to run after
+create_tables() has created the table and the API has written to it.
+Backfilled events have no actor, except requests (the passenger) and
+driver steps (the ride's driver).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+rides = sa.table(
+    "rides",
+    sa.column("id", sa.Integer),
+    sa.column("passenger_id", sa.Integer),
+    sa.column("driver_id", sa.Integer),
+    sa.column("status", sa.String),
+    sa.column("requested_at", sa.DateTime),
+    sa.column("accepted_at", sa.DateTime),
+    sa.column("arrived_at", sa.DateTime),
+    sa.column("started_at", sa.DateTime),
+    sa.column("completed_at", sa.DateTime),
+    sa.column("cancelled_at", sa.DateTime),
+)
+events = sa.table(
+    "ride_events",
+    sa.column("ride_id", sa.Integer),
+    sa.column("seq", sa.SmallInteger),
+    sa.column("status", sa.String),
+    sa.column("actor", sa.String),
+    sa.column("actor_id", sa.Integer),
+    sa.column("created_at", sa.DateTime),
+)
+
+# (status, seq, actor, actor id column, timestamp column, extra condition)
+BACKFILL = [
+    ("requested", 0, "passenger", rides.c.passenger_id, rides.c.requested_at, None),
+    ("accepted", 1, "driver", rides.c.driver_id, rides.c.accepted_at, None),
+    ("arrived", 2, "driver", rides.c.driver_id, rides.c.arrived_at, None),
+    ("started", 3, "driver", rides.c.driver_id, rides.c.started_at, None),
+    ("completed", 4, "driver", rides.c.driver_id, rides.c.completed_at, rides.c.status == "completed"),
+    ("cancelled", 4, None, None, rides.c.cancelled_at, rides.c.status == "cancelled"),
+]
+
+
+def upgrade() -> None:
+    if context.is_offline_mode() or not sa.inspect(op.get_bind()).has_table("ride_events"):
+        op.create_table(
+            "ride_events",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("ride_id", sa.Integer(), sa.ForeignKey("rides.id"), nullable=False),
+            sa.Column("seq", sa.SmallInteger(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("actor", sa.String(), nullable=True),
+            sa.Column("actor_id", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.UniqueConstraint("ride_id", "seq", name="uq_ride_events_ride_seq"),
+        )
+        op.create_index("ix_ride_events_created_at", "ride_events", ["created_at"])
+
+    arms = []
+    for status, seq, actor, actor_id, timestamp, condition in BACKFILL:
+        logged = sa.exists().where(events.c.ride_id == rides.c.id, events.c.seq == seq)
+        conditions = [timestamp.isnot(None), ~logged]
+        if condition is not None:
+            conditions.append(condition)
+        arms.append(
+            sa.select(
+                rides.c.id.label("ride_id"),
+                sa.literal(seq, sa.SmallInteger).label("seq"),
+                sa.literal(status, sa.String).label("status"),
+                sa.cast(sa.literal(actor) if actor else sa.null(), sa.String).label("actor"),
+                sa.cast(actor_id if actor_id is not None else sa.null(), sa.Integer).label("actor_id"),
+                timestamp.label("created_at"),
+            ).where(*conditions)
+        )
+    history = sa.union_all(*arms).subquery()
+    op.execute(events.insert().from_select(
+        ["ride_id", "seq", "status", "actor", "actor_id", "created_at"],
+        sa.select(history).order_by(history.c.created_at, history.c.ride_id, history.c.seq)
+    ))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ride_events_created_at", table_name="ride_events")
+    op.drop_table("ride_events")
@@ -0,0 +1,36 @@
+"""Vehicle type requested for each ride
+
+Rides remember the vehicle type the passenger asked for, so offers for
+requests re-queued after a restart still only go to matching drivers.
+Existing rides keep NULL, which matches any vehicle type.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("rides")}
+        if "vehicle_type" in columns:
+            return
+    with op.batch_alter_table("rides") as batch_op:
+        batch_op.add_column(sa.Column("vehicle_type", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("rides") as batch_op:
+        batch_op.drop_column("vehicle_type")
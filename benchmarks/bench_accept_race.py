@@ -0,0 +1,118 @@
+"""Race many drivers to accept the same ride.
+
+Compares the old read-check-write acceptance with the conditional
+``claim_ride`` UPDATE. Both run every driver in its own session against a
+throwaway SQLite database; the conditional UPDATE must produce exactly one
+winner per ride.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_accept_race
+"""
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp(prefix="ridenow_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import select
+
+from models.database import async_engine, AsyncSessionLocal, SessionLocal, create_tables, User, Passenger, Driver, Ride
+from routers.rides import claim_ride
+
+DRIVERS = [2, 8, 32]
+RIDES_PER_ROUND = 20
+
+def seed(driver_count: int):
+    """A passenger and ``driver_count`` online drivers."""
+    with SessionLocal() as db:
+        user = User(phone="p-0", password="x", full_name="Passenger", user_type="passenger")
+        db.add(user)
+        db.flush()
+        passenger = Passenger(user_id=user.id, phone="p-0", full_name="Passenger")
+        db.add(passenger)
+
+        driver_ids = []
+        for index in range(driver_count):
+            user = User(phone=f"d-{index}", password="x", full_name=f"Driver {index}", user_type="driver")
+            db.add(user)
+            db.flush()
+            driver = Driver(
+                user_id=user.id, phone=f"d-{index}", full_name=f"Driver {index}",
+                license_number=f"L-{index}", is_online=True, is_verified=True
+            )
+            db.add(driver)
+            db.flush()
+            driver_ids.append(driver.id)
+
+        db.commit()
+        return passenger.id, driver_ids
+
+def new_ride(passenger_id: int) -> int:
+    with SessionLocal() as db:
+        ride = Ride(
+            passenger_id=passenger_id,
+            pickup_lat=12.97, pickup_lng=77.59, pickup_address="A",
+            drop_lat=12.99, drop_lng=77.61, drop_address="B",
+            city="Bangalore"
+        )
+        db.add(ride)
+        db.commit()
+        return ride.id
+
+async def naive_accept(ride_id: int, driver_id: int) -> bool:
+    """The previous implementation: read the status, then write."""
+    async with AsyncSessionLocal() as db:
+        ride = await db.scalar(select(Ride).filter(Ride.id == ride_id))
+        if ride.status != "requested":
+            return False
+        # Yield like a real request would between the read and the write
+        await asyncio.sleep(0)
+        ride.driver_id = driver_id
+        ride.status = "accepted"
+        ride.accepted_at = datetime.utcnow()
+        await db.commit()
+        return True
+
+async def atomic_accept(ride_id: int, driver_id: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        ride = await claim_ride(db, ride_id, driver_id)
+        await db.commit()
+        return ride is not None
+
+async def race(accept, passenger_id: int, driver_ids):
+    """Run ``RIDES_PER_ROUND`` races; return (max winners per ride, mean ms per race)."""
+    most_winners = 0
+    elapsed = 0.0
+    for _ in range(RIDES_PER_ROUND):
+        ride_id = new_ride(passenger_id)
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(accept(ride_id, driver_id) for driver_id in driver_ids),
+            return_exceptions=True
+        )
+        elapsed += time.perf_counter() - start
+        most_winners = max(most_winners, sum(1 for result in results if result is True))
+    return most_winners, elapsed / RIDES_PER_ROUND * 1000
+
+async def main():
+    create_tables()
+    passenger_id, all_driver_ids = seed(max(DRIVERS))
+
+    print(f"{'drivers':>8} {'strategy':>10} {'max winners':>12} {'ms/race':>10}")
+    for count in DRIVERS:
+        driver_ids = all_driver_ids[:count]
+        for name, accept in (("naive", naive_accept), ("atomic", atomic_accept)):
+            winners, per_race_ms = await race(accept, passenger_id, driver_ids)
+            print(f"{count:>8} {name:>10} {winners:>12} {per_race_ms:>10.2f}")
+            if name == "atomic":
+                assert winners == 1, f"{winners} drivers won the same ride"
+
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""Replay a peak-hour request stream through the dispatch strategies.
+
+The same seeded requests and driver fleet are replayed three ways:
+
+- broadcast: the request goes to the five nearest free drivers and whoever
+  taps first wins, i.e. a random one of the five (today's behaviour)
+- greedy: the nearest free driver takes each request as it arrives
+- batched: requests collect for DISPATCH_BATCH_SECONDS and each batch is
+  solved with ``Dispatcher.plan`` (optimal assignment over the candidates)
+
+Drivers are busy for the pickup and the trip, then free up at the drop-off.
+Unmatched requests are retried every step and abandoned after five minutes.
+Match latency is the time from request to the offer reaching the chosen
+driver; driver reaction time is the same for every strategy and left out.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dispatch
+"""
+import heapq
+import random
+import time
+
+from utils.dispatch import Dispatcher, PendingRide, DISPATCH_BATCH_SECONDS
+from utils.pricing import estimate_duration_min
+from utils.spatial_index import DriverIndex
+
+ORIGIN = (12.90, 77.50)
+SIZE_DEG = 0.18  # ~20 km
+DRIVERS = 600
+MINUTES = 30
+REQUESTS_PER_MIN = 40
+STEP_SECONDS = DISPATCH_BATCH_SECONDS
+PATIENCE_SECONDS = 300
+RADIUS_KM = 5
+FANOUT = 5
+
+def random_point(rng):
+    return ORIGIN[0] + rng.random() * SIZE_DEG, ORIGIN[1] + rng.random() * SIZE_DEG
+
+def make_scenario():
+    rng = random.Random(5)
+    drivers = {driver_id: random_point(rng) for driver_id in range(DRIVERS)}
+    requests = []
+    t = 0.0
+    while t < MINUTES * 60:
+        t += rng.expovariate(REQUESTS_PER_MIN / 60)
+        pickup = random_point(rng)
+        requests.append((t, len(requests), pickup, random_point(rng), rng.uniform(8, 20)))
+    return drivers, requests
+
+def replay(strategy: str):
+    drivers, requests = make_scenario()
+    rng = random.Random(9)
+    index = DriverIndex()
+    for driver_id, (lat, lng) in drivers.items():
+        index.upsert(driver_id, lat, lng)
+    dispatcher = Dispatcher(index=index, radius_km=RADIUS_KM)
+
+    busy = []  # (free at, driver_id, drop-off)
+    waiting = {}  # ride_id -> (requested at, pickup, drop-off, trip minutes)
+    latencies, pickups, solve_ms = [], [], []
+    abandoned = 0
+    next_request = 0
+
+    def assign(ride_id, driver_id, pickup_km, now):
+        requested_at, _, drop, trip_minutes = waiting.pop(ride_id)
+        index.reserve(driver_id)
+        free_at = now + (estimate_duration_min(pickup_km) + trip_minutes) * 60
+        heapq.heappush(busy, (free_at, driver_id, drop))
+        latencies.append(now - requested_at)
+        pickups.append(pickup_km)
+
+    steps = int(MINUTES * 60 / STEP_SECONDS) + int(PATIENCE_SECONDS / STEP_SECONDS)
+    for step in range(1, steps + 1):
+        now = step * STEP_SECONDS
+        while busy and busy[0][0] <= now:
+            _, driver_id, (lat, lng) = heapq.heappop(busy)
+            index.release(driver_id)
+            index.upsert(driver_id, lat, lng)
+
+        arrivals = []
+        while next_request < len(requests) and requests[next_request][0] <= now:
+            requested_at, ride_id, pickup, drop, trip_minutes = requests[next_request]
+            waiting[ride_id] = (requested_at, pickup, drop, trip_minutes)
+            arrivals.append(ride_id)
+            next_request += 1
+
+        if strategy == "batched":
+            batch = [PendingRide(ride_id, *waiting[ride_id][1], {}, 0.0) for ride_id in waiting]
+            started = time.perf_counter()
+            matches = dispatcher.plan(batch) if batch else []
+            solve_ms.append((time.perf_counter() - started) * 1000)
+            for ride, driver_id, pickup_km in matches:
+                assign(ride.ride_id, driver_id, pickup_km, now)
+        else:
+            # Arrivals are served the moment they come in; older requests retry each step
+            for ride_id in sorted(waiting, key=lambda ride_id: waiting[ride_id][0]):
+                requested_at, (lat, lng), _, _ = waiting[ride_id]
+                nearby = index.nearest(lat, lng, FANOUT, RADIUS_KM)
+                if not nearby:
+                    continue
+                driver_id, pickup_km = nearby[0] if strategy == "greedy" else rng.choice(nearby)
+                assign(ride_id, driver_id, pickup_km, requested_at if ride_id in arrivals else now)
+
+        for ride_id in [ride_id for ride_id, entry in waiting.items() if now - entry[0] >= PATIENCE_SECONDS]:
+            del waiting[ride_id]
+            abandoned += 1
+
+    return len(requests), latencies, pickups, abandoned, solve_ms
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def main():
+    print(f"{DRIVERS} drivers, {REQUESTS_PER_MIN} requests/min for {MINUTES} min, {STEP_SECONDS:g}s batches")
+    print(f"{'strategy':<10} {'matched':>8} {'abandoned':>10} {'pickup km':>10} {'mean km':>8} {'p50 s':>6} {'p95 s':>6} {'solve ms':>9}")
+    for strategy in ("broadcast", "greedy", "batched"):
+        total, latencies, pickups, abandoned, solve_ms = replay(strategy)
+        solve = f"{sum(solve_ms) / len(solve_ms):.2f}" if solve_ms else "-"
+        print(
+            f"{strategy:<10} {len(pickups):>8} {abandoned:>10} {sum(pickups):>10.0f} "
+            f"{sum(pickups) / len(pickups):>8.2f} {percentile(latencies, 0.5):>6.1f} "
+            f"{percentile(latencies, 0.95):>6.1f} {solve:>9}"
+        )
+
+if __name__ == "__main__":
+    main()
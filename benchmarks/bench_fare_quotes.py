@@ -0,0 +1,70 @@
+"""Compare pricing vehicle types one at a time with the vectorized fare engine.
+
+The scalar path mirrors taxi_app/backend/pricing/priceCalculator.js: one call
+per vehicle type per trip. The engine prices every vehicle type for a trip in
+one ``quote_all`` call, and many trips at once with ``quote_matrix``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fare_quotes
+"""
+import math
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+
+from utils.pricing import fare_engine
+
+TRIPS = 1000
+REPEAT = 200
+
+def scalar_quote(table, row: int, distance_km: float, duration_min: float) -> float:
+    """Total fare for one vehicle type, computed field by field like the Node calculator."""
+    metered = table.base_fare[row] + distance_km * table.per_km[row] + duration_min * table.per_min[row]
+    subtotal = math.floor(max(metered, table.min_fare[row]) * table.surge(None) + 0.5)
+    return subtotal + math.floor(subtotal * table.tax_rate + 0.5)
+
+def best_of(fn, repeat: int) -> float:
+    """Best per-call time over ``repeat`` calls in five rounds, in microseconds."""
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        timings.append((time.perf_counter() - start) / repeat)
+    return min(timings) * 1_000_000
+
+def main():
+    random.seed(7)
+    table = fare_engine.table
+    rows = range(len(table.vehicle_types))
+    distances = np.array([random.uniform(0.5, 40) for _ in range(TRIPS)])
+    durations = distances / 25 * 60
+
+    # Price at midday so the night surcharge never applies
+    noon = datetime.now().replace(hour=12)
+
+    matrix = fare_engine.quote_matrix(distances, durations, at=noon)["total"]
+    for trip in range(0, TRIPS, 97):
+        for row in rows:
+            assert matrix[trip, row] == scalar_quote(table, row, distances[trip], durations[trip]), "quotes differ"
+
+    one_trip = lambda: [scalar_quote(table, row, distances[0], durations[0]) for row in rows]
+    all_trips = lambda: [[scalar_quote(table, row, d, t) for row in rows] for d, t in zip(distances, durations)]
+
+    cases = [
+        ("one trip", one_trip, lambda: fare_engine.quote_all(distances[0], durations[0], at=noon), REPEAT * 10),
+        (f"{TRIPS} trips", all_trips, lambda: fare_engine.quote_matrix(distances, durations, at=noon), REPEAT // 10),
+    ]
+
+    print(f"{len(table.vehicle_types)} vehicle types: {', '.join(table.vehicle_types)}")
+    print(f"{'workload':<12} {'scalar us':>12} {'engine us':>12} {'speedup':>10}")
+    for name, scalar, engine, repeat in cases:
+        scalar_us = best_of(scalar, repeat)
+        engine_us = best_of(engine, repeat)
+        print(f"{name:<12} {scalar_us:>12.1f} {engine_us:>12.1f} {scalar_us / engine_us:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compare the scalar haversine loop with the vectorized batch engine.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_haversine
+"""
+import random
+import time
+
+import numpy as np
+
+from utils.geo import haversine_km, haversine_many
+
+SIZES = [1_000, 10_000, 100_000]
+REPEAT = 5
+
+def best_of(fn, repeat: int = REPEAT) -> float:
+    """Best wall-clock time of ``repeat`` runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def random_points(count: int, lat: float = 12.97, lng: float = 77.59, spread: float = 0.3):
+    lats = [lat + random.uniform(-spread, spread) for _ in range(count)]
+    lngs = [lng + random.uniform(-spread, spread) for _ in range(count)]
+    return lats, lngs
+
+def main():
+    random.seed(42)
+    pickup_lat, pickup_lng = 12.9716, 77.5946
+
+    print("one pickup vs N drivers")
+    print(f"{'drivers':>10} {'scalar ms':>12} {'batch ms':>12} {'speedup':>10}")
+    for size in SIZES:
+        lats, lngs = random_points(size)
+        lat_array, lng_array = np.array(lats), np.array(lngs)
+
+        scalar_ms = best_of(lambda: [
+            haversine_km(pickup_lat, pickup_lng, lat, lng) for lat, lng in zip(lats, lngs)
+        ])
+        batch_ms = best_of(lambda: haversine_many(pickup_lat, pickup_lng, lat_array, lng_array))
+
+        expected = [haversine_km(pickup_lat, pickup_lng, lat, lng) for lat, lng in zip(lats, lngs)]
+        assert np.allclose(haversine_many(pickup_lat, pickup_lng, lat_array, lng_array), expected)
+
+        print(f"{size:>10} {scalar_ms:>12.2f} {batch_ms:>12.2f} {scalar_ms / batch_ms:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
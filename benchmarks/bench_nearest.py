@@ -0,0 +1,92 @@
+"""Compare the fixed-radius driver search with the expanding k-nearest search.
+
+The old request path asked for every driver within 10 km and kept the
+nearest five. ``nearest`` grows its search in rings until it has five, so it
+does less work where drivers are dense and still finds drivers beyond 10 km
+where they are sparse.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_nearest
+"""
+import math
+import random
+import time
+
+import numpy as np
+
+from utils.geo import haversine_many
+from utils.spatial_index import DriverIndex
+
+K = 5
+OLD_RADIUS_KM = 10.0
+QUERIES = 500
+
+SCENARIOS = [
+    # name, drivers, spread in degrees around the city centre
+    ("dense core", 20_000, 0.15),
+    ("city", 5_000, 0.3),
+    ("sparse", 40, 0.6),
+]
+
+def build(drivers: int, spread: float) -> DriverIndex:
+    index = DriverIndex()
+    for driver_id in range(drivers):
+        index.upsert(
+            driver_id,
+            12.97 + random.uniform(-spread, spread),
+            77.59 + random.uniform(-spread, spread),
+            random.choice(["Bike", "Standard", "Premium"])
+        )
+    return index
+
+def radius_search(index: DriverIndex, lat: float, lng: float, radius_km: float, limit: int):
+    """The old search: every driver in the cells covering the radius, nearest ``limit`` kept."""
+    lat_steps = math.ceil(radius_km / index.cell_size_km)
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    lng_steps = math.ceil(radius_km / (index.cell_size_km * cos_lat))
+
+    center_row, center_col = index.cell_for(lat, lng)
+    ids, lats, lngs = [], [], []
+    for row in range(center_row - lat_steps, center_row + lat_steps + 1):
+        for col in range(center_col - lng_steps, center_col + lng_steps + 1):
+            for driver_id, (driver_lat, driver_lng) in index._cells.get((row, col), {}).items():
+                ids.append(driver_id)
+                lats.append(driver_lat)
+                lngs.append(driver_lng)
+    if not ids:
+        return []
+
+    distances = haversine_many(lat, lng, lats, lngs)
+    within = np.flatnonzero(distances <= radius_km)
+    if len(within) > limit:
+        within = within[np.argpartition(distances[within], limit - 1)[:limit]]
+    within = within[np.argsort(distances[within], kind="stable")]
+    return [(ids[i], float(distances[i])) for i in within]
+
+def timed(fn, queries) -> tuple:
+    """Mean time per query in microseconds, and how many queries found K drivers."""
+    start = time.perf_counter()
+    full = sum(1 for lat, lng in queries if len(fn(lat, lng)) == K)
+    return (time.perf_counter() - start) / len(queries) * 1_000_000, full
+
+def main():
+    random.seed(8)
+    print(f"{'scenario':<12} {'search':<24} {'us/query':>10} {'found 5':>9}")
+    for name, drivers, spread in SCENARIOS:
+        index = build(drivers, spread)
+        queries = [
+            (12.97 + random.uniform(-spread, spread), 77.59 + random.uniform(-spread, spread))
+            for _ in range(QUERIES)
+        ]
+        cases = [
+            ("radius 10 km, top 5", lambda lat, lng: radius_search(index, lat, lng, OLD_RADIUS_KM, K)),
+            ("nearest k=5", lambda lat, lng: index.nearest(lat, lng, K)),
+            ("nearest k=5 Standard", lambda lat, lng: index.nearest(lat, lng, K, vehicle_type="Standard")),
+        ]
+        for search, fn in cases:
+            us, full = timed(fn, queries)
+            print(f"{name:<12} {search:<24} {us:>10.1f} {full:>6}/{QUERIES}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Drive thousands of concurrent ride requests through the offer scheduler.
+
+Every request is offered in waves to its nearest drivers and nobody
+accepts, so each one times out through all its waves. The scheduler serves
+every deadline from one heap and one task; the straightforward alternative
+is a task per request sleeping out each wave. Reported: how long after its
+ideal end (waves x timeout) each request was given up, the peak memory of
+the run and the number of tasks involved.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_offers
+"""
+import asyncio
+import random
+import time
+import tracemalloc
+
+from utils.offers import OfferScheduler
+from utils.spatial_index import DriverIndex
+
+REQUESTS = 5000
+DRIVERS = 3000
+WAVE_SIZE = 5
+WAVES = 3
+TIMEOUT = 0.5
+
+class Connections:
+    """Stands in for the WebSocket manager."""
+
+    def __init__(self):
+        self.messages = 0
+
+    async def broadcast_to_drivers(self, message, driver_ids):
+        self.messages += len(driver_ids)
+
+def build_index() -> DriverIndex:
+    index = DriverIndex()
+    for driver_id in range(DRIVERS):
+        index.upsert(driver_id, 12.97 + random.uniform(-0.2, 0.2), 77.59 + random.uniform(-0.2, 0.2))
+    return index
+
+def pickups():
+    return [(12.97 + random.uniform(-0.2, 0.2), 77.59 + random.uniform(-0.2, 0.2)) for _ in range(REQUESTS)]
+
+async def with_scheduler(index, points):
+    connections = Connections()
+    scheduler = OfferScheduler(index, connections, WAVE_SIZE, TIMEOUT, WAVES)
+    started, done = {}, {}
+
+    async def exhausted(ride_id, passenger_id):
+        done[ride_id] = time.perf_counter()
+
+    runner = asyncio.create_task(scheduler.run(exhausted))
+    await asyncio.sleep(0)
+    for ride_id, (lat, lng) in enumerate(points):
+        started[ride_id] = time.perf_counter()
+        await scheduler.start(ride_id, ride_id, lat, lng, {"type": "ride_request", "ride_id": ride_id})
+    while len(done) < REQUESTS:
+        await asyncio.sleep(0.05)
+    runner.cancel()
+    return started, done, 1
+
+async def with_tasks(index, points):
+    connections = Connections()
+    started, done = {}, {}
+
+    async def offer(ride_id, lat, lng):
+        offered = set()
+        for _ in range(WAVES):
+            driver_ids = [driver_id for driver_id, _ in index.nearest(lat, lng, WAVE_SIZE, exclude=offered)]
+            offered.update(driver_ids)
+            await connections.broadcast_to_drivers({"type": "ride_request", "ride_id": ride_id}, driver_ids)
+            await asyncio.sleep(TIMEOUT)
+            await connections.broadcast_to_drivers({"type": "ride_offer_expired", "ride_id": ride_id}, driver_ids)
+        done[ride_id] = time.perf_counter()
+
+    tasks = []
+    for ride_id, (lat, lng) in enumerate(points):
+        started[ride_id] = time.perf_counter()
+        tasks.append(asyncio.create_task(offer(ride_id, lat, lng)))
+    await asyncio.gather(*tasks)
+    return started, done, len(tasks)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main():
+    random.seed(2)
+    index = build_index()
+    points = pickups()
+    print(f"{REQUESTS} open requests, {WAVES} waves of {TIMEOUT:g}s to {WAVE_SIZE} drivers, {DRIVERS} drivers online")
+    print(f"{'approach':<18} {'tasks':>6} {'wall s':>7} {'overrun p50 ms':>15} {'p99 ms':>7} {'peak MiB':>9}")
+    for name, runner in (("heap scheduler", with_scheduler), ("task per request", with_tasks)):
+        wall = time.perf_counter()
+        started, done, tasks = asyncio.run(runner(index, points))
+        wall = time.perf_counter() - wall
+        overrun = [(done[ride_id] - started[ride_id] - WAVES * TIMEOUT) * 1000 for ride_id in done]
+
+        # Separate run: tracing slows everything down too much to time
+        tracemalloc.start()
+        asyncio.run(runner(index, points))
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+        print(
+            f"{name:<18} {tasks:>6} {wall:>7.2f} {percentile(overrun, 0.5):>15.1f} "
+            f"{percentile(overrun, 0.99):>7.1f} {peak:>9.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
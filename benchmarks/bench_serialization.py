@@ -0,0 +1,121 @@
+"""Compare the hand-built dict + StandardResponse path with the shared serializers.
+
+Encodes a 50-ride driver ride list the way the endpoint used to (dict with
+``isoformat()`` chains, validated and dumped through the response model, then
+``json.dumps``) and the way it does now (``View`` + orjson), plus a single
+ride message as sent over WebSocket.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+import time
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from models.database import Driver, Passenger, Ride
+from models.schemas import StandardResponse
+from utils.serializers import driver_ride, dumps
+
+RIDES = 50
+REPEAT = 2000
+
+def make_rides(count: int):
+    now = datetime.utcnow()
+    rides = []
+    for i in range(count):
+        passenger = Passenger(id=i + 1, full_name=f"Passenger {i}", phone=f"+91-{i:010d}")
+        rides.append(Ride(
+            id=i + 1, passenger=passenger, driver=Driver(id=1),
+            pickup_lat=12.97 + i / 1000, pickup_lng=77.59, pickup_address="MG Road",
+            drop_lat=12.99, drop_lng=77.61 + i / 1000, drop_address="Indiranagar",
+            city="Bangalore", status="completed", fare=150.0 + i, distance_km=5.5, duration_minutes=21.0,
+            requested_at=now - timedelta(minutes=i), accepted_at=now, arrived_at=now, started_at=now,
+            completed_at=now, cancelled_at=None, payment_status="paid", notes=None
+        ))
+    return rides
+
+def legacy_ride(ride) -> dict:
+    """The per-router dict the endpoints built before the shared serializers."""
+    ride_data = {
+        "id": ride.id,
+        "pickup_lat": ride.pickup_lat,
+        "pickup_lng": ride.pickup_lng,
+        "pickup_address": ride.pickup_address,
+        "drop_lat": ride.drop_lat,
+        "drop_lng": ride.drop_lng,
+        "drop_address": ride.drop_address,
+        "city": ride.city,
+        "status": ride.status,
+        "fare": ride.fare,
+        "distance_km": ride.distance_km,
+        "duration_minutes": ride.duration_minutes,
+        "requested_at": ride.requested_at.isoformat(),
+        "accepted_at": ride.accepted_at.isoformat() if ride.accepted_at else None,
+        "arrived_at": ride.arrived_at.isoformat() if ride.arrived_at else None,
+        "started_at": ride.started_at.isoformat() if ride.started_at else None,
+        "completed_at": ride.completed_at.isoformat() if ride.completed_at else None,
+        "cancelled_at": ride.cancelled_at.isoformat() if ride.cancelled_at else None,
+        "payment_status": ride.payment_status,
+        "notes": ride.notes
+    }
+    passenger = ride.passenger
+    if passenger:
+        ride_data["passenger"] = {
+            "id": passenger.id,
+            "full_name": passenger.full_name,
+            "phone": passenger.phone
+        }
+    return ride_data
+
+response_adapter = TypeAdapter(StandardResponse)
+
+def legacy_list(rides) -> bytes:
+    """Handler builds a StandardResponse; FastAPI validates, dumps and json-encodes it."""
+    response = StandardResponse(
+        success=True,
+        message="Rides retrieved successfully",
+        data={"rides": [legacy_ride(ride) for ride in rides]}
+    )
+    content = response_adapter.dump_python(response_adapter.validate_python(response), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def shared_list(rides) -> bytes:
+    return dumps({
+        "success": True,
+        "message": "Rides retrieved successfully",
+        "data": {"rides": [driver_ride(ride) for ride in rides]}
+    })
+
+def best_of(fn, repeat: int = REPEAT) -> float:
+    """Best per-call time over ``repeat`` calls in five rounds, in microseconds."""
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        timings.append((time.perf_counter() - start) / repeat)
+    return min(timings) * 1_000_000
+
+def main():
+    rides = make_rides(RIDES)
+    assert json.loads(legacy_list(rides)) == json.loads(shared_list(rides)), "payloads differ"
+
+    ride = rides[0]
+    message = lambda payload: {"type": "ride_update", "ride": payload}
+
+    cases = [
+        (f"{RIDES}-ride list (HTTP)", lambda: legacy_list(rides), lambda: shared_list(rides)),
+        ("one ride (WebSocket)", lambda: json.dumps(message(legacy_ride(ride))), lambda: dumps(message(driver_ride(ride)))),
+    ]
+
+    print(f"{'payload':<24} {'legacy us':>12} {'shared us':>12} {'speedup':>10}")
+    for name, legacy, shared in cases:
+        legacy_us = best_of(legacy)
+        shared_us = best_of(shared)
+        print(f"{name:<24} {legacy_us:>12.1f} {shared_us:>12.1f} {legacy_us / shared_us:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Simulate a city hour and measure the surge engine.
+
+Drivers roam a 20 x 20 km area and send positions through the driver index,
+which feeds the surge engine. Passengers request rides at a steady rate,
+with a demand spike in one zone between minutes 15 and 35. Open requests
+are matched to the nearest free driver, who is busy for the trip and then
+reappears elsewhere; unmatched passengers give up after five minutes.
+
+Reports the multiplier of the spike zone over time, the cost of a tick and
+of the event hooks, and a multiplier lookup against recounting the zone
+from the raw ride and driver lists (what a query-per-quote design does,
+minus the database round trip).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_surge
+"""
+import math
+import random
+import time
+
+from utils.spatial_index import DriverIndex
+from utils.surge import SurgeEngine
+
+ORIGIN = (12.90, 77.50)
+SIZE_DEG = 0.18  # ~20 km
+DRIVERS = 1500
+TICK_SECONDS = 10
+MINUTES = 60
+BASE_REQUESTS_PER_MIN = 60
+SPIKE = (15, 35)
+SPIKE_REQUESTS_PER_MIN = 12
+SPIKE_CENTER = (12.99, 77.59)
+MATCH_RADIUS_KM = 2.5
+PATIENCE_TICKS = 30
+TRIP_TICKS = (60, 150)
+
+def random_point():
+    return ORIGIN[0] + random.random() * SIZE_DEG, ORIGIN[1] + random.random() * SIZE_DEG
+
+def spike_point():
+    return SPIKE_CENTER[0] + random.uniform(-0.008, 0.008), SPIKE_CENTER[1] + random.uniform(-0.008, 0.008)
+
+def poisson(rate: float) -> int:
+    # Knuth's method; rates per tick are small
+    limit, count, product = math.exp(-rate), 0, random.random()
+    while product > limit:
+        count += 1
+        product *= random.random()
+    return count
+
+def recount_zone(engine, lat, lng, open_rides, drivers) -> float:
+    """Multiplier inputs recomputed from scratch for one zone."""
+    cell = engine.cell_for(lat, lng)
+    demand = sum(1 for ride_lat, ride_lng in open_rides.values() if engine.cell_for(ride_lat, ride_lng) == cell)
+    supply = sum(1 for driver_lat, driver_lng in drivers.values() if engine.cell_for(driver_lat, driver_lng) == cell)
+    return demand / max(supply, 1)
+
+def simulate():
+    random.seed(11)
+    index = DriverIndex()
+    engine = SurgeEngine(tick_seconds=TICK_SECONDS)
+    index.subscribe(engine)
+
+    positions = {driver_id: random_point() for driver_id in range(DRIVERS)}
+    for driver_id, (lat, lng) in positions.items():
+        index.upsert(driver_id, lat, lng)
+
+    open_rides = {}     # ride_id -> (lat, lng)
+    requested_tick = {}
+    busy_until = {}     # driver_id -> tick the trip ends
+    next_ride_id = 0
+    tick_ms = []
+    hook_seconds = 0.0
+    hook_events = 0
+    timeline = []
+
+    ticks = MINUTES * 60 // TICK_SECONDS
+    for tick in range(ticks):
+        now = tick * TICK_SECONDS
+        minute = now / 60
+
+        # Free drivers move a little; finished trips drop drivers somewhere new
+        started = time.perf_counter()
+        for driver_id, end in list(busy_until.items()):
+            if end <= tick:
+                del busy_until[driver_id]
+                index.release(driver_id)
+                positions[driver_id] = random_point()
+                index.upsert(driver_id, *positions[driver_id])
+        for driver_id in positions:
+            if driver_id in busy_until:
+                continue
+            lat, lng = positions[driver_id]
+            positions[driver_id] = (lat + random.uniform(-0.001, 0.001), lng + random.uniform(-0.001, 0.001))
+            index.upsert(driver_id, *positions[driver_id])
+            hook_events += 1
+
+        # New requests
+        rate = BASE_REQUESTS_PER_MIN * TICK_SECONDS / 60
+        points = [random_point() for _ in range(poisson(rate))]
+        if SPIKE[0] <= minute < SPIKE[1]:
+            points += [spike_point() for _ in range(poisson(SPIKE_REQUESTS_PER_MIN * TICK_SECONDS / 60))]
+        for lat, lng in points:
+            open_rides[next_ride_id] = (lat, lng)
+            requested_tick[next_ride_id] = tick
+            engine.ride_requested(next_ride_id, lat, lng, now)
+            next_ride_id += 1
+            hook_events += 1
+
+        # Match, oldest first; give up after PATIENCE_TICKS
+        for ride_id, (lat, lng) in list(open_rides.items()):
+            nearest = index.nearest(lat, lng, 1, MATCH_RADIUS_KM)
+            if nearest:
+                driver_id = nearest[0][0]
+                index.reserve(driver_id)
+                busy_until[driver_id] = tick + random.randint(*TRIP_TICKS)
+            elif tick - requested_tick[ride_id] < PATIENCE_TICKS:
+                continue
+            del open_rides[ride_id]
+            engine.ride_closed(ride_id)
+            hook_events += 1
+        hook_seconds += time.perf_counter() - started
+
+        engine.tick(now)
+        tick_ms.append(engine.last_tick_ms)
+
+        if tick % (120 // TICK_SECONDS) == 0:
+            free = {d: p for d, p in positions.items() if d not in busy_until}
+            timeline.append((
+                minute,
+                engine.multiplier_at(*SPIKE_CENTER) or 1.0,
+                recount_zone(engine, *SPIKE_CENTER, open_rides, free),
+                engine.stats()["surging_zones"]
+            ))
+
+    return index, engine, positions, busy_until, open_rides, tick_ms, hook_seconds, hook_events, timeline
+
+def best_of(fn, repeat: int) -> float:
+    """Best per-call time over ``repeat`` calls in five rounds, in microseconds."""
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        timings.append((time.perf_counter() - start) / repeat)
+    return min(timings) * 1_000_000
+
+def main():
+    index, engine, positions, busy_until, open_rides, tick_ms, hook_seconds, hook_events, timeline = simulate()
+
+    print(f"{'minute':>6} {'spike zone x':>13} {'demand/supply now':>18} {'surging zones':>14}")
+    for minute, multiplier, ratio, surging in timeline:
+        print(f"{minute:>6.0f} {multiplier:>13.2f} {ratio:>18.2f} {surging:>14}")
+
+    # Event hook overhead: index updates with and without the engine subscribed
+    plain = DriverIndex()
+    sample = list(positions.items())[:1000]
+    def move_all(target):
+        for driver_id, (lat, lng) in sample:
+            target.upsert(driver_id, lat + random.uniform(-0.01, 0.01), lng)
+    plain_us = best_of(lambda: move_all(plain), 20) / len(sample)
+    index.clear()
+    hooked_us = best_of(lambda: move_all(index), 20) / len(sample)
+
+    free = {d: p for d, p in positions.items() if d not in busy_until}
+    lookup_us = best_of(lambda: engine.multiplier_at(*SPIKE_CENTER), 100000)
+    recount_us = best_of(lambda: recount_zone(engine, *SPIKE_CENTER, open_rides, free), 200)
+
+    print()
+    print(f"simulation: {len(tick_ms)} ticks, {hook_events} events, {hook_seconds * 1000:.0f} ms in event handling + matching")
+    print(f"tick: avg {sum(tick_ms) / len(tick_ms):.3f} ms, max {max(tick_ms):.3f} ms")
+    print(f"driver update: {plain_us:.2f} us plain index, {hooked_us:.2f} us with surge subscribed")
+    print(f"multiplier lookup: {lookup_us:.3f} us engine vs {recount_us:.1f} us recount ({recount_us / lookup_us:.0f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Assert the ride listing endpoints run a fixed number of queries.
+
+Seeds riders and drivers with 1, 10 and 50 rides each, each ride paired
+with a different counterpart, then calls every listing endpoint and counts
+the SQL statements it executes. The count must not grow with the number of
+rides (no N+1 loads of ride.passenger / ride.driver).
+
+Run from the repository root (exits non-zero on a regression):
+
+    python -m benchmarks.check_query_counts
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+_db_dir = tempfile.mkdtemp(prefix="ridenow_queries_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'queries.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import event, insert
+
+from models.database import async_engine, engine, AsyncSessionLocal, create_tables, User, Passenger, Driver, Ride
+from routers.drivers import get_driver_rides
+from routers.passengers import get_active_rides, get_ride_history
+from routers.rides import get_ride_details
+
+RIDE_COUNTS = [1, 10, 50]
+PAGE_SIZE = 50
+# Queries each endpoint may run regardless of the number of rides
+EXPECTED_QUERIES = 1
+
+ACTIVE_STATUSES = ["requested", "accepted", "arrived", "started"]
+
+def seed():
+    """Passenger i and driver i own RIDE_COUNTS[i] rides, each with a distinct counterpart."""
+    counterparts = max(RIDE_COUNTS)
+    people = len(RIDE_COUNTS) + counterparts
+    now = datetime.utcnow()
+
+    users, passengers, drivers = [], [], []
+    for i in range(1, people + 1):
+        users.append({"id": 2 * i - 1, "phone": f"p-{i}", "password": "x", "full_name": f"P{i}", "user_type": "passenger"})
+        users.append({"id": 2 * i, "phone": f"d-{i}", "password": "x", "full_name": f"D{i}", "user_type": "driver"})
+        passengers.append({"id": i, "user_id": 2 * i - 1, "phone": f"p-{i}", "full_name": f"P{i}"})
+        drivers.append({
+            "id": i, "user_id": 2 * i, "phone": f"d-{i}", "full_name": f"D{i}", "license_number": f"L-{i}",
+            "vehicle_number": f"V-{i}", "vehicle_type": "car", "current_lat": 12.97, "current_lng": 77.59
+        })
+
+    rides = []
+
+    def ride(passenger_id, driver_id, status, minutes_ago):
+        rides.append({
+            "passenger_id": passenger_id, "driver_id": driver_id,
+            "pickup_lat": 12.97, "pickup_lng": 77.59, "pickup_address": "A",
+            "drop_lat": 12.99, "drop_lng": 77.61, "drop_address": "B",
+            "city": "Bangalore", "status": status, "fare": 150.0,
+            "requested_at": now - timedelta(minutes=minutes_ago)
+        })
+
+    first_counterpart = len(RIDE_COUNTS) + 1
+    for owner, count in enumerate(RIDE_COUNTS, start=1):
+        for n in range(count):
+            counterpart = first_counterpart + n
+            # Passenger history and driver rides
+            ride(owner, counterpart, "completed", n)
+            ride(counterpart, owner, "completed", n)
+            # Passenger active rides (only one is possible in practice; this checks scaling)
+            ride(owner, counterpart, ACTIVE_STATUSES[n % len(ACTIVE_STATUSES)], n)
+
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), users)
+        connection.execute(insert(Passenger.__table__), passengers)
+        connection.execute(insert(Driver.__table__), drivers)
+        connection.execute(insert(Ride.__table__), rides)
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+async def count_queries(counter: QueryCounter, handler, load_principal) -> int:
+    async with AsyncSessionLocal() as db:
+        # The principal comes from the auth dependency; load it outside the count
+        principal = await load_principal(db)
+        counter.count = 0
+        await handler(db, principal)
+        return counter.count
+
+ENDPOINTS = {
+    "GET /drivers/rides": (
+        Driver, lambda db, driver: get_driver_rides(cursor=None, limit=PAGE_SIZE, current_driver=driver, db=db)
+    ),
+    "GET /passengers/active-rides": (
+        Passenger, lambda db, passenger: get_active_rides(current_passenger=passenger, db=db)
+    ),
+    "GET /passengers/rides/history": (
+        Passenger, lambda db, passenger: get_ride_history(cursor=None, limit=PAGE_SIZE, current_passenger=passenger, db=db)
+    ),
+}
+
+async def main() -> int:
+    create_tables()
+    seed()
+
+    counter = QueryCounter()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", counter)
+
+    results = {}
+    for name, (model, handler) in ENDPOINTS.items():
+        results[name] = [
+            await count_queries(counter, handler, lambda db, owner=owner: db.get(model, owner))
+            for owner in range(1, len(RIDE_COUNTS) + 1)
+        ]
+
+    async def no_principal(db):
+        return None
+
+    # Ride details: passenger and driver must come from the same query as the ride
+    results["GET /rides/{id}"] = [
+        await count_queries(counter, lambda db, _, ride_id=ride_id: get_ride_details(ride_id=ride_id, db=db), no_principal)
+        for ride_id in (1, 2, 3)
+    ]
+
+    await async_engine.dispose()
+
+    print(f"{'endpoint':<30}" + "".join(f"{f'{n} rides':>10}" for n in RIDE_COUNTS))
+    failures = 0
+    for name, counts in results.items():
+        print(f"{name:<30}" + "".join(f"{count:>10}" for count in counts))
+        failures += any(count != EXPECTED_QUERIES for count in counts)
+
+    if failures:
+        print(f"\n{failures} endpoint(s) ran more than {EXPECTED_QUERIES} query per request")
+        return 1
+    print(f"\nevery endpoint ran {EXPECTED_QUERIES} query regardless of ride count")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,201 @@
+"""EXPLAIN the hot ride queries against a seeded database and fail on full scans.
+
+Seeds passengers, drivers and rides, then checks that every hot query is
+answered from an index. On SQLite a plain ``SCAN <table>`` is a full table
+scan; on Postgres sequential scans are disabled for the session, so any
+``Seq Scan`` left in the plan means no usable index exists.
+
+Run from the repository root (exits non-zero on a regression):
+
+    python -m benchmarks.check_query_plans
+
+Set PLAN_CHECK_DATABASE_URL to check an empty scratch Postgres database
+instead of a throwaway SQLite file; the script creates and seeds its tables.
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+_db_dir = tempfile.mkdtemp(prefix="ridenow_plans_")
+os.environ["DATABASE_URL"] = os.getenv(
+    "PLAN_CHECK_DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'plans.db')}"
+)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import func, insert, select
+
+from models.database import engine, create_tables, User, Passenger, Driver, Ride, DriverDailyEarnings, ASSIGNED_RIDE_STATUSES
+from utils.pagination import newest_first
+
+PASSENGERS = 5_000
+DRIVERS = 2_000
+RIDES = 50_000
+
+ACTIVE_RIDE_STATUSES = ["requested"] + ASSIGNED_RIDE_STATUSES
+# Position of a keyset page cursor, halfway through the seeded 90 days
+CURSOR_AT = datetime.utcnow() - timedelta(days=45)
+STATUS_WEIGHTS = {"completed": 80, "cancelled": 12, "requested": 2, "accepted": 2, "arrived": 2, "started": 2}
+
+# The WHERE clauses used by the routers and the startup loaders
+HOT_QUERIES = {
+    "request_ride active-ride check": select(Ride).filter(
+        Ride.passenger_id == 42,
+        Ride.status.in_(ACTIVE_RIDE_STATUSES)
+    ),
+    "passengers /active-rides": select(Ride).filter(
+        Ride.passenger_id == 42,
+        Ride.status.in_(ACTIVE_RIDE_STATUSES)
+    ).order_by(Ride.requested_at.desc()),
+    "passengers /rides/history": newest_first(select(Ride).filter(
+        Ride.passenger_id == 42,
+        Ride.status.in_(["completed", "cancelled"])
+    ), None, 51),
+    "passengers /rides/history?cursor": newest_first(select(Ride).filter(
+        Ride.passenger_id == 42,
+        Ride.status.in_(["completed", "cancelled"])
+    ), (CURSOR_AT, 25_000), 51),
+    "drivers /rides": newest_first(select(Ride).filter(
+        Ride.driver_id == 42
+    ), None, 51),
+    "drivers /rides?cursor": newest_first(select(Ride).filter(
+        Ride.driver_id == 42
+    ), (CURSOR_AT, 25_000), 51),
+    "drivers /earnings totals": select(func.sum(DriverDailyEarnings.rides), func.sum(DriverDailyEarnings.earnings)).filter(
+        DriverDailyEarnings.driver_id == 42
+    ),
+    "drivers /earnings period": select(DriverDailyEarnings).filter(
+        DriverDailyEarnings.driver_id == 42,
+        DriverDailyEarnings.day >= CURSOR_AT.date()
+    ).order_by(DriverDailyEarnings.day),
+    "assigned rides (startup)": select(Ride.driver_id, Ride.id, Ride.passenger_id).filter(
+        Ride.driver_id.isnot(None),
+        Ride.status.in_(ASSIGNED_RIDE_STATUSES)
+    ),
+    "dispatchable drivers (startup)": select(Driver.id, Driver.current_lat, Driver.current_lng).filter(
+        Driver.is_online == True,
+        Driver.is_verified == True,
+        Driver.is_active == True,
+        Driver.current_lat.isnot(None),
+        Driver.current_lng.isnot(None)
+    ),
+    "login by phone": select(User).filter(
+        User.phone == "p-42",
+        User.user_type == "passenger",
+        User.is_active == True
+    ),
+}
+
+def seed():
+    random.seed(7)
+    now = datetime.utcnow()
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+
+    users = [
+        {"id": i + 1, "phone": f"p-{i + 1}", "password": "x", "full_name": f"P{i + 1}", "user_type": "passenger", "is_active": True}
+        for i in range(PASSENGERS)
+    ] + [
+        {"id": PASSENGERS + i + 1, "phone": f"d-{i + 1}", "password": "x", "full_name": f"D{i + 1}", "user_type": "driver", "is_active": True}
+        for i in range(DRIVERS)
+    ]
+    passengers = [
+        {"id": i + 1, "user_id": i + 1, "phone": f"p-{i + 1}", "full_name": f"P{i + 1}", "is_active": True}
+        for i in range(PASSENGERS)
+    ]
+    drivers = [
+        {
+            "id": i + 1, "user_id": PASSENGERS + i + 1, "phone": f"d-{i + 1}", "full_name": f"D{i + 1}",
+            "license_number": f"L-{i + 1}", "is_online": random.random() < 0.2, "is_verified": random.random() < 0.9,
+            "is_active": True, "current_lat": 12.9 + random.random() / 5, "current_lng": 77.5 + random.random() / 5
+        }
+        for i in range(DRIVERS)
+    ]
+    rides = []
+    for i in range(RIDES):
+        ride_status = random.choices(statuses, weights)[0]
+        requested_at = now - timedelta(minutes=random.randint(0, 60 * 24 * 90))
+        rides.append({
+            "id": i + 1,
+            "passenger_id": random.randint(1, PASSENGERS),
+            "driver_id": None if ride_status == "requested" else random.randint(1, DRIVERS),
+            "pickup_lat": 12.97, "pickup_lng": 77.59, "pickup_address": "A",
+            "drop_lat": 12.99, "drop_lng": 77.61, "drop_address": "B",
+            "city": "Bangalore",
+            "status": ride_status,
+            "fare": 150.0 if ride_status == "completed" else None,
+            "requested_at": requested_at,
+            "completed_at": requested_at + timedelta(minutes=25) if ride_status == "completed" else None
+        })
+
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), users)
+        connection.execute(insert(Passenger.__table__), passengers)
+        connection.execute(insert(Driver.__table__), drivers)
+        connection.execute(insert(Ride.__table__), rides)
+        connection.execute(insert(DriverDailyEarnings.__table__).from_select(
+            ["driver_id", "day", "rides", "earnings"],
+            select(Ride.driver_id, func.date(Ride.completed_at), func.count(), func.sum(Ride.fare))
+            .filter(Ride.status == "completed")
+            .group_by(Ride.driver_id, func.date(Ride.completed_at))
+        ))
+        connection.exec_driver_sql("ANALYZE")
+
+def compile_sql(statement) -> str:
+    return str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+def sqlite_plan(connection, sql: str):
+    """Plan lines and the tables read by a full scan."""
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    lines = [row[-1] for row in rows]
+    full_scans = [line for line in lines if line.startswith("SCAN ") and " USING " not in line]
+    return lines, full_scans
+
+def postgres_plan(connection, sql: str):
+    """Plan node summaries and the relations read by a sequential scan."""
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    lines, full_scans = [], []
+    pending = [plan[0]["Plan"]]
+    while pending:
+        node = pending.pop()
+        summary = node["Node Type"]
+        if "Index Name" in node:
+            summary += f" using {node['Index Name']}"
+        if "Relation Name" in node:
+            summary += f" on {node['Relation Name']}"
+        lines.append(summary)
+        if node["Node Type"] == "Seq Scan":
+            full_scans.append(summary)
+        pending.extend(node.get("Plans", []))
+    return lines, full_scans
+
+def main() -> int:
+    create_tables()
+    seed()
+
+    failures = 0
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.exec_driver_sql("SET enable_seqscan = off")
+            explain = postgres_plan
+        else:
+            explain = sqlite_plan
+
+        for name, statement in HOT_QUERIES.items():
+            lines, full_scans = explain(connection, compile_sql(statement))
+            verdict = "FULL SCAN" if full_scans else "ok"
+            failures += bool(full_scans)
+            print(f"{verdict:>9}  {name}")
+            for line in lines:
+                print(f"           {line}")
+
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries use an index")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
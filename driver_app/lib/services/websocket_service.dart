@@ -29,6 +29,12 @@ class WebSocketService {
         (message) {
           try {
             final data = jsonDecode(message) as Map<String, dynamic>;
+            
+            // Answer the server heartbeat, or the socket is closed as idle
+            if (data['type'] == 'ping') {
+              _channel?.sink.add(jsonEncode({'type': 'pong'}));
+              return;
+            }
             _messageController.add(data);
             
             if (kDebugMode) {
@@ -1,11 +1,25 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
 from dotenv import load_dotenv
+from sqlalchemy import select
 
-from models.database import create_tables
+from models.database import create_tables, AsyncSessionLocal, async_engine, pool_status, Driver, Passenger, Ride, ASSIGNED_RIDE_STATUSES
 from routers import auth, passengers, drivers, rides
+from utils.spatial_index import driver_index
+from utils.principal_cache import principal_cache
+from utils.auth import preload_principals
+from utils.location_store import location_store
+from utils.location_stream import location_fanout
+from utils.websocket_manager import manager as connection_manager
+from utils.backplane import create_backplane
+from utils.pricing import fare_engine
+from utils.surge import surge_engine
+from utils.dispatch import dispatcher, DISPATCH_MODE
+from utils.offers import offer_scheduler
+from utils.ride_stream import ride_stream
 
 load_dotenv()
 
@@ -18,11 +32,68 @@ async def lifespan(app: FastAPI):
     create_tables()
     print("✅ Database tables created successfully")
     
+    # Load online drivers into the in-memory spatial index; the surge engine
+    # counts supply from it and demand from the open ride requests
+    driver_index.subscribe(surge_engine)
+    async with AsyncSessionLocal() as db:
+        await driver_index.load(db)
+        await location_fanout.load(db)
+        await surge_engine.load(db)
+    print(f"📍 Driver index loaded with {len(driver_index)} online drivers")
+    
+    # Cache the accounts whose sockets reconnect right after a restart, so
+    # the WebSocket handshakes are authenticated without a query each
+    async with AsyncSessionLocal() as db:
+        cached = await preload_principals(db, "driver", Driver.is_online == True)
+        cached += await preload_principals(db, "passenger", Passenger.id.in_(
+            select(Ride.passenger_id).filter(Ride.status.in_(["requested"] + ASSIGNED_RIDE_STATUSES))
+        ))
+    print(f"🔑 Principal cache warmed with {cached} accounts")
+    
+    # Fail fast on a missing or broken pricing config
+    fare_engine.table
+    
+    # Relay WebSocket messages between workers when a backplane is configured
+    backplane = create_backplane()
+    if backplane is not None:
+        await connection_manager.attach_backplane(backplane)
+        print(f"📡 WebSocket backplane: {type(backplane).__name__}")
+    
+    # Write buffered driver locations in the background
+    location_flush_task = asyncio.create_task(location_store.run())
+    
+    # Update surge multipliers in the background
+    surge_task = asyncio.create_task(surge_engine.run())
+    
+    # Ping WebSocket clients and evict the ones that stopped answering
+    heartbeat_task = asyncio.create_task(connection_manager.run())
+    
+    # Batched dispatch offers each driver one ride per batch; otherwise
+    # requests are offered to the nearest drivers in timed waves
+    async with AsyncSessionLocal() as db:
+        if DISPATCH_MODE == "batched":
+            await dispatcher.load(db)
+            dispatch_task = asyncio.create_task(dispatcher.run(connection_manager.send_to_driver, rides.expire_unmatched_ride))
+            print(f"🧮 Batched dispatch every {dispatcher.batch_seconds}s")
+        else:
+            await offer_scheduler.load(db)
+            dispatch_task = asyncio.create_task(offer_scheduler.run(rides.expire_unmatched_ride))
+    
     print("🎯 RideNow Backend is ready!")
     yield
     
     # Shutdown
     print("🛑 Shutting down RideNow Backend...")
+    location_flush_task.cancel()
+    surge_task.cancel()
+    heartbeat_task.cancel()
+    dispatch_task.cancel()
+    await connection_manager.detach_backplane()
+    try:
+        await location_store.flush()
+    except Exception as e:
+        print(f"Failed to flush driver locations: {e}")
+    await async_engine.dispose()
 
 # Create FastAPI app
 app = FastAPI(
@@ -63,7 +134,17 @@ async def health_check():
     return {
         "status": "healthy",
         "database": "connected",
+        "database_pool": pool_status(),
+        "principal_cache": principal_cache.stats(),
+        "driver_locations": location_store.stats(),
+        "location_fanout": location_fanout.stats(),
+        "pricing": fare_engine.stats(),
+        "surge": surge_engine.stats(),
+        "dispatch": dispatcher.stats(),
+        "offers": offer_scheduler.stats(),
+        "ride_stream": ride_stream.stats(),
         "websockets": "active",
+        "websocket_connections": connection_manager.stats(),
         "endpoints": {
             "auth": "/api/auth",
             "passengers": "/api/passengers",
@@ -1,25 +1,201 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text
+from sqlalchemy import create_engine, event, inspect, Column, Integer, SmallInteger, String, Boolean, Date, DateTime, Float, ForeignKey, Index, Text, UniqueConstraint
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from datetime import datetime
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ridenow.db")
 
-# Use SQLite for development, PostgreSQL for production
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Connection pool configuration. DB_MAX_CONNECTIONS is the server-side budget
+# shared by every uvicorn worker (WEB_CONCURRENCY); when it is set and
+# DB_POOL_SIZE is not, each worker gets an equal slice with no overflow.
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", 1)), 1)
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 0))
+if os.getenv("DB_POOL_SIZE") is None and DB_MAX_CONNECTIONS > 0:
+    DB_POOL_SIZE = max(DB_MAX_CONNECTIONS // WEB_CONCURRENCY, 1)
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 0))
 else:
-    engine = create_engine(DATABASE_URL)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+
+# PgBouncer (transaction pooling) mode: pooling happens in PgBouncer, and
+# server-side prepared statements cannot be reused across transactions
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER", False)
+
+# SQLite dev engine tuning
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_WAL = _env_bool("SQLITE_WAL", True)
+
+class PoolMetrics:
+    """Checkout wait statistics for one connection pool class."""
+    
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def record(self, wait: float, timed_out: bool = False):
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if timed_out:
+            self.timeouts += 1
+    
+    def snapshot(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3)
+        }
+
+class _TimedPoolMixin:
+    """Measures how long each checkout waited for a free connection."""
+    
+    metrics: PoolMetrics
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+def _engine_options(url: str, is_async: bool) -> dict:
+    """Pool and driver options for an engine, driven by the DB_* settings."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    
+    if backend == "sqlite":
+        options = {} if is_async else {"connect_args": {"check_same_thread": False}}
+        if url.database in (None, "", ":memory:"):
+            return options
+        options["poolclass"] = TimedAsyncQueuePool if is_async else TimedQueuePool
+        options["pool_size"] = DB_POOL_SIZE
+        options["max_overflow"] = DB_MAX_OVERFLOW
+        options["pool_timeout"] = DB_POOL_TIMEOUT
+        return options
+    
+    connect_args = {}
+    if backend in ("postgres", "postgresql") and DB_STATEMENT_TIMEOUT_MS > 0:
+        if is_async:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    
+    if DB_PGBOUNCER:
+        if is_async:
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+        return {"poolclass": NullPool, "connect_args": connect_args}
+    
+    return {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args
+    }
+
+def _tune_sqlite(engine):
+    """Apply WAL and pragma tuning to every new SQLite connection."""
+    if engine.dialect.name != "sqlite":
+        return
+    
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-20000")
+        cursor.close()
+
+# Use SQLite for development, PostgreSQL for production
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, is_async=False))
+_tune_sqlite(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+Base = declarative_base(cls=AsyncAttrs)
 
-# Dependency to get DB session
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto the matching asyncio driver."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend in ("postgres", "postgresql"):
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg takes ``ssl`` rather than libpq's ``sslmode``
+        if "sslmode" in url.query:
+            url = url.update_query_dict({"ssl": url.query["sslmode"]}).difference_update_query(["sslmode"])
+        return url.render_as_string(hide_password=False)
+    return url.render_as_string(hide_password=False)
+
+# Async engine used by the API; the sync engine above stays available for scripts
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, is_async=True))
+_tune_sqlite(async_engine.sync_engine)
+
+# Objects stay usable after commit so handlers can serialize them without reloading
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def pool_status() -> dict:
+    """Utilization and checkout wait statistics for the API connection pool."""
+    pool = async_engine.sync_engine.pool
+    status = {"class": type(pool).__name__}
+    
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "utilization": round(checked_out / capacity, 3) if capacity else 0.0
+        })
+    
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status["checkout"] = metrics.snapshot()
+    return status
+
+# Dependency to get DB session (sync, for scripts)
 def get_db():
     db = SessionLocal()
     try:
@@ -27,6 +203,11 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get async DB session (used by the API routers)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # User model (base class for passengers and drivers)
 class User(Base):
     __tablename__ = "users"
@@ -80,6 +261,18 @@ class Driver(Base):
     
     # Relationship with rides
     rides = relationship("Ride", back_populates="driver")
+    
+    __table_args__ = (
+        # Drivers that can be dispatched (spatial index rebuild)
+        Index(
+            "ix_drivers_dispatchable", "current_lat", "current_lng",
+            postgresql_where=(is_online == True) & (is_verified == True) & (is_active == True),
+            sqlite_where=(is_online == True) & (is_verified == True) & (is_active == True)
+        ),
+    )
+
+# Statuses of a ride that a driver is currently serving
+ASSIGNED_RIDE_STATUSES = ["accepted", "arrived", "started"]
 
 # Ride model
 class Ride(Base):
@@ -105,6 +298,8 @@ class Ride(Base):
     fare = Column(Float)
     distance_km = Column(Float)
     duration_minutes = Column(Float)
+    surge_multiplier = Column(Float)  # locked in when the ride is requested
+    vehicle_type = Column(String)  # only offered to drivers of this type; NULL for any
     
     # Timestamps
     requested_at = Column(DateTime, default=datetime.utcnow)
@@ -121,7 +316,87 @@ class Ride(Base):
     # Relationships
     passenger = relationship("Passenger", back_populates="rides")
     driver = relationship("Driver", back_populates="rides")
+    
+    __table_args__ = (
+        # Active-ride check and passenger active rides
+        Index("ix_rides_passenger_status_requested", "passenger_id", "status", "requested_at"),
+        # Keyset pages over (requested_at, id): passenger history and driver ride list
+        Index("ix_rides_passenger_requested_id", "passenger_id", "requested_at", "id"),
+        Index("ix_rides_driver_requested_id", "driver_id", "requested_at", "id"),
+        # Driver completed rides (earnings rollup rebuilds)
+        Index("ix_rides_driver_status_completed", "driver_id", "status", "completed_at"),
+        # Rides in progress (driver assignments rebuilt at startup)
+        Index(
+            "ix_rides_assigned_driver", "driver_id",
+            postgresql_where=status.in_(ASSIGNED_RIDE_STATUSES),
+            sqlite_where=status.in_(ASSIGNED_RIDE_STATUSES)
+        ),
+    )
+
+# Append-only log of ride status changes, written in the same transaction as
+# each transition (see utils.ride_states). Read per ride in ``seq`` order, or
+# tailed by ``id`` for replay, analytics and cache rebuilds.
+class RideEvent(Base):
+    __tablename__ = "ride_events"
+    
+    id = Column(Integer, primary_key=True)
+    ride_id = Column(Integer, ForeignKey("rides.id"), nullable=False)
+    seq = Column(SmallInteger, nullable=False)  # position of the status in a ride's life
+    status = Column(String, nullable=False)
+    actor = Column(String)  # passenger, driver or system; NULL when backfilled
+    actor_id = Column(Integer)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # One event per status per ride, and a ride's history in order
+        UniqueConstraint("ride_id", "seq", name="uq_ride_events_ride_seq"),
+        # Time-range analytics
+        Index("ix_ride_events_created_at", "created_at"),
+    )
+
+# Per-driver daily totals of completed rides, maintained by complete_ride
+class DriverDailyEarnings(Base):
+    __tablename__ = "driver_daily_earnings"
+    
+    driver_id = Column(Integer, ForeignKey("drivers.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC date of completed_at
+    rides = Column(Integer, nullable=False, default=0)
+    earnings = Column(Float, nullable=False, default=0.0)
+
+# Alembic migrations, relative to the repository root
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic")
+
+class SchemaOutOfDate(RuntimeError):
+    """The database has not been migrated to the revision this code expects."""
 
 # Create all tables
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    """Create a new database at the latest schema, or check an existing one is migrated.
+    
+    ``create_all`` cannot add columns to tables that already exist, so a
+    database created by an older version must be upgraded with
+    ``alembic upgrade head`` before the app starts; until then startup
+    stops with ``SchemaOutOfDate``. A new database is created complete and
+    stamped with the latest revision.
+    """
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    
+    script = ScriptDirectory(MIGRATIONS_DIR)
+    head = script.get_current_head()
+    with engine.begin() as connection:
+        migration = MigrationContext.configure(connection)
+        if not inspect(connection).has_table(Ride.__tablename__):
+            Base.metadata.create_all(bind=connection)
+            migration.stamp(script, "head")
+            return
+        
+        # A revision this code does not know is newer (e.g. after a rollback) and is left alone
+        current = migration.get_current_revision()
+        known = {revision.revision for revision in script.walk_revisions()}
+        if current != head and (current is None or current in known):
+            raise SchemaOutOfDate(
+                f"Database schema is at revision {current or 'none (pre-migrations)'} but this "
+                f"version needs {head}. Run `alembic upgrade head` and start again."
+            )
+        Base.metadata.create_all(bind=connection)
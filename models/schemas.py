@@ -91,7 +91,7 @@ class RideBase(BaseModel):
     notes: Optional[str] = None
 
 class RideCreate(RideBase):
-    pass
+    vehicle_type: Optional[str] = None  # only offer to drivers of this type
 
 class RideResponse(RideBase):
     id: int
@@ -123,6 +123,16 @@ class RideComplete(BaseModel):
     final_fare: Optional[float] = None
     duration_minutes: Optional[float] = None
 
+class RideCancel(BaseModel):
+    reason: Optional[str] = None
+
+class FareEstimateRequest(BaseModel):
+    pickup_lat: float
+    pickup_lng: float
+    drop_lat: float
+    drop_lng: float
+    duration_minutes: Optional[float] = None  # estimated from distance when omitted
+
 # Auth schemas
 class Token(BaseModel):
     access_token: str
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from models.database import get_db, User, Passenger, Driver
+from models.database import get_async_db, User, Passenger, Driver
 from models.schemas import (
     PassengerCreate, PassengerResponse, DriverCreate, DriverResponse,
     LoginRequest, Token, StandardResponse
@@ -17,12 +18,12 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 @router.post("/passenger/register", response_model=StandardResponse)
 async def register_passenger(
     passenger_data: PassengerCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Register a new passenger."""
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.phone == passenger_data.phone).first()
+    existing_user = await db.scalar(select(User).filter(User.phone == passenger_data.phone))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -31,7 +32,7 @@ async def register_passenger(
     
     # Check if email already exists
     if passenger_data.email:
-        existing_email = db.query(User).filter(User.email == passenger_data.email).first()
+        existing_email = await db.scalar(select(User).filter(User.email == passenger_data.email))
         if existing_email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -49,7 +50,7 @@ async def register_passenger(
             user_type="passenger"
         )
         db.add(user)
-        db.flush()  # Get the user ID
+        await db.flush()  # Get the user ID
         
         # Create passenger profile
         passenger = Passenger(
@@ -59,7 +60,7 @@ async def register_passenger(
             email=passenger_data.email
         )
         db.add(passenger)
-        db.commit()
+        await db.commit()
         
         # Create access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -85,7 +86,7 @@ async def register_passenger(
         )
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
@@ -95,11 +96,11 @@ async def register_passenger(
 @router.post("/passenger/login", response_model=StandardResponse)
 async def login_passenger(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Authenticate passenger."""
     
-    user = authenticate_user(db, login_data.phone, login_data.password, "passenger")
+    user = await authenticate_user(db, login_data.phone, login_data.password, "passenger")
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -107,10 +108,10 @@ async def login_passenger(
         )
     
     # Get passenger profile
-    passenger = db.query(Passenger).filter(
+    passenger = await db.scalar(select(Passenger).filter(
         Passenger.user_id == user.id,
         Passenger.is_active == True
-    ).first()
+    ))
     
     if not passenger:
         raise HTTPException(
@@ -145,12 +146,12 @@ async def login_passenger(
 @router.post("/driver/register", response_model=StandardResponse)
 async def register_driver(
     driver_data: DriverCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Register a new driver."""
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.phone == driver_data.phone).first()
+    existing_user = await db.scalar(select(User).filter(User.phone == driver_data.phone))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -159,7 +160,7 @@ async def register_driver(
     
     # Check if email already exists
     if driver_data.email:
-        existing_email = db.query(User).filter(User.email == driver_data.email).first()
+        existing_email = await db.scalar(select(User).filter(User.email == driver_data.email))
         if existing_email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -168,9 +169,9 @@ async def register_driver(
     
     # Check if license number already exists
     if driver_data.license_number:
-        existing_license = db.query(Driver).filter(
+        existing_license = await db.scalar(select(Driver).filter(
             Driver.license_number == driver_data.license_number
-        ).first()
+        ))
         if existing_license:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -188,7 +189,7 @@ async def register_driver(
             user_type="driver"
         )
         db.add(user)
-        db.flush()  # Get the user ID
+        await db.flush()  # Get the user ID
         
         # Create driver profile
         driver = Driver(
@@ -201,7 +202,7 @@ async def register_driver(
             vehicle_type=driver_data.vehicle_type
         )
         db.add(driver)
-        db.commit()
+        await db.commit()
         
         # Create access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -232,7 +233,7 @@ async def register_driver(
         )
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
@@ -242,11 +243,11 @@ async def register_driver(
 @router.post("/driver/login", response_model=StandardResponse)
 async def login_driver(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Authenticate driver."""
     
-    user = authenticate_user(db, login_data.phone, login_data.password, "driver")
+    user = await authenticate_user(db, login_data.phone, login_data.password, "driver")
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -254,10 +255,10 @@ async def login_driver(
         )
     
     # Get driver profile
-    driver = db.query(Driver).filter(
+    driver = await db.scalar(select(Driver).filter(
         Driver.user_id == user.id,
         Driver.is_active == True
-    ).first()
+    ))
     
     if not driver:
         raise HTTPException(
@@ -1,19 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from datetime import datetime
-from models.database import get_db, Driver, Ride
+from typing import Optional
+from models.database import get_async_db, Driver, Passenger, Ride
 from models.schemas import DriverResponse, DriverLocationUpdate, DriverStatusUpdate, StandardResponse
 from utils.auth import get_current_driver
+from utils.spatial_index import sync_driver
+from utils.location_store import location_store
+from utils.earnings import earnings_summary
+from utils.pagination import ride_page, stream_rides, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.serializers import driver_ride, standard_response
 
 router = APIRouter(prefix="/drivers", tags=["drivers"])
 
+# Passenger columns serialized with each ride, loaded in the same query as the rides
+RIDE_PASSENGER = joinedload(Ride.passenger).load_only(Passenger.full_name, Passenger.phone)
+
 @router.get("/profile", response_model=StandardResponse)
 async def get_driver_profile(
     current_driver: Driver = Depends(get_current_driver),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current driver profile."""
     
+    current_lat, current_lng, last_location_update = location_store.position_of(current_driver)
+    
     return StandardResponse(
         success=True,
         message="Profile retrieved successfully",
@@ -27,9 +41,9 @@ async def get_driver_profile(
             "vehicle_type": current_driver.vehicle_type,
             "is_online": current_driver.is_online,
             "is_verified": current_driver.is_verified,
-            "current_lat": current_driver.current_lat,
-            "current_lng": current_driver.current_lng,
-            "last_location_update": current_driver.last_location_update.isoformat() if current_driver.last_location_update else None,
+            "current_lat": current_lat,
+            "current_lng": current_lng,
+            "last_location_update": last_location_update.isoformat() if last_location_update else None,
             "is_active": current_driver.is_active,
             "created_at": current_driver.created_at.isoformat()
         }
@@ -38,35 +52,27 @@ async def get_driver_profile(
 @router.put("/location", response_model=StandardResponse)
 async def update_driver_location(
     location_update: DriverLocationUpdate,
-    current_driver: Driver = Depends(get_current_driver),
-    db: Session = Depends(get_db)
+    current_driver: Driver = Depends(get_current_driver)
 ):
-    """Update driver location."""
+    """Update driver location.
     
-    try:
-        current_driver.current_lat = location_update.lat
-        current_driver.current_lng = location_update.lng
-        current_driver.last_location_update = datetime.utcnow()
-        
-        db.commit()
-        
-        return StandardResponse(
-            success=True,
-            message="Location updated successfully"
-        )
+    The position is used for matching right away and written to the
+    database by the background location flush.
+    """
     
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to update location: {str(e)}"
-        )
+    location_store.update(current_driver.id, location_update.lat, location_update.lng)
+    sync_driver(current_driver, location_update.lat, location_update.lng)
+    
+    return StandardResponse(
+        success=True,
+        message="Location updated successfully"
+    )
 
 @router.put("/status", response_model=StandardResponse)
 async def update_driver_status(
     status_update: DriverStatusUpdate,
     current_driver: Driver = Depends(get_current_driver),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update driver online/offline status."""
     
@@ -79,8 +85,12 @@ async def update_driver_status(
             current_driver.current_lat = None
             current_driver.current_lng = None
             current_driver.last_location_update = None
+            location_store.discard(current_driver.id)
+        
+        await db.commit()
         
-        db.commit()
+        current_lat, current_lng, _ = location_store.position_of(current_driver)
+        sync_driver(current_driver, current_lat, current_lng)
         
         status_text = "online" if status_update.is_online else "offline"
         return StandardResponse(
@@ -89,94 +99,58 @@ async def update_driver_status(
         )
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update status: {str(e)}"
         )
 
+def driver_rides_query(driver_id: int):
+    return select(Ride).options(RIDE_PASSENGER).filter(Ride.driver_id == driver_id)
+
 @router.get("/rides", response_model=StandardResponse)
 async def get_driver_rides(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_driver: Driver = Depends(get_current_driver),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get rides for current driver."""
+    """Get rides for current driver, newest first.
     
-    rides = db.query(Ride).filter(
-        Ride.driver_id == current_driver.id
-    ).order_by(Ride.requested_at.desc()).limit(50).all()
+    Pass the returned ``next_cursor`` back as ``cursor`` for the next page.
+    """
     
-    rides_data = []
-    for ride in rides:
-        ride_data = {
-            "id": ride.id,
-            "pickup_lat": ride.pickup_lat,
-            "pickup_lng": ride.pickup_lng,
-            "pickup_address": ride.pickup_address,
-            "drop_lat": ride.drop_lat,
-            "drop_lng": ride.drop_lng,
-            "drop_address": ride.drop_address,
-            "city": ride.city,
-            "status": ride.status,
-            "fare": ride.fare,
-            "distance_km": ride.distance_km,
-            "duration_minutes": ride.duration_minutes,
-            "requested_at": ride.requested_at.isoformat(),
-            "accepted_at": ride.accepted_at.isoformat() if ride.accepted_at else None,
-            "arrived_at": ride.arrived_at.isoformat() if ride.arrived_at else None,
-            "started_at": ride.started_at.isoformat() if ride.started_at else None,
-            "completed_at": ride.completed_at.isoformat() if ride.completed_at else None,
-            "cancelled_at": ride.cancelled_at.isoformat() if ride.cancelled_at else None,
-            "payment_status": ride.payment_status,
-            "notes": ride.notes
-        }
-        
-        # Add passenger info
-        if ride.passenger:
-            ride_data["passenger"] = {
-                "id": ride.passenger.id,
-                "full_name": ride.passenger.full_name,
-                "phone": ride.passenger.phone
-            }
-        
-        rides_data.append(ride_data)
+    rides, next_cursor = await ride_page(db, driver_rides_query(current_driver.id), cursor, limit)
     
-    return StandardResponse(
-        success=True,
-        message="Rides retrieved successfully",
-        data={"rides": rides_data}
+    return standard_response(
+        "Rides retrieved successfully",
+        {"rides": [driver_ride(ride) for ride in rides], "next_cursor": next_cursor}
+    )
+
+@router.get("/rides/export")
+async def export_driver_rides(
+    current_driver: Driver = Depends(get_current_driver)
+):
+    """Stream the driver's full ride history as NDJSON, newest first."""
+    
+    return StreamingResponse(
+        stream_rides(driver_rides_query(current_driver.id), driver_ride),
+        media_type="application/x-ndjson"
     )
 
 @router.get("/earnings", response_model=StandardResponse)
 async def get_driver_earnings(
+    period: str = Query("day", pattern="^(day|week|month)$"),
     current_driver: Driver = Depends(get_current_driver),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get earnings summary for current driver."""
+    """Get earnings summary for current driver.
     
-    # Get completed rides
-    completed_rides = db.query(Ride).filter(
-        Ride.driver_id == current_driver.id,
-        Ride.status == "completed",
-        Ride.fare.isnot(None)
-    ).all()
-    
-    total_rides = len(completed_rides)
-    total_earnings = sum(ride.fare or 0 for ride in completed_rides)
-    
-    # Calculate today's earnings
-    today = datetime.utcnow().date()
-    today_rides = [ride for ride in completed_rides if ride.completed_at and ride.completed_at.date() == today]
-    today_earnings = sum(ride.fare or 0 for ride in today_rides)
+    ``period`` selects the day, week (from Monday) or month broken down in ``daily``.
+    """
     
     return StandardResponse(
         success=True,
         message="Earnings retrieved successfully",
-        data={
-            "total_rides": total_rides,
-            "total_earnings": total_earnings,
-            "today_rides": len(today_rides),
-            "today_earnings": today_earnings,
-            "average_fare": total_earnings / total_rides if total_rides > 0 else 0
-        }
+        data=await earnings_summary(db, current_driver.id, period)
     )
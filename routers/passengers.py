@@ -1,15 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from models.database import get_db, Passenger
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Optional
+from models.database import get_async_db, Passenger, Driver, Ride
 from models.schemas import PassengerResponse, StandardResponse
 from utils.auth import get_current_passenger
+from utils.pagination import ride_page, stream_rides, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.serializers import history_ride, passenger_ride, standard_response
 
 router = APIRouter(prefix="/passengers", tags=["passengers"])
 
+# Driver columns serialized with each ride, loaded in the same query as the rides
+ACTIVE_RIDE_DRIVER = joinedload(Ride.driver).load_only(
+    Driver.full_name, Driver.phone, Driver.vehicle_number, Driver.vehicle_type,
+    Driver.current_lat, Driver.current_lng, Driver.last_location_update
+)
+HISTORY_RIDE_DRIVER = joinedload(Ride.driver).load_only(
+    Driver.full_name, Driver.vehicle_number, Driver.vehicle_type
+)
+
 @router.get("/profile", response_model=StandardResponse)
 async def get_passenger_profile(
     current_passenger: Passenger = Depends(get_current_passenger),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current passenger profile."""
     
@@ -29,105 +44,52 @@ async def get_passenger_profile(
 @router.get("/active-rides", response_model=StandardResponse)
 async def get_active_rides(
     current_passenger: Passenger = Depends(get_current_passenger),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get active rides for current passenger."""
     
-    from models.database import Ride
-    
-    active_rides = db.query(Ride).filter(
+    active_rides = (await db.scalars(select(Ride).options(ACTIVE_RIDE_DRIVER).filter(
         Ride.passenger_id == current_passenger.id,
         Ride.status.in_(["requested", "accepted", "arrived", "started"])
-    ).order_by(Ride.requested_at.desc()).all()
+    ).order_by(Ride.requested_at.desc()))).all()
     
-    rides_data = []
-    for ride in active_rides:
-        ride_data = {
-            "id": ride.id,
-            "pickup_lat": ride.pickup_lat,
-            "pickup_lng": ride.pickup_lng,
-            "pickup_address": ride.pickup_address,
-            "drop_lat": ride.drop_lat,
-            "drop_lng": ride.drop_lng,
-            "drop_address": ride.drop_address,
-            "city": ride.city,
-            "status": ride.status,
-            "fare": ride.fare,
-            "distance_km": ride.distance_km,
-            "duration_minutes": ride.duration_minutes,
-            "requested_at": ride.requested_at.isoformat(),
-            "accepted_at": ride.accepted_at.isoformat() if ride.accepted_at else None,
-            "arrived_at": ride.arrived_at.isoformat() if ride.arrived_at else None,
-            "started_at": ride.started_at.isoformat() if ride.started_at else None,
-            "completed_at": ride.completed_at.isoformat() if ride.completed_at else None,
-            "cancelled_at": ride.cancelled_at.isoformat() if ride.cancelled_at else None,
-            "payment_status": ride.payment_status,
-            "notes": ride.notes
-        }
-        
-        # Add driver info if assigned
-        if ride.driver:
-            ride_data["driver"] = {
-                "id": ride.driver.id,
-                "full_name": ride.driver.full_name,
-                "phone": ride.driver.phone,
-                "vehicle_number": ride.driver.vehicle_number,
-                "vehicle_type": ride.driver.vehicle_type,
-                "current_lat": ride.driver.current_lat,
-                "current_lng": ride.driver.current_lng
-            }
-        
-        rides_data.append(ride_data)
-    
-    return StandardResponse(
-        success=True,
-        message="Active rides retrieved successfully",
-        data={"active_rides": rides_data}
+    return standard_response(
+        "Active rides retrieved successfully",
+        {"active_rides": [passenger_ride(ride) for ride in active_rides]}
+    )
+
+def ride_history_query(passenger_id: int):
+    return select(Ride).options(HISTORY_RIDE_DRIVER).filter(
+        Ride.passenger_id == passenger_id,
+        Ride.status.in_(["completed", "cancelled"])
     )
 
 @router.get("/rides/history", response_model=StandardResponse)
 async def get_ride_history(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_passenger: Passenger = Depends(get_current_passenger),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get ride history for current passenger."""
+    """Get ride history for current passenger, newest first.
     
-    from models.database import Ride
+    Pass the returned ``next_cursor`` back as ``cursor`` for the next page.
+    """
     
-    rides = db.query(Ride).filter(
-        Ride.passenger_id == current_passenger.id,
-        Ride.status.in_(["completed", "cancelled"])
-    ).order_by(Ride.requested_at.desc()).limit(50).all()
+    rides, next_cursor = await ride_page(db, ride_history_query(current_passenger.id), cursor, limit)
     
-    rides_data = []
-    for ride in rides:
-        ride_data = {
-            "id": ride.id,
-            "pickup_address": ride.pickup_address,
-            "drop_address": ride.drop_address,
-            "city": ride.city,
-            "status": ride.status,
-            "fare": ride.fare,
-            "distance_km": ride.distance_km,
-            "duration_minutes": ride.duration_minutes,
-            "requested_at": ride.requested_at.isoformat(),
-            "completed_at": ride.completed_at.isoformat() if ride.completed_at else None,
-            "cancelled_at": ride.cancelled_at.isoformat() if ride.cancelled_at else None,
-            "payment_status": ride.payment_status
-        }
-        
-        # Add driver info if available
-        if ride.driver:
-            ride_data["driver"] = {
-                "full_name": ride.driver.full_name,
-                "vehicle_number": ride.driver.vehicle_number,
-                "vehicle_type": ride.driver.vehicle_type
-            }
-        
-        rides_data.append(ride_data)
+    return standard_response(
+        "Ride history retrieved successfully",
+        {"rides": [history_ride(ride) for ride in rides], "next_cursor": next_cursor}
+    )
+
+@router.get("/rides/history/export")
+async def export_ride_history(
+    current_passenger: Passenger = Depends(get_current_passenger)
+):
+    """Stream the passenger's full ride history as NDJSON, newest first."""
     
-    return StandardResponse(
-        success=True,
-        message="Ride history retrieved successfully",
-        data={"rides": rides_data}
+    return StreamingResponse(
+        stream_rides(ride_history_query(current_passenger.id), history_ride),
+        media_type="application/x-ndjson"
     )
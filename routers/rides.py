@@ -1,124 +1,96 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from fastapi import APIRouter, Depends, Header, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Optional, Tuple
 import json
-import math
 
-from models.database import get_db, Ride, Driver, Passenger
-from models.schemas import RideCreate, RideResponse, RideAccept, RideComplete, StandardResponse
-from utils.auth import get_current_passenger, get_current_driver
+from models.database import get_async_db, AsyncSessionLocal, Ride, Driver, Passenger, ASSIGNED_RIDE_STATUSES
+from models.schemas import RideCreate, RideResponse, RideAccept, RideComplete, RideCancel, FareEstimateRequest, StandardResponse
+from utils.auth import get_current_passenger, get_current_driver, get_streaming_passenger, authenticate_websocket, cached_principal, websocket_token
+from utils.dispatch import dispatcher, DISPATCH_MODE
+from utils.earnings import record_completed_ride
+from utils.geo import haversine_km
+from utils.spatial_index import driver_index, sync_driver
+from utils.location_store import location_store
+from utils.location_stream import location_fanout
+from utils.offers import offer_scheduler, OFFER_WAVE_SIZE
+from utils.pricing import fare_engine, estimate_duration_min
+from utils.principal_cache import Principal, principal_cache
+from utils.ride_states import RIDE_TRANSITIONS, apply_transition, log_ride_event, ride_state
+from utils.ride_stream import ride_stream, status_event
+from utils.surge import surge_engine
+from utils.serializers import ride_details, ride_request, standard_response
+from utils.websocket_manager import Connection, manager
 
 router = APIRouter(prefix="/rides", tags=["rides"])
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.driver_connections: Dict[int, WebSocket] = {}
-        self.passenger_connections: Dict[int, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, connection_id: str, user_type: str, user_id: int):
-        await websocket.accept()
-        self.active_connections[connection_id] = websocket
-        
-        if user_type == "driver":
-            self.driver_connections[user_id] = websocket
-        elif user_type == "passenger":
-            self.passenger_connections[user_id] = websocket
-
-    def disconnect(self, connection_id: str, user_type: str, user_id: int):
-        if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
-        
-        if user_type == "driver" and user_id in self.driver_connections:
-            del self.driver_connections[user_id]
-        elif user_type == "passenger" and user_id in self.passenger_connections:
-            del self.passenger_connections[user_id]
-
-    async def send_to_driver(self, driver_id: int, message: dict):
-        if driver_id in self.driver_connections:
-            websocket = self.driver_connections[driver_id]
-            await websocket.send_text(json.dumps(message))
-
-    async def send_to_passenger(self, passenger_id: int, message: dict):
-        if passenger_id in self.passenger_connections:
-            websocket = self.passenger_connections[passenger_id]
-            await websocket.send_text(json.dumps(message))
-
-    async def broadcast_to_drivers(self, message: dict, driver_ids: List[int] = None):
-        if driver_ids:
-            for driver_id in driver_ids:
-                await self.send_to_driver(driver_id, message)
-        else:
-            for driver_id, websocket in self.driver_connections.items():
-                await websocket.send_text(json.dumps(message))
-
-manager = ConnectionManager()
+# Related columns serialized by ride details, loaded in the same query as the ride
+RIDE_DETAILS_PASSENGER = joinedload(Ride.passenger).load_only(Passenger.full_name, Passenger.phone)
+RIDE_DETAILS_DRIVER = joinedload(Ride.driver).load_only(
+    Driver.full_name, Driver.phone, Driver.vehicle_number, Driver.vehicle_type,
+    Driver.current_lat, Driver.current_lng, Driver.last_location_update
+)
 
 def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Calculate distance between two coordinates in kilometers."""
     if lat1 is None or lng1 is None or lat2 is None or lng2 is None:
         return float('inf')
     
-    # Convert to radians
-    lat1, lng1, lat2, lng2 = map(math.radians, [lat1, lng1, lat2, lng2])
-    
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlng = lng2 - lng1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng/2)**2
-    c = 2 * math.asin(math.sqrt(a))
+    return haversine_km(lat1, lng1, lat2, lng2)
+
+def find_nearby_drivers(
+    pickup_lat: float,
+    pickup_lng: float,
+    limit: int = OFFER_WAVE_SIZE,
+    vehicle_type: Optional[str] = None
+) -> List[Tuple[int, float]]:
+    """Find the ``limit`` nearest online drivers as ``(driver_id, distance_km)``, nearest first.
     
-    # Earth's radius in kilometers
-    r = 6371
-    return c * r
+    The search widens until it has enough drivers, up to
+    DRIVER_SEARCH_MAX_RADIUS_KM, optionally only with the given vehicle type.
+    """
+    return driver_index.nearest(pickup_lat, pickup_lng, limit, vehicle_type=vehicle_type)
 
-def find_nearby_drivers(db: Session, pickup_lat: float, pickup_lng: float, radius_km: float = 10.0) -> List[Driver]:
-    """Find nearby online drivers within radius."""
-    drivers = db.query(Driver).filter(
-        and_(
-            Driver.is_online == True,
-            Driver.is_verified == True,
-            Driver.is_active == True,
-            Driver.current_lat.isnot(None),
-            Driver.current_lng.isnot(None)
-        )
-    ).all()
+@router.post("/estimate", response_model=StandardResponse)
+async def estimate_fare(estimate: FareEstimateRequest):
+    """Quote a trip in every vehicle type.
     
-    nearby_drivers = []
-    for driver in drivers:
-        distance = calculate_distance(
-            pickup_lat, pickup_lng,
-            driver.current_lat, driver.current_lng
-        )
-        if distance <= radius_km:
-            nearby_drivers.append(driver)
+    Needs no database access, so it is cheap enough to call as the map moves.
+    """
     
-    # Sort by distance
-    nearby_drivers.sort(key=lambda d: calculate_distance(
-        pickup_lat, pickup_lng,
-        d.current_lat, d.current_lng
-    ))
+    distance_km = calculate_distance(
+        estimate.pickup_lat, estimate.pickup_lng,
+        estimate.drop_lat, estimate.drop_lng
+    )
+    duration_minutes = estimate.duration_minutes
+    if duration_minutes is None:
+        duration_minutes = estimate_duration_min(distance_km)
+    surge_multiplier = surge_engine.multiplier_at(estimate.pickup_lat, estimate.pickup_lng)
     
-    return nearby_drivers
+    return standard_response("Fare estimated successfully", {
+        "distance_km": distance_km,
+        "duration_minutes": duration_minutes,
+        "quotes": fare_engine.quote_all(distance_km, duration_minutes, surge_multiplier=surge_multiplier)
+    })
 
 @router.post("/request", response_model=StandardResponse)
 async def request_ride(
     ride_data: RideCreate,
     current_passenger: Passenger = Depends(get_current_passenger),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new ride request."""
     
     # Check if passenger has an active ride
-    active_ride = db.query(Ride).filter(
+    active_ride = await db.scalar(select(Ride).filter(
         and_(
             Ride.passenger_id == current_passenger.id,
             Ride.status.in_(["requested", "accepted", "arrived", "started"])
         )
-    ).first()
+    ))
     
     if active_ride:
         raise HTTPException(
@@ -138,39 +110,39 @@ async def request_ride(
             drop_address=ride_data.drop_address,
             city=ride_data.city,
             notes=ride_data.notes,
-            status="requested"
+            status="requested",
+            vehicle_type=ride_data.vehicle_type,
+            requested_at=datetime.utcnow(),
+            # Charge the surge the passenger saw when requesting
+            surge_multiplier=fare_engine.table.surge(
+                surge_engine.multiplier_at(ride_data.pickup_lat, ride_data.pickup_lng)
+            )
         )
         
         db.add(ride)
-        db.commit()
-        db.refresh(ride)
+        await db.flush()
+        await log_ride_event(db, ride.id, "requested", "passenger", current_passenger.id, ride.requested_at)
+        await db.commit()
+        await db.refresh(ride)
+        surge_engine.ride_requested(ride.id, ride.pickup_lat, ride.pickup_lng)
         
-        # Find nearby drivers
-        nearby_drivers = find_nearby_drivers(
-            db, ride_data.pickup_lat, ride_data.pickup_lng
-        )
+        ride_request_message = ride_request(ride, current_passenger)
         
-        if nearby_drivers:
-            # Send ride request to nearby drivers via WebSocket
-            ride_request_message = {
-                "type": "ride_request",
-                "ride_id": ride.id,
-                "pickup_lat": ride.pickup_lat,
-                "pickup_lng": ride.pickup_lng,
-                "pickup_address": ride.pickup_address,
-                "drop_lat": ride.drop_lat,
-                "drop_lng": ride.drop_lng,
-                "drop_address": ride.drop_address,
-                "city": ride.city,
-                "passenger": {
-                    "id": current_passenger.id,
-                    "full_name": current_passenger.full_name
-                },
-                "requested_at": ride.requested_at.isoformat()
-            }
-            
-            driver_ids = [driver.id for driver in nearby_drivers[:5]]  # Send to top 5 nearby drivers
-            await manager.broadcast_to_drivers(ride_request_message, driver_ids)
+        if DISPATCH_MODE == "batched":
+            # Offered to one driver by a dispatch batch, retried until matched
+            dispatcher.submit(
+                ride.id, ride.pickup_lat, ride.pickup_lng, ride_request_message,
+                ride_data.vehicle_type, current_passenger.id
+            )
+            nearby_drivers_count = len(find_nearby_drivers(
+                ride.pickup_lat, ride.pickup_lng, vehicle_type=ride_data.vehicle_type
+            ))
+        else:
+            # Offered to the nearest drivers in waves until one accepts
+            nearby_drivers_count = await offer_scheduler.start(
+                ride.id, current_passenger.id, ride.pickup_lat, ride.pickup_lng,
+                ride_request_message, ride_data.vehicle_type
+            )
         
         return StandardResponse(
             success=True,
@@ -182,118 +154,284 @@ async def request_ride(
                 "drop_address": ride.drop_address,
                 "city": ride.city,
                 "requested_at": ride.requested_at.isoformat(),
-                "nearby_drivers_count": len(nearby_drivers)
+                "surge_multiplier": ride.surge_multiplier,
+                "nearby_drivers_count": nearby_drivers_count
             }
         )
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to request ride: {str(e)}"
         )
 
+async def claim_ride(db: AsyncSession, ride_id: int, driver_id: int) -> Optional[Ride]:
+    """Atomically assign a requested ride to an online driver.
+    
+    The status check, the driver's online check and the write are a single
+    conditional UPDATE, so when several drivers accept the same ride exactly
+    one of them gets the row back; everyone else gets None. The online flag
+    is read from the drivers table, not from a cached principal, which may
+    predate going offline through another worker. The caller commits.
+    """
+    driver_online = select(Driver.id).where(Driver.id == driver_id, Driver.is_online == True).exists()
+    return await apply_transition(db, ride_id, "accept", driver_id, where=(driver_online,), driver_id=driver_id)
+
+async def transition_refused(
+    db: AsyncSession,
+    ride_id: int,
+    action: str,
+    outcome: str,
+    passenger_id: Optional[int] = None,
+    driver_id: Optional[int] = None
+) -> HTTPException:
+    """Why a transition matched no row, from the ride's current state, as the error to raise."""
+    state = await ride_state(db, ride_id)
+    if state is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ride not found"
+        )
+    if (passenger_id is not None and state.passenger_id != passenger_id) or (
+        driver_id is not None and state.driver_id != driver_id
+    ):
+        return HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not authorized to {action} this ride"
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Ride cannot be {outcome}. Current status: {state.status}"
+    )
+
+async def expire_unmatched_ride(ride_id: int, passenger_id: int):
+    """Cancel a request that no driver accepted before its offers ran out.
+    
+    Conditional on the ride still being requested, so a last-moment accept wins.
+    """
+    async with AsyncSessionLocal() as db:
+        ride = await apply_transition(db, ride_id, "expire")
+        await db.commit()
+    
+    if ride is not None:
+        await close_cancelled_ride(ride, "No driver accepted the ride", "ride_expired")
+
+async def close_cancelled_ride(ride: Ride, reason: Optional[str] = None, event_type: str = "ride_cancelled"):
+    """Release what a cancelled ride held and tell the drivers and the passenger.
+    
+    The assigned driver, or else every driver still holding an offer for
+    the ride, gets one notice in a single fan-out. An assigned driver is
+    matchable again right away, as after completing a ride.
+    """
+    surge_engine.ride_closed(ride.id)
+    driver_ids = offer_scheduler.ride_closed(ride.id) | dispatcher.ride_closed(ride.id)
+    if ride.driver_id is not None:
+        location_fanout.release(ride.driver_id)
+        driver_index.release(ride.driver_id)
+        async with AsyncSessionLocal() as db:
+            driver = await db.get(Driver, ride.driver_id)
+        if driver is not None:
+            current_lat, current_lng, _ = location_store.position_of(driver)
+            sync_driver(driver, current_lat, current_lng)
+        driver_ids = {ride.driver_id}
+    
+    if driver_ids:
+        await manager.broadcast_to_drivers(
+            {"type": "ride_cancelled", "ride_id": ride.id, "reason": reason},
+            list(driver_ids)
+        )
+    await ride_stream.publish(ride.passenger_id, {
+        **status_event(ride, "cancelled"),
+        "type": event_type,
+        "reason": reason
+    })
+
+async def cancel_passenger_ride(db: AsyncSession, ride_id: int, passenger_id: int, reason: Optional[str] = None) -> Ride:
+    """Cancel a passenger's ride that has not started yet.
+    
+    A cancel racing an accept or a trip start either wins or fails cleanly,
+    and nobody is notified unless it won.
+    """
+    try:
+        ride = await apply_transition(
+            db, ride_id, "cancel", passenger_id,
+            where=(Ride.passenger_id == passenger_id,)
+        )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to cancel ride: {str(e)}"
+        )
+    
+    if ride is None:
+        raise await transition_refused(db, ride_id, "cancel", "cancelled", passenger_id=passenger_id)
+    
+    await close_cancelled_ride(ride, reason)
+    return ride
+
 @router.post("/{ride_id}/accept", response_model=StandardResponse)
 async def accept_ride(
     ride_id: int,
     current_driver: Driver = Depends(get_current_driver),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Accept a ride request."""
     
-    # Get ride
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
-    if not ride:
+    try:
+        ride = await claim_ride(db, ride_id, current_driver.id)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ride not found"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to accept ride: {str(e)}"
         )
     
-    # Check ride status
-    if ride.status != "requested":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ride cannot be accepted. Current status: {ride.status}"
-        )
+    if ride is None:
+        state = await ride_state(db, ride_id)
+        if state is not None and state.status in ASSIGNED_RIDE_STATUSES:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Ride already taken"
+            )
+        if state is not None and state.status == "requested":
+            # Still open, so the online check refused it; the cached principal may still say online
+            principal_cache.invalidate(current_driver.user_id)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Driver must be online to accept rides"
+            )
+        raise await transition_refused(db, ride_id, "accept", "accepted")
     
-    # Check if driver is online
-    if not current_driver.is_online:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Driver must be online to accept rides"
-        )
+    # The driver is busy until the ride ends: no more offers, positions go to the passenger
+    driver_index.reserve(current_driver.id)
+    location_fanout.assign(current_driver.id, ride.id, ride.passenger_id)
+    surge_engine.ride_closed(ride.id)
+    dispatcher.ride_closed(ride.id)
+    offered_driver_ids = offer_scheduler.ride_closed(ride.id)
     
-    try:
-        # Update ride
-        ride.driver_id = current_driver.id
-        ride.status = "accepted"
-        ride.accepted_at = datetime.utcnow()
-        
-        db.commit()
-        
-        # Notify passenger via WebSocket
-        driver_assigned_message = {
-            "type": "driver_assigned",
+    # Notify passenger via WebSocket and the ride's event stream
+    await ride_stream.publish(ride.passenger_id, status_event(ride, "accepted", current_driver))
+    
+    # Notify the other drivers who were offered the ride that it was taken
+    ride_taken_message = {
+        "type": "ride_taken",
+        "ride_id": ride.id
+    }
+    
+    other_driver_ids = list(offered_driver_ids - {current_driver.id})
+    await manager.broadcast_to_drivers(ride_taken_message, other_driver_ids)
+    
+    passenger = await ride.awaitable_attrs.passenger
+    return StandardResponse(
+        success=True,
+        message="Ride accepted successfully",
+        data={
             "ride_id": ride.id,
-            "driver": {
-                "id": current_driver.id,
-                "full_name": current_driver.full_name,
-                "phone": current_driver.phone,
-                "vehicle_number": current_driver.vehicle_number,
-                "vehicle_type": current_driver.vehicle_type,
-                "current_lat": current_driver.current_lat,
-                "current_lng": current_driver.current_lng
-            },
-            "accepted_at": ride.accepted_at.isoformat()
+            "status": ride.status,
+            "accepted_at": ride.accepted_at.isoformat(),
+            "passenger": {
+                "id": passenger.id,
+                "full_name": passenger.full_name,
+                "phone": passenger.phone
+            }
         }
-        
-        await manager.send_to_passenger(ride.passenger_id, driver_assigned_message)
-        
-        # Notify other drivers that ride was taken
-        ride_taken_message = {
-            "type": "ride_taken",
-            "ride_id": ride.id
+    )
+
+@router.post("/{ride_id}/cancel", response_model=StandardResponse)
+async def cancel_ride(
+    ride_id: int,
+    ride_cancel: Optional[RideCancel] = None,
+    current_passenger: Passenger = Depends(get_current_passenger),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cancel a ride before the trip starts."""
+    
+    ride = await cancel_passenger_ride(
+        db, ride_id, current_passenger.id, ride_cancel.reason if ride_cancel else None
+    )
+    
+    return StandardResponse(
+        success=True,
+        message="Ride cancelled successfully",
+        data={
+            "ride_id": ride.id,
+            "status": ride.status,
+            "cancelled_at": ride.cancelled_at.isoformat()
         }
-        
-        nearby_drivers = find_nearby_drivers(
-            db, ride.pickup_lat, ride.pickup_lng
-        )
-        other_driver_ids = [d.id for d in nearby_drivers if d.id != current_driver.id]
-        await manager.broadcast_to_drivers(ride_taken_message, other_driver_ids)
-        
-        return StandardResponse(
-            success=True,
-            message="Ride accepted successfully",
-            data={
-                "ride_id": ride.id,
-                "status": ride.status,
-                "accepted_at": ride.accepted_at.isoformat(),
-                "passenger": {
-                    "id": ride.passenger.id,
-                    "full_name": ride.passenger.full_name,
-                    "phone": ride.passenger.phone
-                }
-            }
+    )
+
+async def advance_driver_ride(
+    db: AsyncSession,
+    ride_id: int,
+    driver: Driver,
+    transition: str,
+    outcome: str
+) -> StandardResponse:
+    """Apply a driver's transition to their own ride and tell the passenger."""
+    try:
+        ride = await apply_transition(
+            db, ride_id, transition, driver.id,
+            where=(Ride.driver_id == driver.id,)
         )
-    
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to accept ride: {str(e)}"
+            detail=f"Failed to update ride: {str(e)}"
         )
+    
+    if ride is None:
+        raise await transition_refused(db, ride_id, "update", outcome, driver_id=driver.id)
+    
+    target = RIDE_TRANSITIONS[transition]
+    await ride_stream.publish(ride.passenger_id, status_event(ride, target.target))
+    
+    return StandardResponse(
+        success=True,
+        message=f"Ride {outcome} successfully",
+        data={
+            "ride_id": ride.id,
+            "status": ride.status,
+            target.timestamp: getattr(ride, target.timestamp).isoformat()
+        }
+    )
+
+@router.post("/{ride_id}/arrive", response_model=StandardResponse)
+async def arrive_at_pickup(
+    ride_id: int,
+    current_driver: Driver = Depends(get_current_driver),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Mark that the driver has reached the pickup point."""
+    
+    return await advance_driver_ride(db, ride_id, current_driver, "arrive", "marked as arrived")
+
+@router.post("/{ride_id}/start", response_model=StandardResponse)
+async def start_ride(
+    ride_id: int,
+    current_driver: Driver = Depends(get_current_driver),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start the trip once the passenger is on board."""
+    
+    return await advance_driver_ride(db, ride_id, current_driver, "start", "started")
 
 @router.post("/{ride_id}/complete", response_model=StandardResponse)
 async def complete_ride(
     ride_id: int,
     ride_complete: RideComplete,
     current_driver: Driver = Depends(get_current_driver),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Complete a ride."""
     
     # Get ride
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
+    ride = await db.scalar(select(Ride).filter(Ride.id == ride_id))
     if not ride:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -314,139 +452,190 @@ async def complete_ride(
             detail=f"Ride cannot be completed. Current status: {ride.status}"
         )
     
-    try:
-        # Update ride
-        ride.status = "completed"
-        ride.completed_at = datetime.utcnow()
-        
-        if ride_complete.final_fare is not None:
-            ride.fare = ride_complete.final_fare
-        if ride_complete.duration_minutes is not None:
-            ride.duration_minutes = ride_complete.duration_minutes
-        
-        # Calculate fare if not provided (simple calculation)
-        if ride.fare is None:
-            # Base fare + distance charge
-            base_fare = 50.0  # Base fare
-            distance = calculate_distance(
-                ride.pickup_lat, ride.pickup_lng,
-                ride.drop_lat, ride.drop_lng
-            )
-            ride.fare = base_fare + (distance * 20)  # 20 per km
-            ride.distance_km = distance
-        
-        db.commit()
-        
-        # Notify passenger via WebSocket
-        ride_completed_message = {
-            "type": "ride_completed",
-            "ride_id": ride.id,
-            "final_fare": ride.fare,
-            "duration_minutes": ride.duration_minutes,
-            "completed_at": ride.completed_at.isoformat()
-        }
-        
-        await manager.send_to_passenger(ride.passenger_id, ride_completed_message)
-        
-        return StandardResponse(
-            success=True,
-            message="Ride completed successfully",
-            data={
-                "ride_id": ride.id,
-                "status": ride.status,
-                "fare": ride.fare,
-                "duration_minutes": ride.duration_minutes,
-                "completed_at": ride.completed_at.isoformat()
-            }
+    completed_at = datetime.utcnow()
+    fare = ride_complete.final_fare if ride_complete.final_fare is not None else ride.fare
+    duration_minutes = ride_complete.duration_minutes if ride_complete.duration_minutes is not None else ride.duration_minutes
+    distance_km = ride.distance_km
+    
+    # Price the trip with the fare engine if no fare was provided
+    if fare is None:
+        distance_km = calculate_distance(
+            ride.pickup_lat, ride.pickup_lng,
+            ride.drop_lat, ride.drop_lng
         )
+        if duration_minutes is None and ride.started_at:
+            duration_minutes = (completed_at - ride.started_at).total_seconds() / 60
+        waiting_minutes = 0
+        if ride.arrived_at and ride.started_at:
+            waiting_minutes = (ride.started_at - ride.arrived_at).total_seconds() / 60
+        fare = fare_engine.quote(
+            current_driver.vehicle_type,
+            distance_km,
+            duration_minutes if duration_minutes is not None else estimate_duration_min(distance_km),
+            waiting_minutes,
+            surge_multiplier=ride.surge_multiplier
+        )["total"]
     
+    try:
+        # Only a started ride completes, so a repeated request never counts twice
+        completed = await apply_transition(
+            db, ride.id, "complete", current_driver.id, at=completed_at,
+            where=(Ride.driver_id == current_driver.id,),
+            fare=fare,
+            duration_minutes=duration_minutes,
+            distance_km=distance_km
+        )
+        if completed is not None:
+            await record_completed_ride(db, current_driver.id, completed_at, fare)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to complete ride: {str(e)}"
         )
+    
+    if completed is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ride was completed or changed by another request"
+        )
+    
+    # Driver is free again: stop streaming to the passenger and make them matchable
+    location_fanout.release(current_driver.id)
+    driver_index.release(current_driver.id)
+    current_lat, current_lng, _ = location_store.position_of(current_driver)
+    sync_driver(current_driver, current_lat, current_lng)
+    
+    # Notify passenger via WebSocket and the ride's event stream
+    await ride_stream.publish(ride.passenger_id, status_event(ride, "completed"))
+    
+    return StandardResponse(
+        success=True,
+        message="Ride completed successfully",
+        data={
+            "ride_id": ride.id,
+            "status": ride.status,
+            "fare": ride.fare,
+            "duration_minutes": ride.duration_minutes,
+            "completed_at": ride.completed_at.isoformat()
+        }
+    )
 
 @router.get("/{ride_id}", response_model=StandardResponse)
 async def get_ride_details(
     ride_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get ride details by ID."""
     
-    ride = db.query(Ride).filter(Ride.id == ride_id).first()
+    ride = await db.scalar(select(Ride).options(
+        RIDE_DETAILS_PASSENGER, RIDE_DETAILS_DRIVER
+    ).filter(Ride.id == ride_id))
     if not ride:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ride not found"
         )
     
-    ride_data = {
-        "id": ride.id,
-        "pickup_lat": ride.pickup_lat,
-        "pickup_lng": ride.pickup_lng,
-        "pickup_address": ride.pickup_address,
-        "drop_lat": ride.drop_lat,
-        "drop_lng": ride.drop_lng,
-        "drop_address": ride.drop_address,
-        "city": ride.city,
-        "status": ride.status,
-        "fare": ride.fare,
-        "distance_km": ride.distance_km,
-        "duration_minutes": ride.duration_minutes,
-        "requested_at": ride.requested_at.isoformat(),
-        "accepted_at": ride.accepted_at.isoformat() if ride.accepted_at else None,
-        "arrived_at": ride.arrived_at.isoformat() if ride.arrived_at else None,
-        "started_at": ride.started_at.isoformat() if ride.started_at else None,
-        "completed_at": ride.completed_at.isoformat() if ride.completed_at else None,
-        "cancelled_at": ride.cancelled_at.isoformat() if ride.cancelled_at else None,
-        "payment_status": ride.payment_status,
-        "notes": ride.notes
-    }
+    return standard_response("Ride details retrieved successfully", ride_details(ride))
+
+async def load_ride_for_events(db: AsyncSession, ride_id: int) -> Optional[Ride]:
+    return await db.scalar(select(Ride).options(RIDE_DETAILS_DRIVER).filter(Ride.id == ride_id))
+
+@router.get("/{ride_id}/events")
+async def stream_ride_events(
+    ride_id: int,
+    after: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+    current_passenger: Passenger = Depends(get_streaming_passenger)
+):
+    """Server-sent events for a ride: a delta per status change and the driver's position.
     
-    # Add passenger info
-    if ride.passenger:
-        ride_data["passenger"] = {
-            "id": ride.passenger.id,
-            "full_name": ride.passenger.full_name,
-            "phone": ride.passenger.phone
-        }
+    Fallback for clients that cannot keep the passenger WebSocket open. A
+    reconnecting client resumes after the ``Last-Event-ID`` header (or
+    ``after``) and first gets the status changes it missed. The stream ends
+    once the ride is completed or cancelled. No database session is held
+    while the stream is open, so followers do not use up the pool.
+    """
     
-    # Add driver info if assigned
-    if ride.driver:
-        ride_data["driver"] = {
-            "id": ride.driver.id,
-            "full_name": ride.driver.full_name,
-            "phone": ride.driver.phone,
-            "vehicle_number": ride.driver.vehicle_number,
-            "vehicle_type": ride.driver.vehicle_type,
-            "current_lat": ride.driver.current_lat,
-            "current_lng": ride.driver.current_lng
-        }
+    if after is None:
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
     
-    return StandardResponse(
-        success=True,
-        message="Ride details retrieved successfully",
-        data=ride_data
+    # Subscribe before reading the ride so no change falls in between
+    queue = ride_stream.subscribe(ride_id)
+    async with AsyncSessionLocal() as db:
+        ride = await load_ride_for_events(db, ride_id)
+    if ride is None or ride.passenger_id != current_passenger.id:
+        ride_stream.unsubscribe(ride_id, queue)
+        if ride is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Ride not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to follow this ride"
+        )
+    
+    return StreamingResponse(
+        ride_stream.sse(ride, queue, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+async def authorize_websocket(websocket: WebSocket, user_type: str, profile_id: int) -> Optional[Tuple[Connection, Principal]]:
+    """Accept a WebSocket only if its token belongs to the ``user_type`` profile in the URL.
+    
+    Returns the connection and the authenticated principal. Refused
+    handshakes are closed before accepting, which the client sees as
+    HTTP 403, and return None.
+    """
+    principal = await authenticate_websocket(websocket, user_type)
+    if principal is None or principal.profile.id != profile_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return None
+    
+    _, subprotocol = websocket_token(websocket)
+    connection = await manager.connect(websocket, f"{user_type}_{profile_id}", user_type, profile_id, subprotocol)
+    return connection, principal
+
 # WebSocket endpoint for drivers
 @router.websocket("/ws/driver/{driver_id}")
 async def websocket_driver_endpoint(websocket: WebSocket, driver_id: int):
     connection_id = f"driver_{driver_id}"
-    await manager.connect(websocket, connection_id, "driver", driver_id)
+    authorized = await authorize_websocket(websocket, "driver", driver_id)
+    if authorized is None:
+        return
+    connection, principal = authorized
     
     try:
         while True:
             data = await websocket.receive_text()
+            # Any message, including the "pong" answering a heartbeat ping, shows the client is alive
+            connection.touch()
             message = json.loads(data)
             
             # Handle different message types from driver
             if message.get("type") == "location_update":
-                # Update driver location in database
-                # This would require a database session, which is complex in WebSocket
-                # For now, just broadcast to passenger if driver has active ride
-                pass
+                try:
+                    lat = float(message["lat"])
+                    lng = float(message["lng"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                
+                # Same path as PUT /drivers/location: live store now, DB on the next flush.
+                # The principal is re-read through the cache (a query at most once per
+                # TTL) so going online or offline after the handshake is seen here.
+                location_store.update(driver_id, lat, lng)
+                current = await cached_principal(principal.user.id, "driver")
+                if current is not None and current.profile is not None:
+                    sync_driver(current.profile, lat, lng)
+                else:
+                    driver_index.remove(driver_id)
+                
+                # Forward to the passenger if driver has active ride
+                location_fanout.publish(driver_id, lat, lng, ride_stream.send_position)
             
             elif message.get("type") == "accept_ride":
                 # Handle ride acceptance via WebSocket
@@ -455,34 +644,66 @@ async def websocket_driver_endpoint(websocket: WebSocket, driver_id: int):
                 pass
             
             elif message.get("type") == "reject_ride":
-                # Handle ride rejection via WebSocket
-                ride_id = message.get("ride_id")
-                # Could broadcast to other drivers
-                pass
+                # Handle ride rejection via WebSocket: the ride goes to other drivers
+                try:
+                    ride_id = int(message["ride_id"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if DISPATCH_MODE == "batched":
+                    dispatcher.decline(ride_id, driver_id)
+                else:
+                    await offer_scheduler.reject(ride_id, driver_id)
     
     except WebSocketDisconnect:
-        manager.disconnect(connection_id, "driver", driver_id)
+        manager.disconnect(connection_id, "driver", driver_id, websocket)
 
 # WebSocket endpoint for passengers
 @router.websocket("/ws/passenger/{passenger_id}")
 async def websocket_passenger_endpoint(websocket: WebSocket, passenger_id: int):
     connection_id = f"passenger_{passenger_id}"
-    await manager.connect(websocket, connection_id, "passenger", passenger_id)
+    authorized = await authorize_websocket(websocket, "passenger", passenger_id)
+    if authorized is None:
+        return
+    connection, _ = authorized
     
     try:
         while True:
             data = await websocket.receive_text()
+            # Any message, including the "pong" answering a heartbeat ping, shows the client is alive
+            connection.touch()
             message = json.loads(data)
             
             # Handle different message types from passenger
-            if message.get("type") == "cancel_ride":
-                # Handle ride cancellation
-                ride_id = message.get("ride_id")
-                # This would update ride status and notify driver
-                pass
+            if message.get("type") == "resume_ride":
+                # Reconnected: resend the status changes after the last one applied
+                try:
+                    ride_id = int(message["ride_id"])
+                    after = int(message.get("after") or 0)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                async with AsyncSessionLocal() as db:
+                    ride = await load_ride_for_events(db, ride_id)
+                if ride is not None and ride.passenger_id == passenger_id:
+                    await ride_stream.replay(passenger_id, ride, after)
+            
+            elif message.get("type") == "cancel_ride":
+                # Same path as POST /rides/{ride_id}/cancel; the ride_cancelled event confirms it
+                try:
+                    ride_id = int(message["ride_id"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                async with AsyncSessionLocal() as db:
+                    try:
+                        await cancel_passenger_ride(db, ride_id, passenger_id, message.get("reason"))
+                    except HTTPException as e:
+                        await manager.send_to_passenger(passenger_id, {
+                            "type": "cancel_ride_failed",
+                            "ride_id": ride_id,
+                            "detail": e.detail
+                        })
     
     except WebSocketDisconnect:
-        manager.disconnect(connection_id, "passenger", passenger_id)
+        manager.disconnect(connection_id, "passenger", passenger_id, websocket)
 
 # Export connection manager for use in other modules
 connection_manager = manager
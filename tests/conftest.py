@@ -0,0 +1,76 @@
+"""Shared test setup: the app runs against a throwaway SQLite database.
+
+DATABASE_URL is read when ``models.database`` is imported, so it is set here
+before any app module is loaded.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_db_dir = tempfile.mkdtemp(prefix="ridenow_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'tests.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import pytest
+from sqlalchemy import insert
+
+from models.database import Base, async_engine, engine, create_tables, User, Passenger, Driver
+from utils.principal_cache import principal_cache
+
+create_tables()
+
+def wipe_tables():
+    """Delete every row, keeping the schema and its revision stamp."""
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    # Cached principals would outlive their rows and shadow reused ids
+    principal_cache.clear()
+
+@pytest.fixture
+def empty_db():
+    wipe_tables()
+    yield
+    wipe_tables()
+
+@pytest.fixture(scope="module")
+def module_db():
+    """Empty tables shared by the tests of one module, e.g. to seed once."""
+    wipe_tables()
+    yield
+    wipe_tables()
+
+@pytest.fixture
+def people(empty_db):
+    """Passenger 1 and an online, verified driver 1 at a fixed position."""
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), [
+            {"id": 1, "phone": "p-1", "password": "x", "full_name": "P1", "user_type": "passenger"},
+            {"id": 2, "phone": "d-1", "password": "x", "full_name": "D1", "user_type": "driver"}
+        ])
+        connection.execute(insert(Passenger.__table__), {"id": 1, "user_id": 1, "phone": "p-1", "full_name": "P1"})
+        connection.execute(insert(Driver.__table__), {
+            "id": 1, "user_id": 2, "phone": "d-1", "full_name": "D1", "license_number": "L-1",
+            "vehicle_number": "V-1", "vehicle_type": "car", "is_online": True, "is_verified": True,
+            "current_lat": 12.97, "current_lng": 77.59
+        })
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion on a fresh loop.
+
+    Pooled async connections belong to the loop that opened them, so they
+    are closed before the loop goes away.
+    """
+    def run(coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
@@ -0,0 +1,51 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from utils.dispatch import Dispatcher, PendingRide, solve_assignment
+from utils.spatial_index import DriverIndex
+
+def brute_force_cost(cost: np.ndarray) -> float:
+    rows, columns = cost.shape
+    if rows > columns:
+        return brute_force_cost(cost.T)
+    return min(cost[range(rows), list(chosen)].sum() for chosen in permutations(range(columns), rows))
+
+@pytest.mark.parametrize("shape", [(1, 1), (3, 3), (5, 5), (2, 6), (6, 2), (4, 7)])
+def test_solve_assignment_is_optimal(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(20):
+        cost = rng.uniform(0, 10, shape)
+        pairs = solve_assignment(cost)
+
+        assert len(pairs) == min(shape)
+        assert len({row for row, _ in pairs}) == len({column for _, column in pairs}) == len(pairs)
+        assert sum(cost[row, column] for row, column in pairs) == pytest.approx(brute_force_cost(cost))
+
+def test_solve_assignment_empty():
+    assert solve_assignment(np.zeros((0, 3))) == []
+
+def test_plan_minimizes_total_pickup_distance():
+    index = DriverIndex()
+    # Driver 1 is closest to both rides; greedy matching would leave ride 2 with a long pickup
+    index.upsert(1, 12.9700, 77.5950)
+    index.upsert(2, 12.9700, 77.5800)
+    index.upsert(3, 12.9700, 77.6200)
+    dispatcher = Dispatcher(index, candidates=3, radius_km=10)
+    rides = [PendingRide(10, 12.9700, 77.5900, {}, 0), PendingRide(20, 12.9700, 77.6000, {}, 0)]
+
+    matches = {ride.ride_id: (driver_id, distance) for ride, driver_id, distance in dispatcher.plan(rides)}
+
+    assert {ride_id: driver_id for ride_id, (driver_id, _) in matches.items()} == {10: 2, 20: 1}
+    nearest = dict(index.nearest(12.9700, 77.6000, 3))
+    assert matches[20][1] == pytest.approx(nearest[1])
+
+def test_plan_skips_excluded_drivers():
+    index = DriverIndex()
+    index.upsert(1, 12.9700, 77.5900)
+    dispatcher = Dispatcher(index, candidates=3, radius_km=10)
+    ride = PendingRide(10, 12.9700, 77.5900, {}, 0)
+    ride.excluded.add(1)
+
+    assert dispatcher.plan([ride]) == []
@@ -0,0 +1,75 @@
+import asyncio
+
+from utils.offers import OfferScheduler
+from utils.spatial_index import DriverIndex
+
+class FakeConnections:
+    """Records what would be sent to drivers."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def broadcast_to_drivers(self, message: dict, driver_ids):
+        self.sent.append((message["type"], message.get("wave"), sorted(driver_ids)))
+
+def scheduler(**options) -> OfferScheduler:
+    index = DriverIndex()
+    # Drivers 1, 2, 3 at growing distance from the pickup
+    for driver_id in (1, 2, 3):
+        index.upsert(driver_id, 12.97 + driver_id / 1000, 77.59)
+    return OfferScheduler(index, FakeConnections(), **options)
+
+def test_waves_go_to_the_next_nearest_drivers():
+    offers = scheduler(wave_size=2, max_waves=3)
+
+    async def scenario():
+        assert await offers.start(7, 1, 12.97, 77.59, {"type": "ride_request"}) == 2
+        await offers.reject(7, 1)
+        # One driver of the wave is still deciding
+        assert len(offers.connections.sent) == 1
+        await offers.reject(7, 2)
+        await offers.reject(7, 2)
+
+    asyncio.run(scenario())
+    assert offers.connections.sent == [
+        ("ride_request", 1, [1, 2]),
+        ("ride_request", 2, [3]),
+    ]
+    assert offers.rejections == 2
+
+def test_closed_ride_reports_every_offered_driver():
+    offers = scheduler(wave_size=1)
+
+    async def scenario():
+        await offers.start(7, 1, 12.97, 77.59, {"type": "ride_request"})
+        await offers.reject(7, 1)
+
+    asyncio.run(scenario())
+    assert offers.ride_closed(7) == {1, 2}
+    assert len(offers) == 0
+
+def test_unanswered_waves_time_out_then_exhaust():
+    offers = scheduler(wave_size=2, timeout_seconds=0.05, max_waves=2)
+    exhausted = []
+
+    async def on_exhausted(ride_id, passenger_id):
+        exhausted.append((ride_id, passenger_id))
+
+    async def scenario():
+        timers = asyncio.create_task(offers.run(on_exhausted))
+        await offers.start(7, 1, 12.97, 77.59, {"type": "ride_request"}, vehicle_type=None)
+        for _ in range(100):
+            if exhausted:
+                break
+            await asyncio.sleep(0.01)
+        timers.cancel()
+
+    asyncio.run(scenario())
+    assert offers.connections.sent == [
+        ("ride_request", 1, [1, 2]),
+        ("ride_offer_expired", None, [1, 2]),
+        ("ride_request", 2, [3]),
+        ("ride_offer_expired", None, [3]),
+    ]
+    assert exhausted == [(7, 1)]
+    assert offers.stats()["timeouts"] == 2 and offers.stats()["exhausted"] == 1
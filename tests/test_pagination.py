@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+
+from models.database import AsyncSessionLocal, engine, Ride
+from utils.pagination import decode_cursor, encode_cursor, ride_page
+
+@pytest.fixture
+def ride_ids(people):
+    """25 rides, several sharing a timestamp; ids newest first."""
+    start = datetime(2024, 1, 1, 8, 0)
+    rows = [
+        {
+            "id": ride_id, "passenger_id": 1, "pickup_lat": 12.97, "pickup_lng": 77.59, "pickup_address": "A",
+            "drop_lat": 12.99, "drop_lng": 77.61, "drop_address": "B", "city": "Bangalore",
+            "status": "completed", "requested_at": start + timedelta(minutes=ride_id // 3)
+        }
+        for ride_id in range(1, 26)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(Ride.__table__), rows)
+    return [row["id"] for row in sorted(rows, key=lambda row: (row["requested_at"], row["id"]), reverse=True)]
+
+def test_cursor_round_trip():
+    ride = Ride(id=42, requested_at=datetime(2024, 5, 6, 7, 8, 9, 123456))
+    assert decode_cursor(encode_cursor(ride)) == (ride.requested_at, 42)
+
+@pytest.mark.parametrize("cursor", ["garbage", "", encode_cursor(Ride(id=1, requested_at=datetime(2024, 1, 1)))[:-4]])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as refused:
+        decode_cursor(cursor)
+    assert refused.value.status_code == 400
+
+@pytest.mark.parametrize("limit", [1, 4, 10, 25, 30])
+def test_pages_cover_every_ride_once_in_order(run, ride_ids, limit):
+    async def walk():
+        seen, cursor = [], None
+        async with AsyncSessionLocal() as db:
+            while True:
+                rides, cursor = await ride_page(db, select(Ride).filter(Ride.passenger_id == 1), cursor, limit)
+                assert len(rides) <= limit
+                seen.extend(ride.id for ride in rides)
+                if cursor is None:
+                    return seen
+
+    assert run(walk()) == ride_ids
@@ -0,0 +1,39 @@
+"""Ride listings run a fixed number of queries (see benchmarks/check_query_counts.py)."""
+import pytest
+from sqlalchemy import event
+
+from benchmarks.check_query_counts import ENDPOINTS, EXPECTED_QUERIES, RIDE_COUNTS, QueryCounter, count_queries, seed
+from models.database import async_engine
+from routers.rides import get_ride_details
+
+@pytest.fixture(scope="module")
+def counter(module_db):
+    seed()
+    counter = QueryCounter()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(async_engine.sync_engine, "before_cursor_execute", counter)
+
+@pytest.mark.parametrize("name", list(ENDPOINTS))
+def test_listing_query_count_does_not_grow(counter, run, name):
+    model, handler = ENDPOINTS[name]
+
+    async def counts():
+        return [
+            await count_queries(counter, handler, lambda db, owner=owner: db.get(model, owner))
+            for owner in range(1, len(RIDE_COUNTS) + 1)
+        ]
+
+    assert run(counts()) == [EXPECTED_QUERIES] * len(RIDE_COUNTS)
+
+def test_ride_details_is_one_query(counter, run):
+    async def no_principal(db):
+        return None
+
+    async def counts():
+        return [
+            await count_queries(counter, lambda db, _, ride_id=ride_id: get_ride_details(ride_id=ride_id, db=db), no_principal)
+            for ride_id in (1, 2, 3)
+        ]
+
+    assert run(counts()) == [EXPECTED_QUERIES] * 3
@@ -0,0 +1,15 @@
+"""Every hot ride query is answered from an index (see benchmarks/check_query_plans.py)."""
+import pytest
+
+from benchmarks.check_query_plans import HOT_QUERIES, compile_sql, seed, sqlite_plan
+from models.database import engine
+
+@pytest.fixture(scope="module")
+def seeded(module_db):
+    seed()
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_uses_an_index(seeded, name):
+    with engine.connect() as connection:
+        lines, full_scans = sqlite_plan(connection, compile_sql(HOT_QUERIES[name]))
+    assert not full_scans, "\n".join(lines)
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+from models.database import AsyncSessionLocal, engine, Ride, RideEvent
+from utils.ride_states import RIDE_STATUS_SEQ, RIDE_TRANSITIONS, TERMINAL_RIDE_STATUSES, apply_transition
+
+@pytest.fixture
+def ride_id(people):
+    with engine.begin() as connection:
+        return connection.execute(insert(Ride.__table__).values(
+            passenger_id=1, pickup_lat=12.97, pickup_lng=77.59, pickup_address="A",
+            drop_lat=12.99, drop_lng=77.61, drop_address="B", city="Bangalore",
+            status="requested", requested_at=datetime.utcnow()
+        )).inserted_primary_key[0]
+
+def test_transitions_only_move_forward():
+    for transition in RIDE_TRANSITIONS.values():
+        assert transition.target in RIDE_STATUS_SEQ
+        for source in transition.sources:
+            assert source not in TERMINAL_RIDE_STATUSES
+            assert RIDE_STATUS_SEQ[source] < RIDE_STATUS_SEQ[transition.target]
+
+async def transitions(ride_id, *steps):
+    """Apply ``(name, actor_id, values)`` steps in one transaction; the status after each (None if refused)."""
+    async with AsyncSessionLocal() as db:
+        results = []
+        for name, actor_id, values in steps:
+            ride = await apply_transition(db, ride_id, name, actor_id, **values)
+            results.append(ride.status if ride is not None else None)
+        await db.commit()
+        return results
+
+def events(ride_id):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(RideEvent.seq, RideEvent.status, RideEvent.actor, RideEvent.actor_id)
+            .filter(RideEvent.ride_id == ride_id)
+            .order_by(RideEvent.id)
+        ).all()
+
+def test_full_ride_is_logged_in_order(run, ride_id):
+    steps = [("accept", 1, {"driver_id": 1}), ("arrive", 1, {}), ("start", 1, {}), ("complete", 1, {"fare": 150.0})]
+
+    assert run(transitions(ride_id, *steps)) == ["accepted", "arrived", "started", "completed"]
+    assert events(ride_id) == [
+        (1, "accepted", "driver", 1), (2, "arrived", "driver", 1), (3, "started", "driver", 1), (4, "completed", "driver", 1)
+    ]
+    with engine.connect() as connection:
+        ride = connection.execute(select(Ride).filter(Ride.id == ride_id)).one()
+    assert ride.driver_id == 1 and ride.fare == 150.0
+    assert ride.accepted_at <= ride.arrived_at <= ride.started_at <= ride.completed_at
+
+def test_refused_transition_changes_and_logs_nothing(run, ride_id):
+    # Skipping ahead, a second claim and the wrong owner are all refused
+    assert run(transitions(
+        ride_id,
+        ("complete", 1, {}),
+        ("accept", 1, {"driver_id": 1}),
+        ("accept", 2, {"driver_id": 2}),
+    )) == [None, "accepted", None]
+    assert run(transitions(ride_id, ("arrive", 2, {"where": (Ride.driver_id == 2,)}))) == [None]
+
+    assert events(ride_id) == [(1, "accepted", "driver", 1)]
+
+def test_cancelled_ride_is_final(run, ride_id):
+    assert run(transitions(ride_id, ("cancel", 1, {}), ("accept", 1, {"driver_id": 1}), ("expire", None, {}))) == [
+        "cancelled", None, None
+    ]
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+import main
+from models.database import engine, Driver, Ride
+from utils.principal_cache import principal_cache
+from utils.spatial_index import driver_index
+
+RIDE = {
+    "pickup_lat": 12.971, "pickup_lng": 77.591, "pickup_address": "A",
+    "drop_lat": 13.0, "drop_lng": 77.7, "drop_address": "B", "city": "Bangalore"
+}
+
+def ok(response) -> dict:
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+@pytest.fixture
+def client(empty_db):
+    with TestClient(main.app) as client:
+        yield client
+
+def register(client: TestClient, user_type: str, phone: str, **fields):
+    data = ok(client.post(f"/api/auth/{user_type}/register", json={"phone": phone, "password": "pw", "full_name": phone, **fields}))
+    return data["user_data"]["id"], data["access_token"]
+
+def test_driver_streaming_location_over_websocket_gets_offers(client):
+    driver_id, driver_token = register(
+        client, "driver", "d-1", license_number="L-1", vehicle_number="V-1", vehicle_type="car"
+    )
+    with engine.begin() as connection:
+        connection.execute(update(Driver).where(Driver.id == driver_id).values(is_verified=True))
+    principal_cache.clear()
+    _, passenger_token = register(client, "passenger", "p-1")
+
+    # The socket is opened while offline; going online has no position yet
+    with client.websocket_connect(f"/api/rides/ws/driver/{driver_id}?token={driver_token}") as socket:
+        ok(client.put("/api/drivers/status", json={"is_online": True}, headers={"Authorization": f"Bearer {driver_token}"}))
+        socket.send_json({"type": "location_update", "lat": 12.97, "lng": 77.59})
+        # The socket sends no reply to a location update; wait until the app has applied it
+        deadline = time.monotonic() + 5
+        while driver_id not in driver_index and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        ride = ok(client.post("/api/rides/request", json=RIDE, headers={"Authorization": f"Bearer {passenger_token}"}))
+
+        assert ride["nearby_drivers_count"] == 1
+        offer = socket.receive_json()
+        assert offer["type"] == "ride_request" and offer["ride_id"] == ride["id"]
+
+def test_accept_rechecks_online_status_in_the_database(client):
+    driver_id, driver_token = register(
+        client, "driver", "d-1", license_number="L-1", vehicle_number="V-1", vehicle_type="car"
+    )
+    driver_headers = {"Authorization": f"Bearer {driver_token}"}
+    ok(client.put("/api/drivers/status", json={"is_online": True}, headers=driver_headers))
+    _, passenger_token = register(client, "passenger", "p-1")
+    ride = ok(client.post("/api/rides/request", json=RIDE, headers={"Authorization": f"Bearer {passenger_token}"}))
+
+    # Went offline through another worker: this worker's cached principal still says online
+    with engine.begin() as connection:
+        connection.execute(update(Driver).where(Driver.id == driver_id).values(is_online=False))
+    refused = client.post(f"/api/rides/{ride['id']}/accept", headers=driver_headers)
+    assert refused.status_code == 400 and "online" in refused.json()["detail"]
+    with engine.connect() as connection:
+        assert connection.scalar(select(Ride.status).where(Ride.id == ride["id"])) == "requested"
+
+    with engine.begin() as connection:
+        connection.execute(update(Driver).where(Driver.id == driver_id).values(is_online=True))
+    assert ok(client.post(f"/api/rides/{ride['id']}/accept", headers=driver_headers))["status"] == "accepted"
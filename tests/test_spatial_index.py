@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from utils.geo import haversine_km
+from utils.spatial_index import DriverIndex
+
+CENTER = (12.9716, 77.5946)
+
+@pytest.fixture
+def drivers():
+    random.seed(11)
+    return {
+        driver_id: (CENTER[0] + random.uniform(-0.2, 0.2), CENTER[1] + random.uniform(-0.2, 0.2), random.choice(["car", "bike"]))
+        for driver_id in range(1, 501)
+    }
+
+@pytest.fixture
+def index(drivers):
+    index = DriverIndex(cell_size_km=1.0)
+    for driver_id, (lat, lng, vehicle_type) in drivers.items():
+        index.upsert(driver_id, lat, lng, vehicle_type)
+    return index
+
+def brute_force(drivers, lat, lng, k, radius_km, vehicle_type=None, exclude=()):
+    found = sorted(
+        (haversine_km(lat, lng, d_lat, d_lng), driver_id)
+        for driver_id, (d_lat, d_lng, d_type) in drivers.items()
+        if driver_id not in exclude and vehicle_type in (None, d_type)
+    )
+    return [(driver_id, distance) for distance, driver_id in found if distance <= radius_km][:k]
+
+def assert_same(found, expected):
+    assert [driver_id for driver_id, _ in found] == [driver_id for driver_id, _ in expected]
+    assert [distance for _, distance in found] == pytest.approx([distance for _, distance in expected])
+
+@pytest.mark.parametrize("k, radius_km", [(1, 15), (5, 15), (40, 15), (5, 0.5), (600, 50)])
+def test_nearest_matches_brute_force(drivers, index, k, radius_km):
+    for lat, lng in [CENTER, (CENTER[0] + 0.15, CENTER[1] - 0.1), (CENTER[0] + 0.5, CENTER[1])]:
+        assert_same(index.nearest(lat, lng, k, radius_km), brute_force(drivers, lat, lng, k, radius_km))
+
+def test_nearest_filters_vehicle_type_and_excluded(drivers, index):
+    exclude = {driver_id for driver_id, _ in index.nearest(*CENTER, 10)}
+    assert_same(
+        index.nearest(*CENTER, 10, vehicle_type="CAR", exclude=exclude),
+        brute_force(drivers, *CENTER, 10, 15, "car", exclude)
+    )
+
+def test_nearest_follows_moves_and_removals(index):
+    index.upsert(1, *CENTER)
+    assert index.nearest(*CENTER, 1)[0][0] == 1
+
+    index.remove(1)
+    assert 1 not in index
+    assert all(driver_id != 1 for driver_id, _ in index.nearest(*CENTER, 500, 100))
+
+def test_reserved_driver_is_hidden_until_released(index):
+    index.upsert(1, *CENTER)
+    index.reserve(1)
+    # Position updates during the ride keep the driver hidden
+    index.upsert(1, *CENTER)
+    assert 1 not in index
+
+    index.release(1, *CENTER)
+    assert index.nearest(*CENTER, 1)[0][0] == 1
@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+from utils.websocket_manager import ConnectionManager
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text)["type"])
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+async def heartbeat_after_silence(manager: ConnectionManager):
+    """Connect one silent and one answering client, let them idle past the timeout and run a heartbeat."""
+    silent, answering = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(silent, "driver_1", "driver", 1)
+    connection = await manager.connect(answering, "driver_2", "driver", 2)
+    await asyncio.sleep(0.1)
+    connection.touch()
+    evicted = manager.heartbeat()
+    await asyncio.sleep(0.05)
+    return evicted, silent, answering
+
+def test_silent_client_is_evicted_as_idle():
+    manager = ConnectionManager(idle_timeout=0.05)
+    evicted, silent, answering = asyncio.run(heartbeat_after_silence(manager))
+
+    assert evicted == 1 and manager.evicted["idle"] == 1
+    assert silent.close_code == 1001
+    assert answering.sent == ["ping"] and answering.close_code is None
+    assert list(manager.active_connections) == ["driver_2"]
+
+def test_zero_idle_timeout_only_pings():
+    manager = ConnectionManager(idle_timeout=0)
+    evicted, silent, answering = asyncio.run(heartbeat_after_silence(manager))
+
+    assert evicted == 0
+    assert silent.sent == answering.sent == ["ping"]
+    assert silent.close_code is None and len(manager.active_connections) == 2
@@ -1,12 +1,14 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from models.database import get_db, User
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.database import get_async_db, AsyncSessionLocal, User, Passenger, Driver
 from models.schemas import TokenData
+from utils.principal_cache import principal_cache, Principal
 import os
 from dotenv import load_dotenv
 
@@ -23,6 +25,12 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
+# Profile table for each user type
+PROFILE_MODELS = {"passenger": Passenger, "driver": Driver}
+
+# WebSocket subprotocol announcing a token: clients offer ["bearer", <token>]
+WS_AUTH_SUBPROTOCOL = "bearer"
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -66,108 +74,229 @@ def verify_token(token: str) -> TokenData:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def authenticate_user(db: Session, phone: str, password: str, user_type: str):
+async def authenticate_user(db: AsyncSession, phone: str, password: str, user_type: str):
     """Authenticate user by phone and password."""
-    user = db.query(User).filter(
+    user = await db.scalar(select(User).filter(
         User.phone == phone,
         User.user_type == user_type,
         User.is_active == True
-    ).first()
+    ))
     
     if not user or not verify_password(password, user.password):
         return None
     
     return user
 
-def get_current_user(
+def principal_query(user_type: str):
+    """User joined to their active profile, if the user type has one."""
+    profile_model = PROFILE_MODELS.get(user_type)
+    if profile_model is None:
+        return select(User, None)
+    return select(User, profile_model).outerjoin(
+        profile_model,
+        and_(profile_model.user_id == User.id, profile_model.is_active == True)
+    )
+
+def cache_principal(db: AsyncSession, user: User, profile) -> Principal:
+    """Detach a freshly loaded user and profile, caching them if the profile exists."""
+    db.expunge(user)
+    if profile is not None:
+        db.expunge(profile)
+        principal_cache.put(Principal(user, profile))
+    return Principal(user, profile)
+
+async def resolve_principal(db: AsyncSession, user_id: int, user_type: str) -> Optional[Principal]:
+    """Look up a user and their profile, from the principal cache when possible.
+    
+    On a miss both rows are fetched with one query and cached detached;
+    returns None if the user does not exist or is inactive.
+    """
+    principal = principal_cache.get(user_id, user_type)
+    if principal is not None:
+        return principal
+    return await load_principal(db, user_id, user_type)
+
+async def load_principal(db: AsyncSession, user_id: int, user_type: str) -> Optional[Principal]:
+    """Fetch a user and their profile with one query and cache them."""
+    row = (await db.execute(principal_query(user_type).filter(
+        User.id == user_id,
+        User.user_type == user_type,
+        User.is_active == True
+    ))).first()
+    
+    if row is None:
+        return None
+    
+    return cache_principal(db, *row)
+
+async def preload_principals(db: AsyncSession, user_type: str, *conditions) -> int:
+    """Cache the principals of every active ``user_type`` user whose profile matches ``conditions``.
+    
+    Used at startup so the clients that reconnect right after a deploy are
+    authenticated from memory. Returns the number cached.
+    """
+    profile_model = PROFILE_MODELS[user_type]
+    rows = (await db.execute(principal_query(user_type).filter(
+        User.user_type == user_type,
+        User.is_active == True,
+        profile_model.id.isnot(None),
+        *conditions
+    ).limit(principal_cache.maxsize))).all()
+    for user, profile in rows:
+        cache_principal(db, user, profile)
+    return len(rows)
+
+async def attach_principal(db: AsyncSession, principal: Principal) -> Principal:
+    """Copy a cached principal into a session without reloading it."""
+    user = await db.merge(principal.user, load=False)
+    profile = None
+    if principal.profile is not None:
+        profile = await db.merge(principal.profile, load=False)
+    return Principal(user, profile)
+
+async def get_current_principal(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    """Get current authenticated user."""
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """Get current authenticated user together with their profile."""
     token = credentials.credentials
     token_data = verify_token(token)
     
-    user = db.query(User).filter(
-        User.id == token_data.user_id,
-        User.user_type == token_data.user_type,
-        User.is_active == True
-    ).first()
+    principal = await resolve_principal(db, token_data.user_id, token_data.user_type)
     
-    if user is None:
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    return await attach_principal(db, principal)
 
-def get_current_passenger(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+async def get_current_user(principal: Principal = Depends(get_current_principal)):
+    """Get current authenticated user."""
+    return principal.user
+
+async def get_current_passenger(principal: Principal = Depends(get_current_principal)):
     """Get current authenticated passenger."""
-    if current_user.user_type != "passenger":
+    if principal.user.user_type != "passenger":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized as passenger"
         )
     
-    from models.database import Passenger
-    passenger = db.query(Passenger).filter(
-        Passenger.user_id == current_user.id,
-        Passenger.is_active == True
-    ).first()
-    
-    if passenger is None:
+    if principal.profile is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Passenger profile not found"
         )
     
-    return passenger
+    return principal.profile
 
-def get_current_driver(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+async def get_current_driver(principal: Principal = Depends(get_current_principal)):
     """Get current authenticated driver."""
-    if current_user.user_type != "driver":
+    if principal.user.user_type != "driver":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized as driver"
         )
     
-    from models.database import Driver
-    driver = db.query(Driver).filter(
-        Driver.user_id == current_user.id,
-        Driver.is_active == True
-    ).first()
-    
-    if driver is None:
+    if principal.profile is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Driver profile not found"
         )
     
-    return driver
+    return principal.profile
+
+async def cached_principal(user_id: int, user_type: str) -> Optional[Principal]:
+    """Like ``resolve_principal``, but without a request session.
+    
+    A session is only opened on a cache miss and is closed before
+    returning, so callers that stay open for long (streams, sockets) do
+    not hold a pooled connection. The result is detached.
+    """
+    principal = principal_cache.get(user_id, user_type)
+    if principal is not None:
+        return principal
+    async with AsyncSessionLocal() as db:
+        return await load_principal(db, user_id, user_type)
+
+async def get_streaming_passenger(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Passenger:
+    """Current passenger for streaming responses, which must not pin a database session while they run."""
+    token_data = verify_token(credentials.credentials)
+    if token_data.user_type != "passenger":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized as passenger"
+        )
+    
+    principal = await cached_principal(token_data.user_id, "passenger")
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if principal.profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Passenger profile not found"
+        )
+    
+    return principal.profile
+
+def websocket_token(websocket: WebSocket) -> Tuple[Optional[str], Optional[str]]:
+    """The access token of a WebSocket handshake and the subprotocol to accept.
+    
+    Browsers cannot set headers on a WebSocket, so the token comes either as
+    the subprotocol following ``bearer`` (kept out of URLs and access logs)
+    or as a ``token`` query parameter.
+    """
+    subprotocols = websocket.scope.get("subprotocols") or []
+    if WS_AUTH_SUBPROTOCOL in subprotocols:
+        position = subprotocols.index(WS_AUTH_SUBPROTOCOL)
+        if position + 1 < len(subprotocols):
+            return subprotocols[position + 1], WS_AUTH_SUBPROTOCOL
+    return websocket.query_params.get("token"), None
+
+async def authenticate_websocket(websocket: WebSocket, user_type: str) -> Optional[Principal]:
+    """Verify a WebSocket handshake's token and return its ``user_type`` principal, or None.
+    
+    Checking the signature needs no I/O and the principal normally comes from
+    the cache, so a reconnecting client costs no query; a session is only
+    opened on a cache miss.
+    """
+    token, _ = websocket_token(websocket)
+    if not token:
+        return None
+    
+    try:
+        token_data = verify_token(token)
+    except HTTPException:
+        return None
+    if token_data.user_type != user_type:
+        return None
+    
+    principal = await cached_principal(token_data.user_id, user_type)
+    if principal is None or principal.profile is None:
+        return None
+    return principal
 
 # Optional authentication (for WebSocket connections)
-def get_current_user_optional(
+async def get_current_user_optional(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current user, return None if not authenticated."""
     try:
         token = credentials.credentials
         token_data = verify_token(token)
         
-        user = db.query(User).filter(
-            User.id == token_data.user_id,
-            User.user_type == token_data.user_type,
-            User.is_active == True
-        ).first()
+        principal = await resolve_principal(db, token_data.user_id, token_data.user_type)
+        if principal is None:
+            return None
         
-        return user
+        return (await attach_principal(db, principal)).user
     except:
         return None
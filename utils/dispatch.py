@@ -0,0 +1,326 @@
+import asyncio
+import heapq
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from dotenv import load_dotenv
+
+from utils.offers import OFFER_MAX_WAVES, OFFER_TIMEOUT_SECONDS, Exhausted
+from utils.pricing import estimate_duration_min
+from utils.serializers import ride_request
+from utils.spatial_index import DriverIndex, driver_index
+
+load_dotenv()
+
+# "broadcast" offers each request to the nearest drivers at once (first tap
+# wins); "batched" collects requests and offers each driver one ride
+DISPATCH_MODE = os.getenv("DISPATCH_MODE", "broadcast")
+# Seconds requests are collected before a batch is solved
+DISPATCH_BATCH_SECONDS = float(os.getenv("DISPATCH_BATCH_SECONDS", 2))
+# Nearest drivers considered for each ride, and how far away they may be
+DISPATCH_CANDIDATES = int(os.getenv("DISPATCH_CANDIDATES", 10))
+DISPATCH_RADIUS_KM = float(os.getenv("DISPATCH_RADIUS_KM", 10))
+# Seconds a driver has to accept an offer before the ride is re-dispatched
+DISPATCH_OFFER_SECONDS = float(os.getenv("DISPATCH_OFFER_SECONDS", 15))
+# Seconds a ride may wait unmatched before it expires; by default as long
+# as a broadcast request takes to run out of offer waves
+DISPATCH_EXPIRE_SECONDS = float(os.getenv("DISPATCH_EXPIRE_SECONDS", OFFER_MAX_WAVES * OFFER_TIMEOUT_SECONDS))
+
+# Cost of pairing a ride with a driver who is not one of its candidates.
+# Large enough that the solver always prefers one more match to any saving
+# in pickup time, so these pairs only appear where no real match exists.
+_NO_MATCH = 1e9
+
+Send = Callable[[int, dict], Awaitable[None]]
+
+def solve_assignment(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """Minimum-cost assignment of rows to columns (Hungarian algorithm).
+
+    Works on rectangular matrices; every row is paired with a distinct
+    column when there are at least as many columns as rows, and vice versa.
+    Returns ``(row, column)`` pairs. O(n^2 m), with the inner scan over
+    columns vectorized.
+    """
+    cost = np.asarray(cost, dtype=float)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if n == 0:
+        return []
+
+    # Shortest augmenting paths with row/column potentials u and v.
+    # Index 0 is a virtual column; row_of[j] is the 1-based row holding column j.
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    row_of = np.zeros(m + 1, dtype=int)
+    way = np.zeros(m + 1, dtype=int)
+    for row in range(1, n + 1):
+        row_of[0] = row
+        column = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            free = ~used
+            slack = cost[row_of[column] - 1] - u[row_of[column]] - v[1:]
+            improved = free[1:] & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            way[1:][improved] = column
+
+            candidates = np.where(free, min_slack, np.inf)
+            next_column = int(np.argmin(candidates))
+            delta = candidates[next_column]
+            used_columns = np.flatnonzero(used)
+            u[row_of[used_columns]] += delta
+            v[used_columns] -= delta
+            min_slack[free] -= delta
+
+            column = next_column
+            if row_of[column] == 0:
+                break
+        # Flip the augmenting path
+        while column:
+            previous = way[column]
+            row_of[column] = row_of[previous]
+            column = previous
+
+    pairs = [(int(row_of[j]) - 1, j - 1) for j in range(1, m + 1) if row_of[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+class PendingRide:
+    """A ride waiting for a driver, with the drivers it should not go to again."""
+
+    __slots__ = ("ride_id", "lat", "lng", "message", "submitted_at", "vehicle_type", "passenger_id", "excluded")
+
+    def __init__(
+        self,
+        ride_id: int,
+        lat: float,
+        lng: float,
+        message: dict,
+        submitted_at: float,
+        vehicle_type: Optional[str] = None,
+        passenger_id: Optional[int] = None
+    ):
+        self.ride_id = ride_id
+        self.lat = lat
+        self.lng = lng
+        self.message = message
+        self.submitted_at = submitted_at
+        self.vehicle_type = vehicle_type
+        self.passenger_id = passenger_id
+        self.excluded: Set[int] = set()
+
+class Dispatcher:
+    """Batched ride dispatch.
+
+    Requests wait up to ``batch_seconds``; then every waiting ride is matched
+    against its nearest available drivers in one minimum-total-pickup-time
+    assignment, and each matched driver is offered exactly one ride. Drivers
+    with an open offer are left out of later batches. A ride whose offer is
+    declined or expires goes back into the next batch without that driver.
+    A ride still unmatched ``expire_seconds`` after it was submitted is
+    dropped and handed to the ``on_expired`` callback.
+    """
+
+    def __init__(
+        self,
+        index: DriverIndex = driver_index,
+        batch_seconds: float = DISPATCH_BATCH_SECONDS,
+        candidates: int = DISPATCH_CANDIDATES,
+        radius_km: float = DISPATCH_RADIUS_KM,
+        offer_seconds: float = DISPATCH_OFFER_SECONDS,
+        expire_seconds: float = DISPATCH_EXPIRE_SECONDS
+    ):
+        self.index = index
+        self.batch_seconds = batch_seconds
+        self.candidates = candidates
+        self.radius_km = radius_km
+        self.offer_seconds = offer_seconds
+        self.expire_seconds = expire_seconds
+        self._on_expired: Optional[Exhausted] = None
+        # Running on_expired callbacks, kept referenced until they finish
+        self._closing: Set[asyncio.Task] = set()
+        self._pending: Dict[int, PendingRide] = {}
+        # ride_id -> (ride, driver_id, expires at); driver_id -> ride_id
+        self._offers: Dict[int, Tuple[PendingRide, int, float]] = {}
+        self._offered_drivers: Dict[int, int] = {}
+        # (expires at, ride_id, driver_id), oldest first; entries for offers
+        # that were accepted or declined meanwhile are skipped when popped
+        self._expiry: List[Tuple[float, int, int]] = []
+        self.batches = 0
+        self.offers_sent = 0
+        self.expired_offers = 0
+        self.expired_rides = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self._latency_total = 0.0
+
+    def submit(
+        self,
+        ride_id: int,
+        lat: float,
+        lng: float,
+        message: dict,
+        vehicle_type: Optional[str] = None,
+        passenger_id: Optional[int] = None
+    ):
+        """Queue a requested ride for the next batch."""
+        self._pending[ride_id] = PendingRide(ride_id, lat, lng, message, time.monotonic(), vehicle_type, passenger_id)
+
+    def ride_closed(self, ride_id: int) -> Set[int]:
+        """Forget a ride that was accepted or cancelled; returns the driver with an open offer for it, if any."""
+        self._pending.pop(ride_id, None)
+        offer = self._offers.pop(ride_id, None)
+        if offer is None:
+            return set()
+        self._offered_drivers.pop(offer[1], None)
+        return {offer[1]}
+
+    def decline(self, ride_id: int, driver_id: int):
+        """The offered driver turned the ride down: re-dispatch it without them."""
+        offer = self._offers.get(ride_id)
+        if offer is not None and offer[1] == driver_id:
+            self._requeue(ride_id)
+
+    def _requeue(self, ride_id: int):
+        ride, driver_id, _ = self._offers.pop(ride_id)
+        self._offered_drivers.pop(driver_id, None)
+        ride.excluded.add(driver_id)
+        self._pending[ride_id] = ride
+
+    def plan(self, rides: List[PendingRide]) -> List[Tuple[PendingRide, int, float]]:
+        """Optimal ``(ride, driver_id, pickup_km)`` matches for a batch."""
+        candidates = []
+        drivers: Dict[int, int] = {}
+        for ride in rides:
+            nearby = [
+                (driver_id, distance)
+                for driver_id, distance in self.index.nearest(
+                    ride.lat, ride.lng, self.candidates + len(ride.excluded),
+                    self.radius_km, ride.vehicle_type, exclude=self._offered_drivers
+                )
+                if driver_id not in ride.excluded
+            ][:self.candidates]
+            candidates.append(nearby)
+            for driver_id, _ in nearby:
+                drivers.setdefault(driver_id, len(drivers))
+
+        if not drivers:
+            return []
+
+        # Pickup ETA grows with distance, so minimizing total distance
+        # minimizes total pickup time
+        cost = np.full((len(rides), len(drivers)), _NO_MATCH)
+        for row, nearby in enumerate(candidates):
+            for driver_id, distance in nearby:
+                cost[row, drivers[driver_id]] = distance
+
+        driver_ids = list(drivers)
+        return [
+            (rides[row], driver_ids[column], float(cost[row, column]))
+            for row, column in solve_assignment(cost)
+            if cost[row, column] < _NO_MATCH
+        ]
+
+    async def dispatch(self, send: Send) -> int:
+        """Solve the current batch and send the offers; returns the number sent."""
+        started = time.perf_counter()
+        now = time.monotonic()
+
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, ride_id, driver_id = heapq.heappop(self._expiry)
+            offer = self._offers.get(ride_id)
+            if offer is not None and offer[1] == driver_id and offer[2] == expires_at:
+                self._requeue(ride_id)
+                self.expired_offers += 1
+
+        expire_before = now - self.expire_seconds
+        for ride in [ride for ride in self._pending.values() if ride.submitted_at <= expire_before]:
+            del self._pending[ride.ride_id]
+            self.expired_rides += 1
+            if self._on_expired is not None:
+                # In the background, so its database write does not delay the batch
+                task = asyncio.create_task(self._expire(ride))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+
+        rides = list(self._pending.values())
+        matches = self.plan(rides) if rides else []
+        for ride, driver_id, pickup_km in matches:
+            del self._pending[ride.ride_id]
+            expires_at = now + self.offer_seconds
+            self._offers[ride.ride_id] = (ride, driver_id, expires_at)
+            self._offered_drivers[driver_id] = ride.ride_id
+            heapq.heappush(self._expiry, (expires_at, ride.ride_id, driver_id))
+            self._latency_total += now - ride.submitted_at
+
+        self.batches += 1
+        self.offers_sent += len(matches)
+        self.last_batch_size = len(rides)
+        self.last_batch_ms = round((time.perf_counter() - started) * 1000, 3)
+
+        for ride, driver_id, pickup_km in matches:
+            await send(driver_id, {
+                **ride.message,
+                "pickup_km": round(pickup_km, 2),
+                "pickup_eta_minutes": round(estimate_duration_min(pickup_km), 1),
+                "offer_expires_in": self.offer_seconds
+            })
+        return len(matches)
+
+    async def _expire(self, ride: PendingRide):
+        try:
+            await self._on_expired(ride.ride_id, ride.passenger_id)
+        except Exception as e:
+            print(f"Closing unmatched ride {ride.ride_id} failed: {e}")
+
+    async def load(self, db: AsyncSession):
+        """Queue the rides still waiting for a driver, e.g. after a restart."""
+        from models.database import Ride
+
+        rides = (await db.scalars(
+            select(Ride)
+            .options(joinedload(Ride.passenger))
+            .filter(Ride.status == "requested")
+            .order_by(Ride.requested_at, Ride.id)
+        )).all()
+        for ride in rides:
+            self.submit(
+                ride.id, ride.pickup_lat, ride.pickup_lng, ride_request(ride, ride.passenger),
+                ride.vehicle_type, ride.passenger_id
+            )
+
+    async def run(self, send: Send, on_expired: Optional[Exhausted] = None):
+        """Dispatch a batch every ``batch_seconds`` until cancelled."""
+        self._on_expired = on_expired
+        while True:
+            await asyncio.sleep(self.batch_seconds)
+            try:
+                await self.dispatch(send)
+            except Exception as e:
+                print(f"Dispatch batch failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "mode": DISPATCH_MODE,
+            "pending_rides": len(self._pending),
+            "open_offers": len(self._offers),
+            "batches": self.batches,
+            "offers_sent": self.offers_sent,
+            "expired_offers": self.expired_offers,
+            "expired_rides": self.expired_rides,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": self.last_batch_ms,
+            "avg_match_latency_ms": round(self._latency_total / self.offers_sent * 1000, 1) if self.offers_sent else 0.0
+        }
+
+dispatcher = Dispatcher()
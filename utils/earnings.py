@@ -0,0 +1,89 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import DriverDailyEarnings
+
+daily_table = DriverDailyEarnings.__table__
+
+async def record_completed_ride(db: AsyncSession, driver_id: int, completed_at: datetime, fare: float):
+    """Add a completed ride to the driver's daily rollup.
+
+    Runs in the caller's transaction, so the rollup commits (or rolls back)
+    together with the ride itself.
+    """
+    day = completed_at.date()
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(daily_table).values(driver_id=driver_id, day=day, rides=1, earnings=fare)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[daily_table.c.driver_id, daily_table.c.day],
+            set_={
+                "rides": daily_table.c.rides + 1,
+                "earnings": daily_table.c.earnings + statement.excluded.earnings
+            }
+        ))
+        return
+
+    result = await db.execute(
+        update(daily_table)
+        .where(daily_table.c.driver_id == driver_id, daily_table.c.day == day)
+        .values(rides=daily_table.c.rides + 1, earnings=daily_table.c.earnings + fare)
+    )
+    if result.rowcount == 0:
+        await db.execute(daily_table.insert().values(driver_id=driver_id, day=day, rides=1, earnings=fare))
+
+def period_start(period: str, today: date) -> date:
+    """First day of the day/week (Monday)/month containing ``today``."""
+    if period == "week":
+        return today - timedelta(days=today.weekday())
+    if period == "month":
+        return today.replace(day=1)
+    return today
+
+async def earnings_summary(db: AsyncSession, driver_id: int, period: str = "day", today: Optional[date] = None) -> Dict:
+    """Lifetime, today's and per-period earnings from the daily rollup.
+
+    Two indexed queries whatever the driver's history: one aggregate over
+    the driver's rollup rows and one read of the days in the period.
+    """
+    today = today or datetime.utcnow().date()
+    start = period_start(period, today)
+
+    total_rides, total_earnings = (await db.execute(
+        select(func.coalesce(func.sum(DriverDailyEarnings.rides), 0), func.coalesce(func.sum(DriverDailyEarnings.earnings), 0.0))
+        .filter(DriverDailyEarnings.driver_id == driver_id)
+    )).one()
+
+    days: List[DriverDailyEarnings] = (await db.scalars(
+        select(DriverDailyEarnings).filter(
+            DriverDailyEarnings.driver_id == driver_id,
+            DriverDailyEarnings.day >= start,
+            DriverDailyEarnings.day <= today
+        ).order_by(DriverDailyEarnings.day)
+    )).all()
+
+    today_row = next((row for row in days if row.day == today), None)
+    period_rides = sum(row.rides for row in days)
+    period_earnings = sum(row.earnings for row in days)
+
+    return {
+        "total_rides": total_rides,
+        "total_earnings": total_earnings,
+        "today_rides": today_row.rides if today_row else 0,
+        "today_earnings": today_row.earnings if today_row else 0,
+        "average_fare": total_earnings / total_rides if total_rides > 0 else 0,
+        "period": period,
+        "period_start": start.isoformat(),
+        "period_rides": period_rides,
+        "period_earnings": period_earnings,
+        "daily": [
+            {"date": row.day.isoformat(), "rides": row.rides, "earnings": row.earnings}
+            for row in days
+        ]
+    }
@@ -0,0 +1,30 @@
+import math
+
+import numpy as np
+
+# Earth's radius in kilometers
+EARTH_RADIUS_KM = 6371
+
+# Length of one degree of latitude in kilometers
+KM_PER_DEGREE_LAT = 111.32
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two coordinates in kilometers."""
+    lat1, lng1, lat2, lng2 = map(math.radians, [lat1, lng1, lat2, lng2])
+
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng/2)**2
+    return 2 * math.asin(math.sqrt(a)) * EARTH_RADIUS_KM
+
+def haversine_many(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """Distances in kilometers from one point to every point in ``lats``/``lngs``."""
+    lat_r = math.radians(lat)
+    lats_r = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs_r = np.radians(np.asarray(lngs, dtype=np.float64))
+
+    a = (
+        np.sin((lats_r - lat_r) * 0.5) ** 2
+        + math.cos(lat_r) * np.cos(lats_r) * np.sin((lngs_r - math.radians(lng)) * 0.5) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+from dotenv import load_dotenv
+
+from models.database import AsyncSessionLocal, Driver
+
+load_dotenv()
+
+# Seconds between bulk writes of buffered driver positions
+LOCATION_FLUSH_INTERVAL = float(os.getenv("LOCATION_FLUSH_INTERVAL", 5))
+
+Position = Tuple[float, float, datetime]
+
+drivers_table = Driver.__table__
+
+# One executemany UPDATE for a whole batch
+_flush_statement = (
+    update(drivers_table)
+    .where(drivers_table.c.id == bindparam("driver_id"))
+    .values(
+        current_lat=bindparam("lat"),
+        current_lng=bindparam("lng"),
+        last_location_update=bindparam("located_at")
+    )
+)
+
+class LiveLocationStore:
+    """Latest driver positions, persisted to the database in coalesced batches."""
+
+    def __init__(self, flush_interval: float = LOCATION_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._positions: Dict[int, Position] = {}
+        self._dirty: set = set()
+        self.updates = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def update(self, driver_id: int, lat: float, lng: float, updated_at: Optional[datetime] = None) -> Position:
+        """Record a position; it is visible immediately and written on the next flush."""
+        position = (lat, lng, updated_at or datetime.utcnow())
+        self._positions[driver_id] = position
+        self._dirty.add(driver_id)
+        self.updates += 1
+        return position
+
+    def get(self, driver_id: int) -> Optional[Position]:
+        return self._positions.get(driver_id)
+
+    def discard(self, driver_id: int):
+        """Forget a driver's position without writing it (e.g. going offline)."""
+        self._positions.pop(driver_id, None)
+        self._dirty.discard(driver_id)
+
+    def position_of(self, driver) -> Position:
+        """Freshest known position of a driver row, preferring the live store."""
+        return self._positions.get(driver.id) or (
+            driver.current_lat, driver.current_lng, driver.last_location_update
+        )
+
+    async def flush(self) -> int:
+        """Write every position changed since the last flush in one statement."""
+        if not self._dirty:
+            return 0
+
+        dirty, self._dirty = self._dirty, set()
+        batch = []
+        for driver_id in dirty:
+            position = self._positions.get(driver_id)
+            if position is not None:
+                lat, lng, updated_at = position
+                batch.append({"driver_id": driver_id, "lat": lat, "lng": lng, "located_at": updated_at})
+
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(_flush_statement, batch)
+                await db.commit()
+        except Exception:
+            # Retry on the next tick for drivers that are still tracked
+            self._dirty.update(row["driver_id"] for row in batch if row["driver_id"] in self._positions)
+            self.failed_flushes += 1
+            raise
+
+        self.flushes += 1
+        self.rows_flushed += len(batch)
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        return len(batch)
+
+    async def run(self):
+        """Background loop flushing buffered positions every ``flush_interval`` seconds."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Failed to flush driver locations: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "tracked_drivers": len(self._positions),
+            "pending_writes": len(self._dirty),
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "flush_interval_seconds": self.flush_interval
+        }
+
+location_store = LiveLocationStore()
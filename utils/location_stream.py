@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from utils.geo import haversine_km
+
+load_dotenv()
+
+# Minimum seconds between two positions forwarded for the same driver
+LOCATION_FANOUT_INTERVAL = float(os.getenv("LOCATION_FANOUT_INTERVAL", 2))
+# Positions closer than this to the last forwarded one are dropped
+LOCATION_FANOUT_MIN_METERS = float(os.getenv("LOCATION_FANOUT_MIN_METERS", 5))
+
+SendToPassenger = Callable[[int, dict], Awaitable[None]]
+
+class DriverLocationFanout:
+    """Forwards live driver positions to the passenger of the driver's active ride.
+
+    Forwarding is throttled and deduplicated per driver, and at most one send
+    per driver is in flight, so a slow passenger socket never builds a backlog:
+    positions that arrive meanwhile are simply superseded by later pings.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = LOCATION_FANOUT_INTERVAL,
+        min_distance_m: float = LOCATION_FANOUT_MIN_METERS
+    ):
+        self.min_interval = min_interval
+        self.min_distance_km = min_distance_m / 1000
+        self._assignments: Dict[int, Tuple[int, int]] = {}
+        self._last_sent: Dict[int, Tuple[float, float, float]] = {}
+        self._in_flight: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.forwarded = 0
+        self.throttled = 0
+        self.deduplicated = 0
+        self.busy = 0
+
+    def assign(self, driver_id: int, ride_id: int, passenger_id: int):
+        """Start forwarding a driver's positions to a ride's passenger."""
+        self._assignments[driver_id] = (ride_id, passenger_id)
+        self._last_sent.pop(driver_id, None)
+
+    def release(self, driver_id: int):
+        """Stop forwarding once the driver's ride has ended."""
+        self._assignments.pop(driver_id, None)
+        self._last_sent.pop(driver_id, None)
+
+    def ride_for(self, driver_id: int) -> Optional[Tuple[int, int]]:
+        """``(ride_id, passenger_id)`` of the driver's active ride, if any."""
+        return self._assignments.get(driver_id)
+
+    async def load(self, db: AsyncSession):
+        """Rebuild driver-to-ride assignments from the rides in progress."""
+        from models.database import Ride, ASSIGNED_RIDE_STATUSES
+
+        self._assignments.clear()
+        self._last_sent.clear()
+        rows = (await db.execute(select(Ride.driver_id, Ride.id, Ride.passenger_id).filter(
+            Ride.driver_id.isnot(None),
+            Ride.status.in_(ASSIGNED_RIDE_STATUSES)
+        ))).all()
+
+        for driver_id, ride_id, passenger_id in rows:
+            self._assignments[driver_id] = (ride_id, passenger_id)
+
+    def publish(self, driver_id: int, lat: float, lng: float, send: SendToPassenger) -> bool:
+        """Schedule a position for the driver's passenger; returns whether it was sent."""
+        assignment = self._assignments.get(driver_id)
+        if assignment is None:
+            return False
+
+        now = time.monotonic()
+        last = self._last_sent.get(driver_id)
+        if last is not None:
+            last_lat, last_lng, sent_at = last
+            if haversine_km(last_lat, last_lng, lat, lng) < self.min_distance_km:
+                self.deduplicated += 1
+                return False
+            if now - sent_at < self.min_interval:
+                self.throttled += 1
+                return False
+
+        if driver_id in self._in_flight:
+            self.busy += 1
+            return False
+
+        ride_id, passenger_id = assignment
+        message = {
+            "type": "driver_location_update",
+            "ride_id": ride_id,
+            "driver": {
+                "id": driver_id,
+                "current_lat": lat,
+                "current_lng": lng
+            }
+        }
+
+        self._last_sent[driver_id] = (lat, lng, now)
+        self._in_flight.add(driver_id)
+        task = asyncio.create_task(self._send(driver_id, passenger_id, message, send))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.forwarded += 1
+        return True
+
+    async def _send(self, driver_id: int, passenger_id: int, message: dict, send: SendToPassenger):
+        try:
+            await send(passenger_id, message)
+        except Exception as e:
+            print(f"Failed to forward location of driver {driver_id}: {e}")
+        finally:
+            self._in_flight.discard(driver_id)
+
+    def stats(self) -> dict:
+        return {
+            "tracked_rides": len(self._assignments),
+            "forwarded": self.forwarded,
+            "throttled": self.throttled,
+            "deduplicated": self.deduplicated,
+            "dropped_busy": self.busy
+        }
+
+location_fanout = DriverLocationFanout()
@@ -0,0 +1,231 @@
+import asyncio
+import heapq
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from dotenv import load_dotenv
+
+from utils.serializers import ride_request
+from utils.spatial_index import DriverIndex, driver_index
+from utils.websocket_manager import ConnectionManager, manager
+
+load_dotenv()
+
+# Nearest drivers offered a ride at once, per wave
+OFFER_WAVE_SIZE = int(os.getenv("OFFER_WAVE_SIZE", 5))
+# Seconds a wave has to accept before the ride goes to the next drivers
+OFFER_TIMEOUT_SECONDS = float(os.getenv("OFFER_TIMEOUT_SECONDS", 15))
+# Waves tried before the request is given up as unmatched
+OFFER_MAX_WAVES = int(os.getenv("OFFER_MAX_WAVES", 6))
+# Wait before the next wave when no new driver was in range
+OFFER_RETRY_SECONDS = float(os.getenv("OFFER_RETRY_SECONDS", 10))
+
+# Called with (ride_id, passenger_id) when every wave went unanswered
+Exhausted = Callable[[int, int], Awaitable[None]]
+
+class RideOffers:
+    """Offer state of one requested ride."""
+
+    __slots__ = ("ride_id", "passenger_id", "lat", "lng", "vehicle_type", "message", "wave", "offered", "outstanding")
+
+    def __init__(
+        self,
+        ride_id: int,
+        passenger_id: int,
+        lat: float,
+        lng: float,
+        message: dict,
+        vehicle_type: Optional[str] = None
+    ):
+        self.ride_id = ride_id
+        self.passenger_id = passenger_id
+        self.lat = lat
+        self.lng = lng
+        self.vehicle_type = vehicle_type
+        self.message = message
+        self.wave = 0
+        # Every driver offered this ride so far, and those of the current wave
+        self.offered: Set[int] = set()
+        self.outstanding: Set[int] = set()
+
+class OfferScheduler:
+    """Offers requested rides to drivers in waves until one accepts.
+
+    Each wave goes to the next ``wave_size`` nearest drivers not offered the
+    ride yet. A wave ends when every driver in it rejects or when it times
+    out; its open offers are withdrawn and the next wave goes out. After
+    ``max_waves`` the request is handed to the ``on_exhausted`` callback.
+
+    Deadlines live in one heap served by a single task that sleeps until the
+    earliest one, so open requests cost no task or polling each. Entries are
+    not removed when a wave ends early; stale ones are skipped when popped.
+    """
+
+    def __init__(
+        self,
+        index: DriverIndex = driver_index,
+        connections: ConnectionManager = manager,
+        wave_size: int = OFFER_WAVE_SIZE,
+        timeout_seconds: float = OFFER_TIMEOUT_SECONDS,
+        max_waves: int = OFFER_MAX_WAVES,
+        retry_seconds: float = OFFER_RETRY_SECONDS
+    ):
+        self.index = index
+        self.wave_size = wave_size
+        self.timeout_seconds = timeout_seconds
+        self.max_waves = max_waves
+        self.retry_seconds = retry_seconds
+        self.connections = connections
+        self._on_exhausted: Optional[Exhausted] = None
+        self._rides: Dict[int, RideOffers] = {}
+        # (due, ride_id, wave)
+        self._timers: List[Tuple[float, int, int]] = []
+        self._wakeup = asyncio.Event()
+        # Running on_exhausted callbacks, kept referenced until they finish
+        self._closing: Set[asyncio.Task] = set()
+        self.offers_sent = 0
+        self.rejections = 0
+        self.timeouts = 0
+        self.exhausted = 0
+
+    def __len__(self) -> int:
+        return len(self._rides)
+
+    async def start(
+        self,
+        ride_id: int,
+        passenger_id: int,
+        lat: float,
+        lng: float,
+        message: dict,
+        vehicle_type: Optional[str] = None
+    ) -> int:
+        """Send the first wave for a new request; returns how many drivers got it."""
+        ride = self._rides[ride_id] = RideOffers(ride_id, passenger_id, lat, lng, message, vehicle_type)
+        await self._next_wave(ride)
+        return len(ride.outstanding)
+
+    async def reject(self, ride_id: int, driver_id: int):
+        """A driver turned the ride down; once the whole wave has, move on."""
+        ride = self._rides.get(ride_id)
+        if ride is None or driver_id not in ride.outstanding:
+            return
+        ride.outstanding.discard(driver_id)
+        self.rejections += 1
+        if not ride.outstanding:
+            await self._next_wave(ride)
+
+    def ride_closed(self, ride_id: int) -> Set[int]:
+        """Stop offering a ride (accepted or cancelled); returns every driver it was offered to."""
+        ride = self._rides.pop(ride_id, None)
+        return ride.offered if ride is not None else set()
+
+    async def _next_wave(self, ride: RideOffers):
+        if ride.outstanding:
+            await self.connections.broadcast_to_drivers(
+                {"type": "ride_offer_expired", "ride_id": ride.ride_id}, list(ride.outstanding)
+            )
+            ride.outstanding = set()
+
+        if ride.wave >= self.max_waves:
+            del self._rides[ride.ride_id]
+            self.exhausted += 1
+            if self._on_exhausted is not None:
+                # Off the timer task, so its database write delays no other ride's deadline
+                task = asyncio.create_task(self._exhaust(ride))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+            return
+
+        ride.wave += 1
+        nearest = self.index.nearest(
+            ride.lat, ride.lng, self.wave_size,
+            vehicle_type=ride.vehicle_type, exclude=ride.offered
+        )
+        driver_ids = [driver_id for driver_id, _ in nearest]
+        ride.outstanding = set(driver_ids)
+        ride.offered.update(driver_ids)
+        self._schedule(ride, self.timeout_seconds if driver_ids else self.retry_seconds)
+
+        if driver_ids:
+            self.offers_sent += len(driver_ids)
+            await self.connections.broadcast_to_drivers(
+                {**ride.message, "wave": ride.wave, "offer_expires_in": self.timeout_seconds}, driver_ids
+            )
+
+    async def _exhaust(self, ride: RideOffers):
+        try:
+            await self._on_exhausted(ride.ride_id, ride.passenger_id)
+        except Exception as e:
+            print(f"Closing unmatched ride {ride.ride_id} failed: {e}")
+
+    def _schedule(self, ride: RideOffers, delay: float):
+        due = time.monotonic() + delay
+        heapq.heappush(self._timers, (due, ride.ride_id, ride.wave))
+        if self._timers[0][0] == due:
+            # New earliest deadline: let the timer task re-arm
+            self._wakeup.set()
+
+    async def load(self, db: AsyncSession):
+        """Queue the rides still waiting for a driver, e.g. after a restart."""
+        from models.database import Ride
+
+        rides = (await db.scalars(
+            select(Ride)
+            .options(joinedload(Ride.passenger))
+            .filter(Ride.status == "requested")
+            .order_by(Ride.requested_at, Ride.id)
+        )).all()
+        for ride in rides:
+            offers = self._rides[ride.id] = RideOffers(
+                ride.id, ride.passenger_id, ride.pickup_lat, ride.pickup_lng,
+                ride_request(ride, ride.passenger), ride.vehicle_type
+            )
+            # Due immediately: the timer task sends the first wave
+            self._schedule(offers, 0)
+
+    async def run(self, on_exhausted: Optional[Exhausted] = None):
+        """Serve wave deadlines until cancelled."""
+        self._on_exhausted = on_exhausted
+        self._wakeup = asyncio.Event()
+        while True:
+            if not self._timers:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._timers[0][0] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, ride_id, wave = heapq.heappop(self._timers)
+            ride = self._rides.get(ride_id)
+            if ride is None or ride.wave != wave:
+                continue
+            if ride.outstanding:
+                self.timeouts += 1
+            try:
+                await self._next_wave(ride)
+            except Exception as e:
+                print(f"Offer wave for ride {ride_id} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "open_requests": len(self._rides),
+            "pending_timers": len(self._timers),
+            "offers_sent": self.offers_sent,
+            "rejections": self.rejections,
+            "timeouts": self.timeouts,
+            "exhausted": self.exhausted
+        }
+
+offer_scheduler = OfferScheduler()
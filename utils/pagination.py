@@ -0,0 +1,69 @@
+import base64
+import os
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from models.database import AsyncSessionLocal, Ride
+from utils.serializers import dumps
+
+load_dotenv()
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 50))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 200))
+# Rides fetched per query while streaming an export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 500))
+
+Cursor = Tuple[datetime, int]
+
+def encode_cursor(ride: Ride) -> str:
+    """Opaque cursor pointing just past ``ride`` in newest-first order."""
+    raw = f"{ride.requested_at.isoformat()}|{ride.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        requested_at, ride_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(requested_at), int(ride_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def newest_first(statement: Select, after: Optional[Cursor], limit: int) -> Select:
+    """Keyset page of rides ordered by ``(requested_at, id)`` descending."""
+    if after is not None:
+        statement = statement.filter(tuple_(Ride.requested_at, Ride.id) < tuple_(*after))
+    return statement.order_by(Ride.requested_at.desc(), Ride.id.desc()).limit(limit)
+
+async def ride_page(db: AsyncSession, statement: Select, cursor: Optional[str], limit: int) -> Tuple[List[Ride], Optional[str]]:
+    """One page of rides plus the cursor of the next page (None on the last one)."""
+    after = decode_cursor(cursor) if cursor else None
+    rides = (await db.scalars(newest_first(statement, after, limit + 1))).all()
+    if len(rides) <= limit:
+        return rides, None
+    rides = rides[:limit]
+    return rides, encode_cursor(rides[-1])
+
+async def stream_rides(statement: Select, serialize: Callable[[Ride], dict], chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield every matching ride as an NDJSON line, newest first.
+
+    Rides are read in keyset chunks, each in a short session of its own, so
+    memory stays flat and no connection is held while the client reads.
+    """
+    after = None
+    while True:
+        async with AsyncSessionLocal() as db:
+            rides = (await db.scalars(newest_first(statement, after, chunk_size))).all()
+            lines = b"".join(dumps(serialize(ride)) + b"\n" for ride in rides)
+        if lines:
+            yield lines
+        if len(rides) < chunk_size:
+            return
+        after = (rides[-1].requested_at, rides[-1].id)
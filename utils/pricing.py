@@ -0,0 +1,240 @@
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Shared with the Node fare service in taxi_app/backend
+PRICING_CONFIG_PATH = os.getenv(
+    "PRICING_CONFIG_PATH", os.path.join(_REPO_ROOT, "taxi_app", "backend", "pricing.config.json")
+)
+# Seconds between checks of the config file for changes
+PRICING_RELOAD_INTERVAL = float(os.getenv("PRICING_RELOAD_INTERVAL", 2))
+# Average speed used to estimate trip duration when none is given
+PRICING_AVG_SPEED_KMH = float(os.getenv("PRICING_AVG_SPEED_KMH", 25))
+
+# Used for unknown vehicle types, as in the Node calculator
+DEFAULT_VEHICLE_TYPE = "Standard"
+
+class RateTable(NamedTuple):
+    """pricing.config.json compiled into per-vehicle rate arrays."""
+    vehicle_types: Tuple[str, ...]
+    index: Dict[str, int]  # lower-cased vehicle type -> row
+    base_fare: np.ndarray
+    per_km: np.ndarray
+    per_min: np.ndarray
+    min_fare: np.ndarray
+    waiting_per_min: float
+    waiting_free_mins: float
+    night_enabled: bool
+    night_start_hour: int
+    night_end_hour: int
+    night_multiplier: float
+    surge_enabled: bool
+    surge_default: float
+    surge_max: float
+    commission_rate: float
+    tax_rate: float
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RateTable":
+        vehicles = config["vehicleTypes"]
+        names = tuple(vehicles)
+        if DEFAULT_VEHICLE_TYPE not in vehicles:
+            raise ValueError(f"pricing config must define the {DEFAULT_VEHICLE_TYPE} vehicle type")
+
+        def column(key: str) -> np.ndarray:
+            return np.array([float(vehicles[name][key]) for name in names])
+
+        waiting = config.get("waiting", {})
+        night = config.get("nightSurcharge", {})
+        surge = config.get("surge", {})
+        return cls(
+            vehicle_types=names,
+            index={name.lower(): row for row, name in enumerate(names)},
+            base_fare=column("baseFare"),
+            per_km=column("perKm"),
+            per_min=column("perMin"),
+            min_fare=column("minFare"),
+            waiting_per_min=float(waiting.get("perMin", 0)),
+            waiting_free_mins=float(waiting.get("freeMins", 0)),
+            night_enabled=bool(night.get("enabled", False)),
+            night_start_hour=int(night.get("startHour", 0)),
+            night_end_hour=int(night.get("endHour", 0)),
+            night_multiplier=float(night.get("multiplier", 1.0)),
+            surge_enabled=bool(surge.get("enabled", False)),
+            surge_default=float(surge.get("defaultMultiplier", 1.0)),
+            surge_max=float(surge.get("maxMultiplier", 1.0)),
+            commission_rate=float(config.get("platformCommission", 0)),
+            tax_rate=float(config.get("taxRate", 0))
+        )
+
+    def row_for(self, vehicle_type: Optional[str]) -> int:
+        return self.index.get((vehicle_type or "").lower(), self.index[DEFAULT_VEHICLE_TYPE.lower()])
+
+    def is_night(self, at: datetime) -> bool:
+        if not self.night_enabled:
+            return False
+        hour = at.hour
+        if self.night_start_hour > self.night_end_hour:
+            return hour >= self.night_start_hour or hour < self.night_end_hour
+        return self.night_start_hour <= hour < self.night_end_hour
+
+    def surge(self, multiplier: Optional[float]) -> float:
+        if not self.surge_enabled:
+            return 1.0
+        return min(multiplier or self.surge_default or 1.0, self.surge_max)
+
+def _round(values: np.ndarray) -> np.ndarray:
+    """Half-up rounding, matching JavaScript's Math.round for fares."""
+    return np.floor(values + 0.5)
+
+class FareEngine:
+    """Fare calculator over the shared pricing config.
+
+    The config is compiled once into a ``RateTable`` and re-read when the
+    file changes (checked at most every ``reload_interval`` seconds); a config
+    that fails to load leaves the previous table in place. Quotes are computed
+    for all vehicle types, or many trips, in one set of array operations.
+    """
+
+    def __init__(self, path: str = PRICING_CONFIG_PATH, reload_interval: float = PRICING_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._table: Optional[RateTable] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    @property
+    def table(self) -> RateTable:
+        now = time.monotonic()
+        if self._table is None or now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            self._reload_if_changed()
+        return self._table
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if self._table is not None and mtime == self._mtime:
+                return
+            with open(self.path) as config_file:
+                table = RateTable.from_config(json.load(config_file))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if self._table is None:
+                raise RuntimeError(f"Cannot load pricing config {self.path}: {e}")
+            self.failed_reloads += 1
+            print(f"Keeping previous pricing config, failed to reload {self.path}: {e}")
+            return
+
+        self._table, self._mtime = table, mtime
+        self.reloads += 1
+        print(f"💰 Pricing config loaded: {', '.join(table.vehicle_types)}")
+
+    def quote_matrix(
+        self,
+        distance_km: np.ndarray,
+        duration_min: np.ndarray,
+        waiting_min: np.ndarray = None,
+        surge_multiplier: Optional[float] = None,
+        at: Optional[datetime] = None
+    ) -> Dict[str, np.ndarray]:
+        """Price every vehicle type for every trip; each output is (trips, vehicle types)."""
+        table = self.table
+        distance = np.maximum(np.asarray(distance_km, dtype=float), 0)[:, None]
+        duration = np.maximum(np.asarray(duration_min, dtype=float), 0)[:, None]
+        if waiting_min is None:
+            waiting_min = np.zeros(distance.shape[0])
+        waiting = np.maximum(np.asarray(waiting_min, dtype=float) - table.waiting_free_mins, 0)[:, None]
+
+        night = table.night_multiplier if table.is_night(at or datetime.now()) else 1.0
+        surge = table.surge(surge_multiplier)
+
+        distance_fare = distance * table.per_km
+        time_fare = duration * table.per_min
+        waiting_charge = waiting * table.waiting_per_min
+        metered = table.base_fare + distance_fare + time_fare + waiting_charge
+        subtotal = _round(np.maximum(metered, table.min_fare) * night * surge)
+        commission = _round(subtotal * table.commission_rate)
+        tax = _round(subtotal * table.tax_rate)
+
+        return {
+            "distance_fare": distance_fare,
+            "time_fare": time_fare,
+            "waiting_charge": np.broadcast_to(waiting_charge, subtotal.shape),
+            "subtotal": subtotal,
+            "commission": commission,
+            "tax": tax,
+            "total": subtotal + tax,
+            "driver_payout": subtotal - commission - tax,
+            "night_multiplier": night,
+            "surge_multiplier": surge
+        }
+
+    def quote_all(
+        self,
+        distance_km: float,
+        duration_min: float,
+        waiting_min: float = 0,
+        surge_multiplier: Optional[float] = None,
+        at: Optional[datetime] = None
+    ) -> List[dict]:
+        """Quotes for one trip in every vehicle type."""
+        table = self.table
+        prices = self.quote_matrix([distance_km], [duration_min], [waiting_min], surge_multiplier, at)
+        rows = {key: prices[key][0].tolist() for key in ("distance_fare", "time_fare", "waiting_charge", "subtotal", "commission", "tax", "total", "driver_payout")}
+
+        return [
+            {
+                "vehicle_type": vehicle_type,
+                "base_fare": float(table.base_fare[row]),
+                "distance_fare": rows["distance_fare"][row],
+                "time_fare": rows["time_fare"][row],
+                "waiting_charge": rows["waiting_charge"][row],
+                "min_fare": float(table.min_fare[row]),
+                "night_multiplier": prices["night_multiplier"],
+                "surge_multiplier": prices["surge_multiplier"],
+                "subtotal": rows["subtotal"][row],
+                "commission": rows["commission"][row],
+                "tax": rows["tax"][row],
+                "total": rows["total"][row],
+                "driver_payout": rows["driver_payout"][row]
+            }
+            for row, vehicle_type in enumerate(table.vehicle_types)
+        ]
+
+    def quote(
+        self,
+        vehicle_type: Optional[str],
+        distance_km: float,
+        duration_min: float,
+        waiting_min: float = 0,
+        surge_multiplier: Optional[float] = None,
+        at: Optional[datetime] = None
+    ) -> dict:
+        """Quote for one trip in one vehicle type (unknown types price as Standard)."""
+        row = self.table.row_for(vehicle_type)
+        return self.quote_all(distance_km, duration_min, waiting_min, surge_multiplier, at)[row]
+
+    def stats(self) -> dict:
+        table = self._table
+        return {
+            "config_path": self.path,
+            "vehicle_types": list(table.vehicle_types) if table else [],
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads
+        }
+
+def estimate_duration_min(distance_km: float) -> float:
+    return distance_km / PRICING_AVG_SPEED_KMH * 60
+
+fare_engine = FareEngine()
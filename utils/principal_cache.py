@@ -0,0 +1,152 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from dotenv import load_dotenv
+
+from models.database import User, Passenger, Driver
+
+load_dotenv()
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+
+# Session.info key holding row changes that become visible once the session commits
+_PENDING_KEY = "principal_cache_pending"
+
+class Principal(NamedTuple):
+    user: User
+    profile: Any  # Passenger, Driver, or None
+
+CacheKey = Tuple[int, str]
+
+class PrincipalCache:
+    """TTL + LRU cache of authenticated users and their profile rows.
+
+    Cached instances are detached from any session; callers merge them into
+    their own session with ``load=False`` so a hit costs no query.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Principal]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int, user_type: str) -> Optional[Principal]:
+        key = (user_id, user_type)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, principal = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return principal
+
+    def put(self, principal: Principal):
+        key = (principal.user.id, principal.user.user_type)
+        self._entries[key] = (time.monotonic(), principal)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        """Drop every cached principal for a user."""
+        for user_type in ("passenger", "driver"):
+            if self._entries.pop((user_id, user_type), None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def apply_update(self, model: type, user_id: int, values: Dict[str, Any]):
+        """Copy committed column values onto the cached copy of a row."""
+        if values.get("is_active") is False:
+            self.invalidate(user_id)
+            return
+
+        for user_type in ("passenger", "driver"):
+            entry = self._entries.get((user_id, user_type))
+            if entry is None:
+                continue
+
+            principal = entry[1]
+            target = principal.user if model is User else principal.profile
+            if target is None or not isinstance(target, model):
+                continue
+            for key, value in values.items():
+                set_committed_value(target, key, value)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+principal_cache = PrincipalCache()
+
+def _owner_user_id(target) -> Optional[int]:
+    return target.id if isinstance(target, User) else target.user_id
+
+def _column_values(target) -> Dict[str, Any]:
+    """Loaded column values of a flushed row, without triggering loads."""
+    state = inspect(target)
+    return {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+
+def _pending(session: Session) -> List[Tuple[type, Optional[int], Optional[Dict[str, Any]]]]:
+    return session.info.setdefault(_PENDING_KEY, [])
+
+def _record_update(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        _pending(session).append((type(target), _owner_user_id(target), _column_values(target)))
+
+def _record_delete(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        _pending(session).append((type(target), _owner_user_id(target), None))
+
+for _model in (User, Passenger, Driver):
+    event.listen(_model, "after_update", _record_update)
+    event.listen(_model, "after_delete", _record_delete)
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    for model, user_id, values in session.info.pop(_PENDING_KEY, []):
+        if user_id is None:
+            continue
+        if values is None:
+            principal_cache.invalidate(user_id)
+        else:
+            principal_cache.apply_update(model, user_id, values)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import Ride, RideEvent
+
+# Sequence number of each status: its position in a ride's life. A ride only
+# moves forward, so the numbers always increase, are the same in every
+# worker and can be rebuilt from the ride row. Gaps are normal (a cancelled
+# ride skips the statuses it never reached).
+RIDE_STATUS_SEQ = {"requested": 0, "accepted": 1, "arrived": 2, "started": 3, "completed": 4, "cancelled": 4}
+TERMINAL_RIDE_STATUSES = ("completed", "cancelled")
+
+class RideTransition:
+    """An allowed status change: from any of ``sources`` to ``target``, stamping the ``timestamp`` column."""
+
+    __slots__ = ("name", "sources", "target", "timestamp", "actor")
+
+    def __init__(self, name: str, sources: Tuple[str, ...], target: str, timestamp: str, actor: str):
+        self.name = name
+        self.sources = sources
+        self.target = target
+        self.timestamp = timestamp
+        self.actor = actor
+
+RIDE_TRANSITIONS: Dict[str, RideTransition] = {transition.name: transition for transition in (
+    RideTransition("accept", ("requested",), "accepted", "accepted_at", "driver"),
+    RideTransition("arrive", ("accepted",), "arrived", "arrived_at", "driver"),
+    RideTransition("start", ("arrived",), "started", "started_at", "driver"),
+    RideTransition("complete", ("started",), "completed", "completed_at", "driver"),
+    RideTransition("cancel", ("requested", "accepted", "arrived"), "cancelled", "cancelled_at", "passenger"),
+    # No driver accepted in any offer wave
+    RideTransition("expire", ("requested",), "cancelled", "cancelled_at", "system"),
+)}
+
+async def log_ride_event(
+    db: AsyncSession,
+    ride_id: int,
+    status: str,
+    actor: Optional[str],
+    actor_id: Optional[int],
+    at: datetime
+):
+    """Append a status change to ``ride_events``; the caller commits."""
+    await db.execute(insert(RideEvent).values(
+        ride_id=ride_id,
+        seq=RIDE_STATUS_SEQ[status],
+        status=status,
+        actor=actor,
+        actor_id=actor_id,
+        created_at=at
+    ))
+
+async def apply_transition(
+    db: AsyncSession,
+    ride_id: int,
+    name: str,
+    actor_id: Optional[int] = None,
+    at: Optional[datetime] = None,
+    where: Iterable = (),
+    **values
+) -> Optional[Ride]:
+    """Move a ride along ``RIDE_TRANSITIONS[name]`` and log it, in the caller's transaction.
+
+    The status check and the write are a single conditional UPDATE (plus any
+    ``where`` conditions, e.g. ownership), so of several concurrent changes
+    from the same state exactly one gets the row back; the others get None
+    and nothing is logged. ``values`` are written along with the status.
+    The caller commits.
+    """
+    transition = RIDE_TRANSITIONS[name]
+    at = at or datetime.utcnow()
+    ride = await db.scalar(
+        update(Ride)
+        .where(Ride.id == ride_id, Ride.status.in_(transition.sources), *where)
+        .values(status=transition.target, **{transition.timestamp: at}, **values)
+        .returning(Ride)
+    )
+    if ride is not None:
+        await log_ride_event(db, ride_id, transition.target, transition.actor, actor_id, at)
+    return ride
+
+async def ride_state(db: AsyncSession, ride_id: int) -> Optional[Row]:
+    """``(status, passenger_id, driver_id)`` of a ride in one primary-key read, or None."""
+    return (await db.execute(
+        select(Ride.status, Ride.passenger_id, Ride.driver_id).filter(Ride.id == ride_id)
+    )).first()
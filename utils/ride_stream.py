@@ -0,0 +1,193 @@
+import asyncio
+import os
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from utils.location_store import location_store
+from utils.ride_states import RIDE_STATUS_SEQ, TERMINAL_RIDE_STATUSES
+from utils.serializers import driver_card, dumps
+from utils.websocket_manager import ConnectionManager, manager
+
+load_dotenv()
+
+# Events buffered for a slow SSE client before it is dropped; it resumes on reconnect
+RIDE_STREAM_QUEUE_SIZE = int(os.getenv("RIDE_STREAM_QUEUE_SIZE", 64))
+# Seconds between keep-alive comments on an idle SSE stream
+RIDE_STREAM_KEEPALIVE_SECONDS = float(os.getenv("RIDE_STREAM_KEEPALIVE_SECONDS", 15))
+
+def status_event(ride, status: str, driver=None) -> dict:
+    """Delta sent when a ride reaches ``status``, numbered by ``RIDE_STATUS_SEQ``.
+
+    The "accepted" event carries the driver card, from ``driver`` or the
+    ride's loaded driver relationship.
+    """
+    if status == "accepted":
+        event = {
+            "type": "driver_assigned",
+            "driver": driver_card(driver if driver is not None else ride.driver),
+            "accepted_at": ride.accepted_at
+        }
+    elif status == "arrived":
+        event = {"type": "driver_arrived", "arrived_at": ride.arrived_at}
+    elif status == "started":
+        event = {"type": "ride_started", "started_at": ride.started_at}
+    elif status == "completed":
+        event = {
+            "type": "ride_completed",
+            "final_fare": ride.fare,
+            "duration_minutes": ride.duration_minutes,
+            "completed_at": ride.completed_at
+        }
+    else:
+        event = {"type": "ride_cancelled", "cancelled_at": ride.cancelled_at, "reason": None}
+    return {**event, "ride_id": ride.id, "status": status, "seq": RIDE_STATUS_SEQ[status]}
+
+def ride_events(ride, after: int = 0) -> List[dict]:
+    """Rebuild the status events after sequence number ``after`` from a ride row.
+
+    Ends with the driver's latest position while the ride is in progress.
+    The driver relationship must be loaded.
+    """
+    reached = [
+        (status, timestamp) for status, timestamp in (
+            ("accepted", ride.accepted_at),
+            ("arrived", ride.arrived_at),
+            ("started", ride.started_at),
+            ("completed", ride.completed_at),
+            ("cancelled", ride.cancelled_at)
+        )
+        if timestamp is not None
+    ]
+    events = [status_event(ride, status) for status, _ in reached if RIDE_STATUS_SEQ[status] > after]
+    if ride.status in ("accepted", "arrived", "started") and ride.driver is not None:
+        events.append(position_event(ride.id, ride.driver))
+    return events
+
+def position_event(ride_id: int, driver) -> dict:
+    """The driver's freshest known position, in the location fanout's message shape."""
+    current_lat, current_lng, _ = location_store.position_of(driver)
+    return {
+        "type": "driver_location_update",
+        "ride_id": ride_id,
+        "driver": {
+            "id": driver.id,
+            "current_lat": current_lat,
+            "current_lng": current_lng
+        }
+    }
+
+def sse_message(event: dict) -> bytes:
+    """One server-sent event; status events carry their sequence number as the event id."""
+    seq = event.get("seq")
+    head = f"id: {seq}\n".encode() if seq is not None else b""
+    return head + b"data: " + dumps(event) + b"\n\n"
+
+class RideEventStream:
+    """Pushes ride status changes and driver positions as they happen.
+
+    Every event goes to the passenger's socket through the connection
+    manager, and to the ride's SSE subscribers in this process. Nothing is
+    kept per ride: a client that reconnects passes the last sequence number
+    it applied and the missed events are rebuilt from the ride row with
+    ``ride_events``. Clients drop status events whose ``seq`` is not above
+    the last one they applied, since a replay can overlap with live events.
+    """
+
+    def __init__(
+        self,
+        connections: ConnectionManager = manager,
+        queue_size: int = RIDE_STREAM_QUEUE_SIZE,
+        keepalive_seconds: float = RIDE_STREAM_KEEPALIVE_SECONDS
+    ):
+        self.connections = connections
+        self.queue_size = queue_size
+        self.keepalive_seconds = keepalive_seconds
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self.published = 0
+        self.positions = 0
+        self.replays = 0
+        self.dropped_subscribers = 0
+
+    async def publish(self, passenger_id: int, event: dict):
+        """Send a status event to the ride's passenger and subscribers."""
+        self.published += 1
+        self._fan_out(event)
+        await self.connections.send_to_passenger(passenger_id, event)
+
+    async def send_position(self, passenger_id: int, message: dict):
+        """Forward a driver position; the ``send`` used by the location fanout."""
+        self.positions += 1
+        self._fan_out(message)
+        await self.connections.send_to_passenger(passenger_id, message)
+
+    async def replay(self, passenger_id: int, ride, after: int = 0):
+        """Resend what a reconnecting passenger socket missed since ``after``."""
+        self.replays += 1
+        for event in ride_events(ride, after):
+            await self.connections.send_to_passenger(passenger_id, event)
+
+    def subscribe(self, ride_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(ride_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, ride_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(ride_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[ride_id]
+
+    def _fan_out(self, event: dict):
+        for queue in list(self._subscribers.get(event["ride_id"], ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind: end its stream so it reconnects and resumes
+                self.unsubscribe(event["ride_id"], queue)
+                self.dropped_subscribers += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def sse(self, ride, queue: asyncio.Queue, after: int = 0) -> AsyncIterator[bytes]:
+        """SSE body for a subscription: the missed events, then live ones until the ride ends."""
+        self.replays += 1
+        last_seq = after
+        finished = ride.status in TERMINAL_RIDE_STATUSES
+        try:
+            for event in ride_events(ride, after):
+                last_seq = event.get("seq", last_seq)
+                yield sse_message(event)
+
+            while not finished:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                seq: Optional[int] = event.get("seq")
+                if seq is not None:
+                    if seq <= last_seq:
+                        continue
+                    last_seq = seq
+                    finished = event["status"] in TERMINAL_RIDE_STATUSES
+                yield sse_message(event)
+        finally:
+            self.unsubscribe(ride.id, queue)
+
+    def stats(self) -> dict:
+        return {
+            "subscribed_rides": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "positions": self.positions,
+            "replays": self.replays,
+            "dropped_subscribers": self.dropped_subscribers
+        }
+
+ride_stream = RideEventStream()
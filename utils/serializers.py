@@ -0,0 +1,117 @@
+from operator import attrgetter
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+import orjson
+from fastapi import Response
+
+from utils.location_store import location_store
+
+Field = Union[str, Tuple[str, str]]
+
+class View:
+    """Serializer for one payload shape.
+
+    The attributes are read with a single ``attrgetter`` call and zipped with
+    the output keys. Datetimes are left as-is: ``dumps`` encodes them in the
+    same ISO 8601 form ``isoformat()`` produces.
+    """
+
+    __slots__ = ("keys", "_get")
+
+    def __init__(self, *fields: Field):
+        self.keys = tuple(field if isinstance(field, str) else field[0] for field in fields)
+        attributes = [field if isinstance(field, str) else field[1] for field in fields]
+        getter = attrgetter(*attributes)
+        # attrgetter returns a bare value rather than a tuple for a single attribute
+        self._get = getter if len(attributes) > 1 else (lambda obj: (getter(obj),))
+
+    def __call__(self, obj) -> dict:
+        return dict(zip(self.keys, self._get(obj)))
+
+    def many(self, objs: Iterable) -> List[dict]:
+        return [self(obj) for obj in objs]
+
+RIDE = View(
+    "id", "pickup_lat", "pickup_lng", "pickup_address",
+    "drop_lat", "drop_lng", "drop_address", "city", "status",
+    "fare", "distance_km", "duration_minutes",
+    "requested_at", "accepted_at", "arrived_at", "started_at", "completed_at", "cancelled_at",
+    "payment_status", "notes"
+)
+RIDE_HISTORY = View(
+    "id", "pickup_address", "drop_address", "city", "status",
+    "fare", "distance_km", "duration_minutes",
+    "requested_at", "completed_at", "cancelled_at", "payment_status"
+)
+PASSENGER_CARD = View("id", "full_name", "phone")
+DRIVER_CARD = View("id", "full_name", "phone", "vehicle_number", "vehicle_type")
+DRIVER_SUMMARY = View("full_name", "vehicle_number", "vehicle_type")
+
+def driver_card(driver) -> dict:
+    """Driver shown to a passenger, with the freshest known position."""
+    card = DRIVER_CARD(driver)
+    card["current_lat"], card["current_lng"], _ = location_store.position_of(driver)
+    return card
+
+def ride_details(ride) -> dict:
+    """Full ride with passenger and driver cards (relationships must be loaded)."""
+    data = RIDE(ride)
+    if ride.passenger:
+        data["passenger"] = PASSENGER_CARD(ride.passenger)
+    if ride.driver:
+        data["driver"] = driver_card(ride.driver)
+    return data
+
+def driver_ride(ride) -> dict:
+    """Full ride as listed to its driver."""
+    data = RIDE(ride)
+    if ride.passenger:
+        data["passenger"] = PASSENGER_CARD(ride.passenger)
+    return data
+
+def passenger_ride(ride) -> dict:
+    """Full ride as listed to its passenger."""
+    data = RIDE(ride)
+    if ride.driver:
+        data["driver"] = driver_card(ride.driver)
+    return data
+
+def history_ride(ride) -> dict:
+    """Finished ride in the passenger's history."""
+    data = RIDE_HISTORY(ride)
+    if ride.driver:
+        data["driver"] = DRIVER_SUMMARY(ride.driver)
+    return data
+
+def ride_request(ride, passenger) -> dict:
+    """Ride offer sent to drivers."""
+    return {
+        "type": "ride_request",
+        "ride_id": ride.id,
+        "pickup_lat": ride.pickup_lat,
+        "pickup_lng": ride.pickup_lng,
+        "pickup_address": ride.pickup_address,
+        "drop_lat": ride.drop_lat,
+        "drop_lng": ride.drop_lng,
+        "drop_address": ride.drop_address,
+        "city": ride.city,
+        "passenger": {
+            "id": passenger.id,
+            "full_name": passenger.full_name
+        },
+        "requested_at": ride.requested_at
+    }
+
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload)
+
+def loads(data: Union[bytes, str]) -> Any:
+    return orjson.loads(data)
+
+def standard_response(message: str, data: Optional[dict] = None, status_code: int = 200) -> Response:
+    """A ``StandardResponse`` envelope encoded straight to bytes, skipping re-validation."""
+    return Response(
+        content=dumps({"success": True, "message": message, "data": data}),
+        status_code=status_code,
+        media_type="application/json"
+    )
@@ -0,0 +1,245 @@
+import heapq
+import math
+from itertools import chain
+import os
+from typing import Container, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from utils.geo import haversine_many, KM_PER_DEGREE_LAT
+
+load_dotenv()
+
+# Edge length of one grid cell. Pickup searches only touch the cells that
+# overlap the search radius, so this should be close to the typical radius.
+DRIVER_INDEX_CELL_KM = float(os.getenv("DRIVER_INDEX_CELL_KM", 1.0))
+# How far a k-nearest search may grow before giving up on finding k drivers
+DRIVER_SEARCH_MAX_RADIUS_KM = float(os.getenv("DRIVER_SEARCH_MAX_RADIUS_KM", 15.0))
+
+Cell = Tuple[int, int]
+
+class DriverIndex:
+    """Process-resident grid index of dispatchable driver positions."""
+
+    def __init__(self, cell_size_km: float = DRIVER_INDEX_CELL_KM):
+        self.cell_size_km = cell_size_km
+        self.cell_deg = cell_size_km / KM_PER_DEGREE_LAT
+        self._cells: Dict[Cell, Dict[int, Tuple[float, float]]] = {}
+        self._drivers: Dict[int, Cell] = {}
+        # Lower-cased vehicle type of indexed drivers, for filtered searches
+        self._vehicle_types: Dict[int, str] = {}
+        # Drivers on a ride, with their vehicle type: kept out of searches until released
+        self._reserved: Dict[int, Optional[str]] = {}
+        # Told about every membership change (see ``subscribe``)
+        self._listeners: List = []
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+    def __contains__(self, driver_id: int) -> bool:
+        return driver_id in self._drivers
+
+    def cell_for(self, lat: float, lng: float) -> Cell:
+        """Grid cell containing a coordinate."""
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def upsert(self, driver_id: int, lat: float, lng: float, vehicle_type: Optional[str] = None):
+        """Insert a driver or move it to a new position (keeping the known vehicle type if none is given)."""
+        if driver_id in self._reserved:
+            if vehicle_type:
+                self._reserved[driver_id] = vehicle_type
+            return
+        if vehicle_type:
+            self._vehicle_types[driver_id] = vehicle_type.lower()
+
+        cell = self.cell_for(lat, lng)
+        old_cell = self._drivers.get(driver_id)
+        if old_cell is not None and old_cell != cell:
+            self._discard_from_cell(old_cell, driver_id)
+
+        self._cells.setdefault(cell, {})[driver_id] = (lat, lng)
+        self._drivers[driver_id] = cell
+        for listener in self._listeners:
+            listener.driver_moved(driver_id, lat, lng)
+
+    def remove(self, driver_id: int):
+        """Drop a driver from the index, if present."""
+        cell = self._drivers.pop(driver_id, None)
+        self._vehicle_types.pop(driver_id, None)
+        if cell is not None:
+            self._discard_from_cell(cell, driver_id)
+            for listener in self._listeners:
+                listener.driver_removed(driver_id)
+
+    def subscribe(self, listener):
+        """Mirror available drivers into ``listener``.
+        
+        It gets ``driver_moved(driver_id, lat, lng)`` and
+        ``driver_removed(driver_id)`` calls, starting with the drivers
+        already indexed.
+        """
+        if listener in self._listeners:
+            return
+        self._listeners.append(listener)
+        for members in self._cells.values():
+            for driver_id, (lat, lng) in members.items():
+                listener.driver_moved(driver_id, lat, lng)
+
+    def reserve(self, driver_id: int):
+        """Hide a driver from searches while they serve a ride."""
+        self._reserved[driver_id] = self._vehicle_types.get(driver_id) or self._reserved.get(driver_id)
+        self.remove(driver_id)
+
+    def release(self, driver_id: int, lat: Optional[float] = None, lng: Optional[float] = None):
+        """Make a reserved driver matchable again: right away at the given position, else on their next update."""
+        vehicle_type = self._reserved.pop(driver_id, None)
+        if lat is not None and lng is not None:
+            self.upsert(driver_id, lat, lng, vehicle_type)
+
+    def clear(self):
+        for driver_id in self._drivers:
+            for listener in self._listeners:
+                listener.driver_removed(driver_id)
+        self._cells.clear()
+        self._drivers.clear()
+        self._vehicle_types.clear()
+        self._reserved.clear()
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        max_radius_km: float = DRIVER_SEARCH_MAX_RADIUS_KM,
+        vehicle_type: Optional[str] = None,
+        exclude: Container[int] = ()
+    ) -> List[Tuple[int, float]]:
+        """The ``k`` nearest drivers within ``max_radius_km`` as ``(driver_id, distance_km)``, nearest first.
+        
+        Drivers in ``exclude`` and, when given, drivers of another vehicle
+        type are skipped.
+        
+        Cells are scanned in rings growing out from the point. The best ``k``
+        so far are kept in a bounded max-heap, and the search stops once the
+        k-th distance lies inside the radius the scanned rings fully cover, so
+        dense areas touch a handful of cells and sparse ones keep growing up
+        to ``max_radius_km``.
+        """
+        if k <= 0:
+            return []
+        wanted = vehicle_type.lower() if vehicle_type else None
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        center_row, center_col = self.cell_for(lat, lng)
+
+        filtered = wanted is not None or bool(exclude)
+
+        # (-distance, driver_id): the root is the worst of the best k
+        best: List[Tuple[float, int]] = []
+        scanned_rows = scanned_cols = -1
+        step = 0
+        while True:
+            col_steps = math.ceil(step / cos_lat)
+            ids: List[int] = []
+            positions: List[Tuple[float, float]] = []
+            for row in range(center_row - step, center_row + step + 1):
+                if abs(row - center_row) <= scanned_rows:
+                    # Middle rows: only the columns beyond the previous ring
+                    cols = [
+                        *range(center_col - col_steps, center_col - scanned_cols),
+                        *range(center_col + scanned_cols + 1, center_col + col_steps + 1)
+                    ]
+                else:
+                    cols = range(center_col - col_steps, center_col + col_steps + 1)
+                for col in cols:
+                    members = self._cells.get((row, col))
+                    if not members:
+                        continue
+                    if not filtered:
+                        ids.extend(members)
+                        positions.extend(members.values())
+                        continue
+                    for driver_id, position in members.items():
+                        if driver_id in exclude:
+                            continue
+                        if wanted is not None and self._vehicle_types.get(driver_id) != wanted:
+                            continue
+                        ids.append(driver_id)
+                        positions.append(position)
+
+            if ids:
+                coords = np.fromiter(chain.from_iterable(positions), float, 2 * len(positions)).reshape(-1, 2)
+                distances = haversine_many(lat, lng, coords[:, 0], coords[:, 1])
+                within = np.flatnonzero(distances <= max_radius_km)
+                if len(within) > k:
+                    # Only this ring's best k can make it into the heap
+                    within = within[np.argpartition(distances[within], k - 1)[:k]]
+                for i in within:
+                    distance = float(distances[i])
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, ids[i]))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, ids[i]))
+
+            # Every driver within ``covered`` km has been seen by now
+            covered = step * self.cell_size_km
+            if (len(best) == k and -best[0][0] <= covered) or covered >= max_radius_km:
+                break
+            scanned_rows, scanned_cols = step, col_steps
+            step += 1
+
+        return [(driver_id, -negative) for negative, driver_id in sorted(best, reverse=True)]
+
+    async def load(self, db: AsyncSession):
+        """Rebuild the index from the online drivers stored in the database."""
+        from models.database import Driver, Ride, ASSIGNED_RIDE_STATUSES
+
+        self.clear()
+        busy = (await db.scalars(select(Ride.driver_id).filter(
+            Ride.driver_id.isnot(None),
+            Ride.status.in_(ASSIGNED_RIDE_STATUSES)
+        ).distinct())).all()
+        self._reserved.update(dict.fromkeys(busy))
+
+        rows = (await db.execute(select(Driver.id, Driver.current_lat, Driver.current_lng, Driver.vehicle_type).filter(
+            Driver.is_online == True,
+            Driver.is_verified == True,
+            Driver.is_active == True,
+            Driver.current_lat.isnot(None),
+            Driver.current_lng.isnot(None)
+        ))).all()
+
+        for driver_id, lat, lng, vehicle_type in rows:
+            self.upsert(driver_id, lat, lng, vehicle_type)
+
+    def _discard_from_cell(self, cell: Cell, driver_id: int):
+        members = self._cells.get(cell)
+        if members is None:
+            return
+        members.pop(driver_id, None)
+        if not members:
+            del self._cells[cell]
+
+def is_dispatchable(driver, lat: Optional[float], lng: Optional[float]) -> bool:
+    """Whether a driver at a position should be visible to nearby-driver searches."""
+    return bool(
+        driver.is_online
+        and driver.is_verified
+        and driver.is_active
+        and lat is not None
+        and lng is not None
+    )
+
+def sync_driver(driver, lat: Optional[float] = None, lng: Optional[float] = None):
+    """Mirror a driver's state into the shared index, optionally at a newer position."""
+    if lat is None or lng is None:
+        lat, lng = driver.current_lat, driver.current_lng
+
+    if is_dispatchable(driver, lat, lng):
+        driver_index.upsert(driver.id, lat, lng, driver.vehicle_type)
+    else:
+        driver_index.remove(driver.id)
+
+driver_index = DriverIndex()
@@ -0,0 +1,221 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+from utils.geo import KM_PER_DEGREE_LAT
+from utils.pricing import fare_engine
+
+load_dotenv()
+
+# Edge length of one surge zone
+SURGE_CELL_KM = float(os.getenv("SURGE_CELL_KM", 2.0))
+# Supply and demand are averaged over this many trailing seconds
+SURGE_WINDOW_SECONDS = float(os.getenv("SURGE_WINDOW_SECONDS", 300))
+# Seconds between multiplier updates
+SURGE_TICK_SECONDS = float(os.getenv("SURGE_TICK_SECONDS", 10))
+# EWMA weight of the newest reading (0-1); lower is smoother
+SURGE_SMOOTHING = float(os.getenv("SURGE_SMOOTHING", 0.3))
+# Multiplier added per unit of demand/supply ratio above 1
+SURGE_SENSITIVITY = float(os.getenv("SURGE_SENSITIVITY", 0.5))
+# Open requests older than this stop counting as demand (abandoned rides)
+SURGE_REQUEST_TTL = float(os.getenv("SURGE_REQUEST_TTL", 900))
+
+Cell = Tuple[int, int]
+
+class ZoneState:
+    """Live counts and the rolling window of one surge zone."""
+
+    __slots__ = ("open_requests", "drivers", "demand", "supply", "demand_sum", "supply_sum", "multiplier")
+
+    def __init__(self, samples: int):
+        self.open_requests = 0
+        self.drivers = 0
+        self.demand = deque(maxlen=samples)
+        self.supply = deque(maxlen=samples)
+        self.demand_sum = 0
+        self.supply_sum = 0
+        self.multiplier = 1.0
+
+    def sample(self):
+        """Push the current counts into the window, keeping running sums."""
+        if len(self.demand) == self.demand.maxlen:
+            self.demand_sum -= self.demand[0]
+            self.supply_sum -= self.supply[0]
+        self.demand.append(self.open_requests)
+        self.supply.append(self.drivers)
+        self.demand_sum += self.open_requests
+        self.supply_sum += self.drivers
+
+    def is_idle(self) -> bool:
+        return (
+            self.open_requests == 0 and self.drivers == 0
+            and self.demand_sum == 0 and self.supply_sum == 0
+            and self.multiplier == 1.0
+        )
+
+class SurgeEngine:
+    """Per-zone surge multipliers from open ride requests and available drivers.
+
+    Ride events and driver index changes adjust the counts of the affected
+    zone in O(1); nothing is recomputed from the database. Every tick each
+    active zone samples its counts into a sliding window, turns the windowed
+    demand/supply ratio into a target multiplier (capped at the pricing
+    config's ``maxMultiplier``) and moves the published multiplier towards it
+    with an EWMA, so single requests don't make prices jump. Zones without
+    surge are simply absent from ``_multipliers``.
+    """
+
+    def __init__(
+        self,
+        cell_size_km: float = SURGE_CELL_KM,
+        window_seconds: float = SURGE_WINDOW_SECONDS,
+        tick_seconds: float = SURGE_TICK_SECONDS,
+        smoothing: float = SURGE_SMOOTHING,
+        sensitivity: float = SURGE_SENSITIVITY,
+        request_ttl: float = SURGE_REQUEST_TTL
+    ):
+        self.cell_deg = cell_size_km / KM_PER_DEGREE_LAT
+        self.tick_seconds = tick_seconds
+        self.samples = max(1, round(window_seconds / tick_seconds))
+        self.smoothing = smoothing
+        self.sensitivity = sensitivity
+        self.request_ttl = request_ttl
+        self._zones: Dict[Cell, ZoneState] = {}
+        # Open requests in request order: ride_id -> (zone, monotonic request time)
+        self._rides: Dict[int, Tuple[Cell, float]] = {}
+        self._drivers: Dict[int, Cell] = {}
+        self._multipliers: Dict[Cell, float] = {}
+        self.ticks = 0
+        self.expired_requests = 0
+        self.last_tick_ms = 0.0
+
+    def cell_for(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def multiplier_at(self, lat: float, lng: float) -> Optional[float]:
+        """Current multiplier of the zone containing a point, or None if it isn't surging."""
+        return self._multipliers.get(self.cell_for(lat, lng))
+
+    def _zone(self, cell: Cell) -> ZoneState:
+        zone = self._zones.get(cell)
+        if zone is None:
+            zone = self._zones[cell] = ZoneState(self.samples)
+        return zone
+
+    # Demand events
+
+    def ride_requested(self, ride_id: int, lat: float, lng: float, requested_at: Optional[float] = None):
+        if ride_id in self._rides:
+            return
+        cell = self.cell_for(lat, lng)
+        self._rides[ride_id] = (cell, requested_at if requested_at is not None else time.monotonic())
+        self._zone(cell).open_requests += 1
+
+    def ride_closed(self, ride_id: int):
+        """A request stopped being open (accepted, cancelled, ...)."""
+        entry = self._rides.pop(ride_id, None)
+        if entry is not None:
+            self._zones[entry[0]].open_requests -= 1
+
+    # Supply events, delivered by the driver index
+
+    def driver_moved(self, driver_id: int, lat: float, lng: float):
+        cell = self.cell_for(lat, lng)
+        old_cell = self._drivers.get(driver_id)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self._zones[old_cell].drivers -= 1
+        self._drivers[driver_id] = cell
+        self._zone(cell).drivers += 1
+
+    def driver_removed(self, driver_id: int):
+        cell = self._drivers.pop(driver_id, None)
+        if cell is not None:
+            self._zones[cell].drivers -= 1
+
+    def tick(self, now: Optional[float] = None):
+        """Advance every active zone by one window sample and republish multipliers."""
+        started = time.perf_counter()
+        now = time.monotonic() if now is None else now
+
+        # Requests are kept in request order, so expired ones are at the front
+        deadline = now - self.request_ttl
+        while self._rides:
+            ride_id, (cell, requested_at) = next(iter(self._rides.items()))
+            if requested_at > deadline:
+                break
+            self.ride_closed(ride_id)
+            self.expired_requests += 1
+
+        ceiling = fare_engine.table.surge_max
+        for cell, zone in list(self._zones.items()):
+            zone.sample()
+            if zone.is_idle():
+                del self._zones[cell]
+                continue
+
+            samples = len(zone.demand)
+            demand = zone.demand_sum / samples
+            supply = max(zone.supply_sum / samples, 1.0)
+            target = min(1.0 + self.sensitivity * max(demand / supply - 1.0, 0.0), ceiling)
+            zone.multiplier += self.smoothing * (target - zone.multiplier)
+            if zone.multiplier < 1.005:
+                zone.multiplier = 1.0
+
+            if zone.multiplier > 1.0:
+                self._multipliers[cell] = round(zone.multiplier, 2)
+            else:
+                self._multipliers.pop(cell, None)
+
+        self.ticks += 1
+        self.last_tick_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    async def load(self, db: AsyncSession):
+        """Rebuild open demand from the requested rides in the database."""
+        from models.database import Ride
+
+        for ride_id in list(self._rides):
+            self.ride_closed(ride_id)
+
+        rows = (await db.execute(
+            select(Ride.id, Ride.pickup_lat, Ride.pickup_lng, Ride.requested_at)
+            .filter(Ride.status == "requested")
+            .order_by(Ride.requested_at, Ride.id)
+        )).all()
+
+        now, utcnow = time.monotonic(), datetime.utcnow()
+        for ride_id, lat, lng, requested_at in rows:
+            age = (utcnow - requested_at).total_seconds() if requested_at else 0
+            self.ride_requested(ride_id, lat, lng, now - age)
+
+    async def run(self):
+        """Recompute multipliers every tick until cancelled."""
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Surge tick failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "zones": len(self._zones),
+            "surging_zones": len(self._multipliers),
+            "max_multiplier": max(self._multipliers.values(), default=1.0),
+            "open_requests": len(self._rides),
+            "available_drivers": len(self._drivers),
+            "expired_requests": self.expired_requests,
+            "ticks": self.ticks,
+            "last_tick_ms": self.last_tick_ms
+        }
+
+surge_engine = SurgeEngine()
@@ -0,0 +1,314 @@
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from fastapi import WebSocket
+from dotenv import load_dotenv
+
+from utils.backplane import Backplane
+from utils.serializers import dumps
+
+load_dotenv()
+
+# Seconds a single send may take before the socket is considered dead
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", 5))
+# Messages buffered per connection before a slow client is evicted
+WS_OUTBOUND_QUEUE_SIZE = int(os.getenv("WS_OUTBOUND_QUEUE_SIZE", 64))
+# Seconds between server pings, and how long a socket may stay silent
+# (no pong or any other message) before it is treated as half-open and evicted.
+# WS_IDLE_TIMEOUT=0 turns eviction off while clients that never answer pings
+# are still in use; the server's protocol-level pings then close dead sockets.
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", 20))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", 60))
+# Window over which the eviction rate is reported
+WS_EVICTION_WINDOW = 300
+# Number of recent delivery latencies kept for percentiles
+WS_LATENCY_SAMPLES = 2048
+
+class LatencyRecorder:
+    """Rolling window of latencies with percentile summaries."""
+
+    def __init__(self, size: int = WS_LATENCY_SAMPLES):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentiles(self) -> dict:
+        if not self._samples:
+            return {"count": self.count, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+
+        def at(fraction: float) -> float:
+            return round(ordered[min(int(fraction * len(ordered)), last)] * 1000, 3)
+
+        return {
+            "count": self.count,
+            "p50_ms": at(0.50),
+            "p95_ms": at(0.95),
+            "p99_ms": at(0.99),
+            "max_ms": round(ordered[last] * 1000, 3)
+        }
+
+_PING = dumps({"type": "ping"}).decode()
+
+class Connection:
+    """An accepted socket with its bounded outbound queue, writer task and last activity."""
+
+    __slots__ = ("websocket", "connection_id", "user_type", "user_id", "queue", "writer", "connected_at", "last_seen")
+
+    def __init__(self, websocket: WebSocket, connection_id: str, user_type: str, user_id: int):
+        self.websocket = websocket
+        self.connection_id = connection_id
+        self.user_type = user_type
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_OUTBOUND_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
+        self.connected_at = time.monotonic()
+        self.last_seen = self.connected_at
+
+    def touch(self):
+        """Record that the client sent something."""
+        self.last_seen = time.monotonic()
+
+    def memory(self) -> int:
+        """Approximate bytes held by this record and its queue, excluding the socket itself."""
+        return sys.getsizeof(self) + sys.getsizeof(self.queue) + sys.getsizeof(self.queue._queue)
+
+# WebSocket connection manager
+class ConnectionManager:
+    """Registry of live sockets with non-blocking, queued delivery.
+
+    Messages are serialized once and put on each recipient's queue; a writer
+    task per connection sends them with a timeout. A socket whose queue fills
+    up or whose send fails or times out is evicted, so one slow client never
+    delays delivery to the others.
+    
+    Recipients that are not connected to this process are handed to the
+    backplane, if one is attached, so the process holding their socket
+    delivers the message instead.
+    
+    Every socket is pinged each ``heartbeat_interval`` seconds and evicted
+    once it has sent nothing (a pong or any other message) for
+    ``idle_timeout`` seconds, so half-open connections do not pile up. An
+    ``idle_timeout`` of 0 only pings.
+    """
+
+    def __init__(self, heartbeat_interval: float = WS_HEARTBEAT_INTERVAL, idle_timeout: float = WS_IDLE_TIMEOUT):
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.active_connections: Dict[str, Connection] = {}
+        self.driver_connections: Dict[int, Connection] = {}
+        self.passenger_connections: Dict[int, Connection] = {}
+        self.fanout_latency = LatencyRecorder()
+        self.messages_sent = 0
+        self.evictions = 0
+        # Evictions by reason, and when the recent ones happened
+        self.evicted: Dict[str, int] = {"slow": 0, "send_failed": 0, "idle": 0, "replaced": 0}
+        self._recent_evictions: Deque[float] = deque(maxlen=10000)
+        self._closing: set = set()
+        self.backplane: Optional[Backplane] = None
+
+    async def attach_backplane(self, backplane: Backplane):
+        """Route messages for clients on other processes through a backplane."""
+        await backplane.start(self.deliver_remote)
+        self.backplane = backplane
+
+    async def detach_backplane(self):
+        if self.backplane is not None:
+            await self.backplane.stop()
+            self.backplane = None
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        connection_id: str,
+        user_type: str,
+        user_id: int,
+        subprotocol: Optional[str] = None
+    ) -> Connection:
+        await websocket.accept(subprotocol=subprotocol)
+
+        # A reconnect replaces whatever socket the same client had before
+        previous = self.active_connections.get(connection_id)
+        if previous is not None:
+            self._evict(previous, "replaced")
+
+        connection = Connection(websocket, connection_id, user_type, user_id)
+        connection.writer = asyncio.create_task(self._write_loop(connection))
+        self.active_connections[connection_id] = connection
+
+        if user_type == "driver":
+            self.driver_connections[user_id] = connection
+        elif user_type == "passenger":
+            self.passenger_connections[user_id] = connection
+        return connection
+
+    def disconnect(self, connection_id: str, user_type: str, user_id: int, websocket: Optional[WebSocket] = None):
+        connection = self.active_connections.get(connection_id)
+        if connection is None:
+            return
+        # Ignore late disconnects from a socket that was already replaced
+        if websocket is not None and connection.websocket is not websocket:
+            return
+        self._remove(connection)
+
+    async def send_to_driver(self, driver_id: int, message: dict):
+        self._route("driver", [driver_id], dumps(message).decode())
+
+    async def send_to_passenger(self, passenger_id: int, message: dict):
+        self._route("passenger", [passenger_id], dumps(message).decode())
+
+    async def broadcast_to_drivers(self, message: dict, driver_ids: List[int] = None):
+        """Send to the given drivers, or to every connected driver when ``driver_ids`` is None."""
+        self._route("driver", driver_ids, dumps(message).decode())
+
+    def _connections_for(self, user_type: str) -> Dict[int, Connection]:
+        return self.driver_connections if user_type == "driver" else self.passenger_connections
+
+    def _route(self, user_type: str, user_ids: Optional[List[int]], payload: str):
+        connections = self._connections_for(user_type)
+        if user_ids is None:
+            for connection in list(connections.values()):
+                self._enqueue(connection, payload)
+            if self.backplane is not None:
+                self.backplane.publish({"user_type": user_type, "ids": None, "payload": payload})
+            return
+
+        remote_ids = []
+        for user_id in user_ids:
+            connection = connections.get(user_id)
+            if connection is not None:
+                self._enqueue(connection, payload)
+            else:
+                remote_ids.append(user_id)
+
+        if remote_ids and self.backplane is not None:
+            self.backplane.publish({"user_type": user_type, "ids": remote_ids, "payload": payload})
+
+    def deliver_remote(self, envelope: dict):
+        """Deliver a message relayed by the backplane to the sockets held here."""
+        connections = self._connections_for(envelope["user_type"])
+        user_ids = envelope.get("ids")
+        payload = envelope["payload"]
+
+        if user_ids is None:
+            targets = list(connections.values())
+        else:
+            targets = [connections[user_id] for user_id in user_ids if user_id in connections]
+
+        for connection in targets:
+            self._enqueue(connection, payload)
+
+    def _enqueue(self, connection: Connection, payload: str):
+        try:
+            connection.queue.put_nowait((payload, time.perf_counter()))
+        except asyncio.QueueFull:
+            print(f"Evicting slow WebSocket client {connection.connection_id}")
+            self._evict(connection, "slow")
+
+    async def _write_loop(self, connection: Connection):
+        while True:
+            payload, enqueued_at = await connection.queue.get()
+            try:
+                await asyncio.wait_for(connection.websocket.send_text(payload), WS_SEND_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Evicting WebSocket client {connection.connection_id}: {e!r}")
+                self._evict(connection, "send_failed")
+                return
+            self.messages_sent += 1
+            self.fanout_latency.record(time.perf_counter() - enqueued_at)
+
+    def _remove(self, connection: Connection):
+        if self.active_connections.get(connection.connection_id) is connection:
+            del self.active_connections[connection.connection_id]
+        if self.driver_connections.get(connection.user_id) is connection:
+            del self.driver_connections[connection.user_id]
+        if self.passenger_connections.get(connection.user_id) is connection:
+            del self.passenger_connections[connection.user_id]
+
+        writer = connection.writer
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+
+    def _evict(self, connection: Connection, reason: str):
+        """Drop a connection and close its socket in the background."""
+        self._remove(connection)
+        self.evictions += 1
+        self.evicted[reason] += 1
+        self._recent_evictions.append(time.monotonic())
+        # A silent client is gone rather than broken: close with "going away"
+        code = 1001 if reason in ("idle", "replaced") else 1011
+        task = asyncio.create_task(self._close(connection.websocket, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    def heartbeat(self) -> int:
+        """Evict the sockets silent for longer than ``idle_timeout`` and ping the rest; returns the number evicted."""
+        stale_before = time.monotonic() - self.idle_timeout
+        evicted = 0
+        for connection in list(self.active_connections.values()):
+            if self.idle_timeout > 0 and connection.last_seen < stale_before:
+                self._evict(connection, "idle")
+                evicted += 1
+            else:
+                self._enqueue(connection, _PING)
+        return evicted
+
+    async def run(self):
+        """Run the heartbeat every ``heartbeat_interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            evicted = self.heartbeat()
+            if evicted:
+                print(f"Evicted {evicted} idle WebSocket clients")
+
+    def _eviction_rate(self) -> float:
+        """Evictions per minute over the last ``WS_EVICTION_WINDOW`` seconds."""
+        since = time.monotonic() - WS_EVICTION_WINDOW
+        while self._recent_evictions and self._recent_evictions[0] < since:
+            self._recent_evictions.popleft()
+        return round(len(self._recent_evictions) / (WS_EVICTION_WINDOW / 60), 2)
+
+    def _type_stats(self, connections: Dict[int, Connection]) -> dict:
+        now = time.monotonic()
+        depths = [connection.queue.qsize() for connection in connections.values()]
+        return {
+            "connections": len(connections),
+            "memory_bytes": sum(connection.memory() for connection in connections.values()),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "max_idle_seconds": round(max((now - connection.last_seen for connection in connections.values()), default=0.0), 1)
+        }
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.active_connections),
+            "drivers": self._type_stats(self.driver_connections),
+            "passengers": self._type_stats(self.passenger_connections),
+            "messages_sent": self.messages_sent,
+            "evictions": self.evictions,
+            "evictions_by_reason": self.evicted,
+            "evictions_per_minute": self._eviction_rate(),
+            "heartbeat_interval": self.heartbeat_interval,
+            "idle_timeout": self.idle_timeout,
+            "fanout_latency": self.fanout_latency.percentiles(),
+            "backplane": self.backplane.stats() if self.backplane is not None else None
+        }
+
+manager = ConnectionManager()